@@ -33,6 +33,8 @@ CONFIG_PATH = "config"
 CONFIG_TYPE = "json"
 LOG_PATH = "log"
 DATA_DIR = "data"
+DUMP_DIR = "dump"  # Instrument recorder downloads, kept apart from the data files to send.
+RAW_DIR = "raw"  # Raw records of the devices reducing their data on board, not sent.
 DATA_FILE_NAME = "\"{:04d}{:02d}{:02d}\".format(utime.localtime()[0], utime.localtime()[1], utime.localtime()[2])"
 TMP_FILE_PFX = "$"
 SENT_FILE_PFX = "_"
@@ -45,4 +47,4 @@ LEDS = {"IO":1, "PWR":2, "RUN":3, "SLEEP":4}  # red, green, yellow, blue
 UARTS = {1:2, 2:4, 3:6, 4:1}
 DEVICES = {"GPS_1":1, "METEO_1":1, "METRECX_1":2, "ADCP_1":3}
 DATA_ACQUISITION_INTERVAL = 60  # sec.
-SCHEDULER = {"GPS_1":{"sync_rtc":120, "last_fix":30}}
+SCHEDULER = {"GPS_1":{"sync_rtc":120, "last_fix":30}, "ADCP_1":{"dump":3600}}
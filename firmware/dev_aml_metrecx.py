@@ -20,142 +20,321 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import utime
-from device import DEVICE
+from device import DEVICE, TASK
+from tools.deadline import DEADLINE
 import tools.utils as utils
+import tools.timing as timing
 import constants
 
+"""Command reply timeout (ms)."""
+REPLY_TIMEOUT = 500
+
+"""Attempts per script step."""
+RETRIES = 3
+
+"""Time to wait for the prompt after a <CTRL+C> (ms)."""
+BREAK_TIMEOUT = 1000
+
+"""Silence that ends a recorder dump block (ms)."""
+DUMP_TIMEOUT = 2000
+
+"""Uart read chunk of a recorder dump (bytes)."""
+DUMP_CHUNK = 512
+
+"""Power off time (ms) that restarts the scanning after a dump."""
+RESTART_DELAY = 500
+
 class METRECX(DEVICE):
 
-    def __init__(self, instance):
-        self.instance = instance
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up", duration=30),
+        "log":TASK("main"),
+        "dump":TASK("dump", duration=30)
+        })
+
+    def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
-        DEVICE.__init__(self, self.instance)
-        self.timeout = constants.TIMEOUT
-        self.prompt = ">"
+        DEVICE.__init__(self, *args, **kwargs)
+        self.prompt = b">"
+        if "tasks" in kwargs:
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
         if self.init_power():
-            if self.init_uart():
-                if self._break():
-                    self._stop_logging()
-                    self._set_clock()
-                    self._set_sample_rate()
-                    self._start_logging()
-                    self.off()
-                    return True
+            replies = None
+            if self._break(RETRIES):
+                replies = self._run_script(self._setup_script())
+            self.off()
+            if replies:
+                utils.log_file("{} => clock synced (dev: {} {} board: {})".format(self.__qualname__, replies["DISPLAY DATE"][0].strip(), replies["DISPLAY TIME"][0].strip(), utils.time_string(utime.mktime(utime.localtime()))))  # DEBUG
+                utils.log_file("{} => {}, logging started".format(self.__qualname__, replies["DIS S"][0].strip()))  # DEBUG
+                return True
+            utils.log_file("{} => unable to set up".format(self.__qualname__))  # DEBUG
         return False
 
-    def _timeout(self, start, timeout=None):
-        """Checks if a timeout occourred
+    def _setup_script(self):
+        """Returns the start up script, logging is stopped while the clock and the
+        sample rate are set."""
+        return [
+            ("SET SCAN NOLOGGING", None, REPLY_TIMEOUT),
+            (self._set_date, None, REPLY_TIMEOUT),
+            (self._set_time, None, REPLY_TIMEOUT),
+            ("DISPLAY DATE", None, REPLY_TIMEOUT),
+            ("DISPLAY TIME", None, REPLY_TIMEOUT),
+            ("SET S {:0d} S".format(self.config["Sample_Rate"]), None, REPLY_TIMEOUT),
+            ("DIS S", " {:0d} S".format(self.config["Sample_Rate"]), REPLY_TIMEOUT),
+            ("SET SCAN LOGGING", None, REPLY_TIMEOUT)
+            ]
+
+    def _set_date(self):
+        """Returns the set date command, mm/dd/yy."""
+        now = utime.localtime()
+        return "SET DATE {:02d}/{:02d}/{:02d}".format(now[1], now[2], now[0] % 100)
+
+    def _set_time(self):
+        """Returns the set time command, hh:mm:ss."""
+        now = utime.localtime()
+        return "SET TIME {:02d}:{:02d}:{:02d}".format(now[3], now[4], now[5])
+
+    def _read_reply(self, timeout):
+        """Reads from the instrument until the prompt.
 
         Params:
-            start(int)
+            timeout(int): ms
         Returns:
-            True or False
+            list of reply lines (str), the first is the echo, or None
         """
-        if timeout is None:
-            timeout = self.timeout
-        if timeout > 0 and utime.time() - start >= timeout:
-            return True
-        return False
+        rx = bytearray()
+        deadline = DEADLINE(timeout)
+        while not deadline.expired():
+            if self.wait_uart(deadline):
+                rx.extend(self.uart.read(self.uart.any()))
+                if rx[-1:] == self.prompt:
+                    self.count(timing.BYTES, len(rx))
+                    return bytes(rx[:-1]).decode("utf-8").split("\r\n")[:-1]
+        self.count(timing.BYTES, len(rx))
+        self.count(timing.TIMEOUTS)
+        return
 
-    def _get_reply(self, timeout=None):
-        """Returns replies from instrument.
+    def _command(self, command, expect=None, timeout=REPLY_TIMEOUT):
+        """Sends a command and matches its reply.
 
+        Params:
+            command(str)
+            expect(str): text the reply must contain
+            timeout(int): ms
         Returns:
-            bytes or None
+            list of reply lines (str) or None
         """
-        start = utime.time()
-        while not self._timeout(start, timeout):
-            if self.uart.any():
-                return self.uart.read().split(b"\r\n")[1].decode("utf-8")
-        return
+        self.uart.write(command + "\r")
+        reply = self._read_reply(timeout)
+        if reply is None or reply[0].strip() != command:
+            return
+        reply = reply[1:]
+        if "?" in reply:  # Unknown command.
+            return
+        if expect and not any(expect in line for line in reply):
+            return
+        return reply
+
+    def _run_script(self, script):
+        """Sends a command script, each command as soon as the previous prompt
+        comes in, retrying only the failed steps.
+
+        Params:
+            script(list): steps (command, expected reply, timeout ms), command
+                can be a function returning the command when it is sent
+        Returns:
+            dict of replies by step command or None if a step fails RETRIES
+            times
+        """
+        self.flush_uart()
+        replies = {}
+        for command, expect, timeout in script:
+            for _ in range(RETRIES):
+                cmd = command() if callable(command) else command
+                reply = self._command(cmd, expect, timeout)
+                if reply is not None:
+                    replies[command] = reply
+                    break
+                utils.log_file("{} => {} failed".format(self.__qualname__, cmd))  # DEBUG
+                self.flush_uart()
+            else:
+                return
+        return replies
 
-    def _break(self):
+    def _break(self, attempts=None):
+        """Stops the instrument scanning and waits for the prompt.
+
+        Params:
+            attempts(int): default forever
+        Returns:
+            True or False
+        """
         utils.log_file("{} => waiting for instrument getting ready...".format(self.__qualname__))  # DEBUG
-        while True:
-            self._flush_uart()
+        while attempts is None or attempts > 0:
+            self.flush_uart()
             self.uart.write(b"\x03")  # <CTRL+C>
-            if self._get_prompt(120):
+            if self._read_reply(BREAK_TIMEOUT) is not None:
                 return True
+            if attempts:
+                attempts -= 1
+        return False
+
+    def dump(self):
+        """Downloads the scans logged in the instrument memory since the last
+        dump, Dump.Block scans per file in the DUMP_DIR.
+
+        The memory commands depend on the instrument firmware and are taken
+        from the config: Dump.Memory_Command replies with the number of scans
+        in memory, its first integer, Dump.Dump_Command is formatted with the
+        first scan and the number of scans and replies with the scans, one
+        per line. They are not shipped, as they differ among firmware
+        releases, so the dump is disabled while they are empty and it is not
+        scheduled by default: configure them, then add the dump task to
+        constants.SCHEDULER, e.g. "METRECX_1":{"dump":3600}.
 
-    def _get_prompt(self, timeout=None):
-        self._flush_uart()
-        self.uart.write(b"\r")
-        rx = self._get_reply(timeout)
-        if rx == self.prompt:
-            return True
-        else:
+        The dump runs after the acquisition and gives way as soon as the
+        device leaves the ready status or after Dump.Window sec., the next
+        dump resumes from the first block not verified. The instrument is
+        restarted to resume the scanning in any case.
+
+        Returns:
+            True if the memory is fully downloaded
+        """
+        if not self.config["Dump"]["Memory_Command"] or not self.config["Dump"]["Dump_Command"]:
+            utils.log_file("{} => dump commands not configured".format(self.__qualname__))  # DEBUG
+            return False
+        dir = utils._get_data_dir(constants.DUMP_DIR)
+        if not dir:
+            utils.log_file("{} => no media to dump to".format(self.__qualname__))  # DEBUG
+            return False
+        if not self._break(RETRIES):
             return False
+        try:
+            return self._dump(dir)
+        finally:
+            self._restart()
 
-    def _set_date(self):
-        """Sets up the instrument date, mm/dd/yy."""
-        if self._get_prompt():
-            now = utime.localtime()
-            self.uart.write("SET DATE {:02d}/{:02d}/{:02d}\r".format(now[1], now[2], int(str(now[0])[:-2])))
-            if self._get_reply() == self.prompt:
-                return True
-        return False
+    def _dump(self, dir):
+        """Downloads the memory once scanning is stopped.
 
-    def _set_time(self):
-        """Sets up the instrument time, hh:mm:ss."""
-        if self._get_prompt():
-            now = utime.localtime()
-            self.uart.write("SET TIME {:02d}:{:02d}:{:02d}\r".format(now[3], now[4], now[5]))
-            if self._get_reply() ==  self.prompt:
-                return True
-        return False
+        Params:
+            dir(str)
+        Returns:
+            True if the memory is fully downloaded
+        """
+        command = self.config["Dump"]["Memory_Command"]
+        reply = self._run_script([(command, None, REPLY_TIMEOUT)])
+        total = self._first_integer(reply[command]) if reply else None
+        if total is None:
+            utils.log_file("{} => unable to read memory status".format(self.__qualname__))  # DEBUG
+            return False
+        file = dir + "/" + self.__qualname__ + "_" + self.instance
+        offset = self._dump_offset(file)
+        if offset > total:
+            utils.log_file("{} => memory cleared, dumping from scan 0".format(self.__qualname__))  # DEBUG
+            offset = 0
+        buf = bytearray(DUMP_CHUNK)
+        window = DEADLINE(self.config["Dump"]["Window"] * 1000)
+        while offset < total:
+            if utils.status_table.get(self.name) != 2 or window.expired():
+                break
+            count = min(self.config["Dump"]["Block"], total - offset)
+            for _ in range(RETRIES):
+                if self._dump_block("{}_{:08d}".format(file, offset), offset, count, buf):
+                    break
+                utils.log_file("{} => block {} failed".format(self.__qualname__, offset))  # DEBUG
+            else:
+                break
+            offset += count
+            self._dump_offset(file, offset)
+        utils.log_file("{} => dumped {} of {} scans".format(self.__qualname__, offset, total))  # DEBUG
+        return offset == total
 
-    def _get_date(self):
-        if self._get_prompt():
-            self.uart.write("DISPLAY DATE\r")
-            return self._get_reply()[-13:]
-
-    def _get_time(self):
-        if self._get_prompt():
-            self.uart.write("DISPLAY TIME\r")
-            return self._get_reply()[-14:-3]
-
-    def _set_clock(self):
-        """Syncs the intrument clock."""
-        if self._set_date() and self._set_time():
-            utils.log_file("{} => clock synced (dev: {} {} board: {})".format(self.__qualname__, self._get_date(), self._get_time(), utils.time_string(utime.mktime(utime.localtime()))))  # DEBUG
-            return True
-        utils.log_file("{} => unable to sync clock".format(self.__qualname__))  # DEBUG
-        return False
+    def _first_integer(self, lines):
+        """Returns the first integer found in reply lines, None if any.
 
-    def _set_sample_rate(self):
-        """Sets intrument sampling rate."""
-        if self._get_prompt():
-            self.uart.write("SET S {:0d} S\r".format(self.config["Sample_Rate"]))
-            if self._get_reply() ==  self.prompt:
-                self._get_sample_rate()
-                return True
-        utils.log_file("{} => unable to set sampling rate".format(self.__qualname__))  # DEBUG
-        return False
+        Params:
+            lines(list): reply lines (str)
+        """
+        for line in lines:
+            for word in line.split():
+                if word.isdigit():
+                    return int(word)
+        return
 
-    def _get_sample_rate(self):
-        if self._get_prompt():
-            self.uart.write("DIS S\r")
-            utils.log_file("{} => {}".format(self.__qualname__, self._get_reply()))  # DEBUG
+    def _restart(self):
+        """Restarts the scanning and logging stopped by a break, the
+        instrument starts scanning at power up."""
+        if hasattr(self, "gpio"):
+            self.gpio.off()
+            utime.sleep_ms(RESTART_DELAY)
+            self.gpio.on()
+            utils.log_file("{} => restarted".format(self.__qualname__))  # DEBUG
 
-    def _stop_logging(self):
-        if self._get_prompt():
-            self.uart.write("SET SCAN NOLOGGING\r")
-            if self._get_prompt():
-                utils.log_file("{} => logging stopped".format(self.__qualname__))  # DEBUG
-                return True
-        utils.log_file("{} => unable to stop logging".format(self.__qualname__))  # DEBUG
-        return False
+    def _dump_offset(self, file, offset=None):
+        """Returns or saves the number of scans already dumped.
 
-    def _start_logging(self):
-        if self._get_prompt():
-            self.uart.write("SET SCAN LOGGING\r")
-            if self._get_prompt():
-                utils.log_file("{} => logging started".format(self.__qualname__))  # DEBUG
-                return True
-        utils.log_file("{} => unable to start logging".format(self.__qualname__))  # DEBUG
+        Params:
+            file(str): dump files prefix
+            offset(int)
+        Returns:
+            offset(int)
+        """
+        if offset is None:
+            try:
+                with open(file + ".off") as off:
+                    return int(off.read())
+            except:
+                return 0
+        with open(file + ".off", "w") as off:
+            off.write(str(offset))
+        return offset
+
+    def _dump_block(self, file, offset, count, buf):
+        """Streams a block of scans from the instrument memory to a file.
+
+        Params:
+            file(str)
+            offset(int): first scan
+            count(int): scans
+            buf(bytearray): read buffer
+        Returns:
+            True if the block holds count scans
+        """
+        self.flush_uart()
+        self.uart.write(self.config["Dump"]["Dump_Command"].format(offset, count) + "\r")
+        lines = -1  # The echo comes first.
+        with open(file, "wb") as dump:
+            deadline = DEADLINE(DUMP_TIMEOUT)
+            while not deadline.expired():
+                n = self.wait_uart(deadline)
+                if not n:
+                    continue
+                n = self.uart.readinto(buf, min(n, len(buf)))
+                if not n:
+                    continue
+                self.count(timing.BYTES, n)
+                deadline.set()
+                data = memoryview(buf)[:n]
+                if lines < 0:
+                    i = bytes(data).find(b"\n")
+                    if i < 0:
+                        continue
+                    data = data[i + 1:]
+                    lines = 0
+                prompt = len(data) > 0 and data[-1] == self.prompt[0]
+                if prompt:
+                    data = data[:-1]
+                lines += bytes(data).count(b"\n")
+                dump.write(data)
+                if prompt:
+                    self.count(timing.FRAMES, lines)
+                    return lines == count
+        self.count(timing.TIMEOUTS)
         return False
 
     def _format_data(self, sample):
@@ -175,35 +354,43 @@ class METRECX(DEVICE):
 
     def main(self):
         """Captures instrument data."""
-        if not self.init_uart():
-            return
         utils.log_file("{} => acquiring data...".format(self.__qualname__))  # DEBUG
         self.led_on()
-        sample = ""
+        sample = bytearray()
         new_line = False
-        start = utime.time()
+        deadline = DEADLINE(self.config["Samples"] // self.config["Sample_Rate"] * 1000)
         while True:
-            if utime.time() - start > self.config["Samples"] // self.config["Sample_Rate"]:
+            if deadline.expired():
                 utils.log_file("{} => no data coming from serial".format(self.__qualname__))  # DEBUG
+                self.count(timing.TIMEOUTS)
                 break
-            if self.uart.any():
+            if self.wait_uart(deadline):
                 byte = self.uart.read(1)
+                self.count(timing.BYTES)
                 if byte == b"\n":
                     new_line = True
                 elif byte == b"\r" and new_line:
+                    self.count(timing.FRAMES)
                     break
                 elif new_line:
-                    sample += byte.decode("utf-8")
-        utils.log_data(self._format_data(sample))
+                    sample.extend(byte)
+        utils.log_data(self._format_data(sample.decode("utf-8")))
         self.led_on()
         return
 
 
 class UVXCHANGE(DEVICE):
 
-    def __init__(self):
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up")
+        })
+
+    def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
-        DEVICE.__init__(self)
+        DEVICE.__init__(self, *args, **kwargs)
+        if "tasks" in kwargs:
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
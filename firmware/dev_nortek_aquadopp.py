@@ -20,12 +20,42 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import utime
-from device import DEVICE
+from device import DEVICE, TASK
+from tools.deadline import DEADLINE
 import tools.utils as utils
+import tools.timing as timing
+import tools.nortek as nortek
+from tools.stats import PROFILE, STATS, CIRCULAR
 import constants
 import ubinascii
+import ustruct
 import math
 
+RETRIES = 3  # Attempts per recorder block.
+CFG_FILE = "config/adcp.cfg"  # Hardware, head and deployment config as read from the instrument.
+CFG_SIZE = 784
+# The cache is kept raw rather than parsed: the 784 bytes are smaller than
+# any text dump of the decoded fields, carry their own checksums and are the
+# bytes GP and the upload are compared with; they are parsed once per boot.
+
+"""Contains pairs device:(hw_cfg, head_cfg, usr_cfg), the parsed config survives the acquisition cycle."""
+cfgs = {}
+
+"""Contains pairs device:nortek.STREAM, partial structures survive the acquisition cycle."""
+streams = {}
+
+"""Contains pairs device:PROFILE, ensembles are averaged across acquisition cycles."""
+profiles = {}
+
+"""Contains pairs device:(heading, pitch, roll) accumulators of the ensembles averaged in the profile."""
+attitudes = {}
+
+"""Contains the devices measuring without recording because their recorder is full."""
+full = set()
+
+"""Contains the devices whose recorder has been dumped and verified up to its end, it can be formatted."""
+dumped = set()
+
 class ADCP(DEVICE):
 
     modes = {
@@ -47,54 +77,57 @@ class ADCP(DEVICE):
 
     hw_cfg = ("Recorder installed", "Compass installed")
 
-    def __init__(self, instance):
-        self.instance = instance
+    parsers = {
+        b"":"_",
+        b"GP":"_parse_hw_cfg",
+        b"GH":"_parse_head_cfg",
+        b"GC":"_parse_usr_cfg"
+        }  # {cmd:method,...}
+
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up", duration=60),
+        "log":TASK("main"),
+        "dump":TASK("dump", duration=240)
+        })
+
+    def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
-        DEVICE.__init__(self, self.instance)
-        self.timeout = self.config["Timeout"]
+        DEVICE.__init__(self, *args, **kwargs)
+        self.timeout = self.config["Timeout"] * 1000  # ms
         self.usr_cfg = ()
         self.hw_cfg = ()
         self.head_cfg = ()
+        if "tasks" in kwargs:
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
         if self.init_power():
             utime.sleep_ms(500)  # DEBUG Allows instrument to start properly prior to send commands
-            if self.init_uart():
-                self._set_clock()
-                self._set_usr_cfg()
-                if self._get_cfg():
-                    self._parse_cfg()
-                self._start_delayed()
-                return True
-        return False
-
-    def _timeout(self, start, timeout=None):
-        """Checks if a timeout occourred
-
-        Params:
-            start(int)
-        Returns:
-            True or False
-        """
-        if timeout is None:
-            timeout = self.timeout
-        if timeout > 0 and utime.time() - start >= timeout:
+            self._set_clock()
+            if self._get_cfg(self._set_usr_cfg()):
+                self._parse_cfg()
+            self._start_delayed()
             return True
         return False
 
     def _get_reply(self, timeout=None):
         """Returns replies from instrument.
 
+        Params:
+            timeout(int): ms, default Timeout
         Returns:
             bytes or None
         """
-        start = utime.time()
+        deadline = DEADLINE(self.timeout if timeout is None else timeout)
         while True:
-            if self._timeout(start, timeout):
+            if deadline.expired():
+                self.count(timing.TIMEOUTS)
                 return
-            if self.uart.any():
+            if self.wait_uart(deadline):
                 x = self.uart.read()
+                self.count(timing.BYTES, len(x))
                 return x
 
     def _ack(self, rx):
@@ -144,9 +177,9 @@ class ADCP(DEVICE):
             True or False
         """
         if self._ack(reply):
-            try:
-                reply = eval("self._" + cmd.decode("ascii").lower() + "(reply)", {"self": self, "reply": reply})
-            except:
+            if cmd in self.parsers:
+                reply = getattr(self, self.parsers[cmd])(reply)
+            else:
                 print("NO COMMAND SPECIFIC DATA PARSING METHOD DEFINED")
             print(reply)
             return True
@@ -169,14 +202,15 @@ class ADCP(DEVICE):
         self.uart.write("@@@@@@")
         utime.sleep_ms(100)
         self.uart.write("K1W%!Q")
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 return False
             rx = self._get_reply()
             if self._ack(rx):
                 if b"\x0a\x0d\x43\x6f\x6e\x66\x69\x72\x6d\x3a" in rx:
-                    self._confirm()
+                    if self._confirm():
+                        return True
                 else:
                     utils.verbose(rx, constants.VERBOSE)
                     return True
@@ -204,12 +238,7 @@ class ADCP(DEVICE):
         Params:
             reply(bytes)
         """
-        sum=0
-        j=0
-        for i in range(int.from_bytes(reply[2:4], "little")-1):
-            sum += int.from_bytes(reply[j:j+2], "little")
-            j = j+2
-        return (int.from_bytes(b"\xb5\x8c", "big") + sum) % 65536
+        return nortek.checksum(reply)
 
     def verify_checksum(self, reply):
         """Verifies data checksum.
@@ -219,63 +248,110 @@ class ADCP(DEVICE):
         Returns:
             True or False
         """
-        checksum = int.from_bytes(reply[-2:], "little")
-        calc_checksum = self._calc_checksum(reply)
-        if checksum == calc_checksum:
+        if nortek.verify(reply):
             return True
-        utils.verbose("checksum {} calc_checksum {}".format(checksum, calc_checksum), constants.VERBOSE)  # DEBUG
+        utils.verbose("checksum mismatch", constants.VERBOSE)  # DEBUG
+        self.count(timing.REJECTED)
         return False
 
-    def _get_cfg(self):
+    def _get_cfg(self, cached=False):
         """Reads complete configuration data
 
         Reads the currently used hardware configuration, the head
         configuration, and the deployment configuration from the
         instrument.
+
+        Params:
+            cached(bool): the cached deployment config matches the instrument
+                one, the download is skipped if the hardware config matches
+                the cached one as well, on another instrument the deployment
+                config is uploaded once downloaded
         """
-        start = utime.time()
+        cfg = self._read_cfg() if cached else None
+        upload = False
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 break
             if self._break():
+                if cfg:
+                    utils.verbose("=> GP", constants.VERBOSE)
+                    self.uart.write("GP")
+                    rx = self._get_reply()
+                    if not self._ack(rx) or not self.verify_checksum(memoryview(rx)[0:48]):
+                        continue
+                    if rx[:-2] == cfg[0:48]:
+                        utils.log_file("{} => instrument config unchanged".format(self.__qualname__))  # DEBUG
+                        return True
+                    cfg = None  # Another instrument.
+                    upload = True
                 utils.verbose("=> GA", constants.VERBOSE)
                 self.uart.write("GA")
                 rx = self._get_reply()
-                if self._ack(rx) and self.verify_checksum(rx[0:48]) and self.verify_checksum(rx[48:272]) and self.verify_checksum(rx[272:784]):
-                    try:
-                        with open("config/adcp.cfg", "wb") as cfg:
-                            cfg.write(rx)
-                            utils.log_file("{} => retreived instrument config".format(self.__qualname__))  # DEBUG
-                            return True
-                    except:
-                        break
+                if self._ack(rx) and self.verify_checksum(memoryview(rx)[0:48]) and self.verify_checksum(memoryview(rx)[48:272]) and self.verify_checksum(memoryview(rx)[272:784]):
+                    if self._write_cfg(memoryview(rx)[0:CFG_SIZE]):
+                        utils.log_file("{} => retreived instrument config".format(self.__qualname__))  # DEBUG
+                        if upload:
+                            self._set_usr_cfg()
+                        return True
+                    break
         utils.log_file("{} => unable to retreive instrument config".format(self.__qualname__))  # DEBUG
         return False
 
-    def _parse_cfg(self):
-        """Parses configuration data."""
+    def _read_cfg(self):
+        """Reads the cached instrument config.
+
+        Returns:
+            bytearray or None if missing or corrupted
+        """
+        try:
+            with open(CFG_FILE, "rb") as file:
+                cfg = bytearray(file.read(CFG_SIZE))
+        except:
+            return
+        view = memoryview(cfg)
+        if len(cfg) == CFG_SIZE and nortek.verify(view[0:48]) and nortek.verify(view[48:272]) and nortek.verify(view[272:784]):
+            return cfg
+
+    def _write_cfg(self, cfg):
+        """Caches the instrument config.
+
+        Params:
+            cfg(bytes, bytearray or memoryview)
+        Returns:
+            True or False
+        """
         try:
-            with open("config/adcp.cfg", "rb") as cfg:
-                bytes = cfg.read()
-                self.hw_cfg = self._parse_hw_cfg(bytes[0:48])         # Hardware config (48 bytes)
-                self.head_cfg = self._parse_head_cfg(bytes[48:272])   # Head config (224 bytes)
-                self.usr_cfg = self._parse_usr_cfg(bytes[272:784])    # Deployment config (512 bytes)
-            utils.log_file("{} => parsed instrument config".format(self.__qualname__))  # DEBUG
+            with open(CFG_FILE, "wb") as file:
+                file.write(cfg)
             return True
         except:
-            utils.log_file("{} => unable to parse instrument config".format(self.__qualname__))  # DEBUG
             return False
 
+    def _parse_cfg(self):
+        """Parses configuration data, the parsed tuples are kept across the
+        acquisition cycles."""
+        cfg = self._read_cfg()
+        if not cfg:
+            utils.log_file("{} => unable to parse instrument config".format(self.__qualname__))  # DEBUG
+            return False
+        cfg = memoryview(cfg)
+        self.hw_cfg = self._parse_hw_cfg(cfg[0:48])         # Hardware config (48 bytes)
+        self.head_cfg = self._parse_head_cfg(cfg[48:272])   # Head config (224 bytes)
+        self.usr_cfg = self._parse_usr_cfg(cfg[272:784])    # Deployment config (512 bytes)
+        cfgs[self.name] = (self.hw_cfg, self.head_cfg, self.usr_cfg)
+        utils.log_file("{} => parsed instrument config".format(self.__qualname__))  # DEBUG
+        return True
 
     def _get_hw_cfg(self):
         """Reads the current hardware configuration from the instrument."""
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 utils.log_file("{} => unable to retreive hardware config".format(self.__qualname__))  # DEBUG
                 return False
             if self._break():
-                vebose("=> GP", constants.VERBOSE)
+                utils.verbose("=> GP", constants.VERBOSE)
                 self.uart.write("GP")
                 rx = self._get_reply()
                 if self._ack(rx):
@@ -292,19 +368,20 @@ class ADCP(DEVICE):
         Returns:
             string
         """
+        cfg = ustruct.unpack_from(nortek.HW_CFG, reply)
         return (
-            "{:02x}".format(reply[0]),                                         # [0] Sync
-            "{:02x}".format(int.from_bytes(reply[1:2], "little")),             # [1] Id
-            int.from_bytes(reply[2:4], "little"),                              # [2] Size
-            reply[4:18].decode("ascii"),                                       # [3] SerialNo
-            self._decode_hw_cfg(int.from_bytes(reply[18:20], "little")),       # [4] Config
-            int.from_bytes(reply[20:22], "little"),                            # [5] Frequency
-            reply[22:24],                                                      # [6] PICVersion
-            int.from_bytes(reply[24:26], "little"),                            # [7] HWRevision
-            int.from_bytes(reply[26:28], "little"),                            # [8] RecSize
-            self._decode_hw_status(int.from_bytes(reply[28:30], "little")),    # [9] Status
-            reply[30:42],                                                      # [10] Spare
-            reply[42:46].decode("ascii")                                       # [11] FWVersion
+            "{:02x}".format(cfg[0]),                # [0] Sync
+            "{:02x}".format(cfg[1]),                # [1] Id
+            cfg[2],                                 # [2] Size
+            cfg[3].decode("ascii"),                 # [3] SerialNo
+            self._decode_hw_cfg(cfg[4]),            # [4] Config
+            cfg[5],                                 # [5] Frequency
+            cfg[6],                                 # [6] PICVersion
+            cfg[7],                                 # [7] HWRevision
+            cfg[8],                                 # [8] RecSize
+            self._decode_hw_status(cfg[9]),         # [9] Status
+            cfg[10],                                # [10] Spare
+            cfg[11].decode("ascii")                 # [11] FWVersion
             )
 
     def _decode_hw_cfg(self, cfg):
@@ -321,53 +398,86 @@ class ADCP(DEVICE):
     def _set_usr_cfg(self):
         """Uploads a deployment config to the instrument and sets up the device
         Activation_Rate and Warmup_Duration parameters according to the current
-        deployment constants."""
-        start = utime.time()
+        deployment constants.
+
+        The upload is skipped if the cached deployment config matches the one
+        to upload except for the start time, and the cached start time is in
+        phase with Activation_Rate and not later than the one to upload, as the
+        instrument keeps measuring in sync with the scheduler.
+
+        Returns:
+            True if the cached deployment config matches the instrument one
+        """
+        try:
+            with open(self.config["Adcp"]["Deployment_Config"], "rb") as pdc:
+                cfg = pdc.read()
+        except:
+            utils.log_file("{} => unable to upload deployment config".format(self.__qualname__))  # DEBUG
+            return False
+        rate = int.from_bytes(cfg[38:40], "little")
+        self.config["Activation_Rate"] = rate
+        self.config["Warmup_Duration"] = rate - self.config["Samples"]
+        cached = self._read_cfg()
+        if cached and cached[272:320] == cfg[0:48] and cached[326:782] == cfg[54:510] and self._in_phase(cached[320:326]):
+            utils.log_file("{} => deployment config unchanged".format(self.__qualname__))  # DEBUG
+            return True
+        usr_cfg = cfg[0:48] + self._set_start() + cfg[54:510]
+        tx = usr_cfg + ustruct.pack("<H", self._calc_checksum(usr_cfg))
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 break
             if self._break():
-                try:
-                    with open(self.config["Adcp"]["Deployment_Config"], "rb") as pdc:
-                        cfg = pdc.read()
-                        rate = int.from_bytes(cfg[38:40], "little")
-                        self.config["Activation_Rate"] = rate
-                        self.config["Warmup_Duration"] = rate - self.config["Samples"]
-                        usr_cfg = cfg[0:48] + self._set_start() + cfg[54:510]
-                        checksum = self._calc_checksum(usr_cfg)
-                        tx = usr_cfg + ubinascii.unhexlify(hex(checksum)[-2:] + hex(checksum)[2:4])
-                        self.uart.write(b"\x43\x43")
-                        self.uart.write(tx)
-                        utils.verbose("=> CC", constants.VERBOSE)
-                        rx = self._get_reply()
-                        if self._ack(rx):
-                            utils.log_file("{} => uploaded deployment config".format(self.__qualname__))  # DEBUG
-                            return True
-                except:
-                    break
+                self.uart.write(b"\x43\x43")
+                self.uart.write(tx)
+                utils.verbose("=> CC", constants.VERBOSE)
+                rx = self._get_reply()
+                if self._ack(rx):
+                    utils.log_file("{} => uploaded deployment config".format(self.__qualname__))  # DEBUG
+                    if cached:
+                        cached[272:784] = tx
+                        return self._write_cfg(cached)
+                    return False
         utils.log_file("{} => unable to upload deployment config".format(self.__qualname__))  # DEBUG
         return False
 
     def _set_start(self):
         """Computes the measurement starting time to be synced with scheduler."""
+        next = self._next_start()
+        start = utime.localtime(next)
+        start = ubinascii.unhexlify("{:02d}{:02d}{:02d}{:02d}{:02d}{:02d}".format(start[4], start[5], start[2], start[3], int(str(start[0])[2:]), start[1]))
+        utils.log_file("{} => set start at {}".format(self.__qualname__, utils.time_string(next)))  # DEBUG
+        return start
+
+    def _next_start(self):
+        """Returns the next measurement starting time (sec.)."""
         now = utime.time() - self.config["Activation_Delay"]
         next = now - now % self.config["Activation_Rate"] + self.config["Activation_Rate"]
         if now % self.config["Activation_Rate"] > self.config["Activation_Rate"] - self.config["Samples"] // self.config["Sample_Rate"] - self.config["Adcp"]["Start_Delay"]:
           next += self.config["Activation_Rate"]
         next += - self.config["Samples"] // self.config["Sample_Rate"] // 2 - self.config["Adcp"]["Start_Delay"]
         next += self.config["Activation_Delay"]
-        start = utime.localtime(next)
-        start = ubinascii.unhexlify("{:02d}{:02d}{:02d}{:02d}{:02d}{:02d}".format(start[4], start[5], start[2], start[3], int(str(start[0])[2:]), start[1]))
-        utils.log_file("{} => set start at {}".format(self.__qualname__, utils.time_string(next)))  # DEBUG
-        return start
+        return next
+
+    def _in_phase(self, start):
+        """Checks a deployment start time against the one _next_start() returns.
+
+        Params:
+            start(bytes): ClockDeploy, min sec day hour year month (BCD)
+        Returns:
+            True or False
+        """
+        start = [int(ubinascii.hexlify(start[i:i+1])) for i in range(6)]
+        start = utime.mktime((2000 + start[4], start[5], start[2], start[3], start[0], start[1], 0, 0))
+        next = self._next_start()
+        return (next - start) % self.config["Activation_Rate"] == 0 and start <= next
 
     def _get_usr_cfg(self):
         """Retreives the current deployment config from the instrument."""
-        start = utime.time()
         while True:
-            start = utime.time()
+            deadline = DEADLINE(self.timeout)
             while True:
-                if self._timeout(start):
+                if deadline.expired():
                     utils.log_file("{} => unable to retreive deployment config".format(self.__qualname__))  # DEBUG
                     return False
                 if self._break():
@@ -382,62 +492,63 @@ class ADCP(DEVICE):
 
     def _parse_usr_cfg(self, bytestring):
         """Parses the deployment constants."""
+        cfg = ustruct.unpack_from(nortek.USR_CFG, bytestring)
         return (
-            "{:02x}".format(bytestring[0]),                                     # [0] Sync
-            "{:02x}".format((int.from_bytes(bytestring[1:2], "little"))),       # [1] Id
-            int.from_bytes(bytestring[2:4], "little"),                          # [2] Size
-            int.from_bytes(bytestring[4:6], "little"),                          # [3] T1
-            int.from_bytes(bytestring[6:8], "little"),                          # [4] T2, BlankingDistance
-            int.from_bytes(bytestring[8:10], "little"),                         # [5] T3
-            int.from_bytes(bytestring[10:12], "little"),                        # [6] T4
-            int.from_bytes(bytestring[12:14], "little"),                        # [7] T5
-            int.from_bytes(bytestring[14:16], "little"),                        # [8] NPings
-            int.from_bytes(bytestring[16:18], "little"),                        # [9] AvgInterval
-            int.from_bytes(bytestring[18:20], "little"),                        # [10] NBeams
-            self._decode_usr_timctrlreg(int.from_bytes(bytestring[20:22], "little")),   # [11] TimCtrlReg
-            self._decode_usr_pwrctrlreg(int.from_bytes(bytestring[22:24], "little")),   # [12] Pwrctrlreg
-            bytestring[24:26],                                                  # [13] A1 Not used.
-            bytestring[26:28],                                                  # [14] B0 Not used.
-            bytestring[28:30],                                                  # [15] B1 Not used.
-            int.from_bytes(bytestring[30:32], "little"),                        # [16] CompassUpdRate
-            self.coord_system[int.from_bytes(bytestring[32:34], "little")],     # [17] CoordSystem
-            int.from_bytes(bytestring[34:36], "little"),                        # [18] Nbins
-            int.from_bytes(bytestring[36:38], "little"),                        # [19] BinLength
-            int.from_bytes(bytestring[38:40], "little"),                        # [20] MeasInterval
-            bytestring[40:46].decode("utf-8"),                                  # [21] DeployName
-            int.from_bytes(bytestring[46:48], "little"),                        # [22] WrapMode
-            ubinascii.hexlify(bytestring[48:54]).decode("utf-8"),               # [23] ClockDeploy
-            int.from_bytes(bytestring[54:58], "little"),                        # [24] DiagInterval
-            self._decode_usr_mode(int.from_bytes(bytestring[58:60], "little")), # [25] Mode
-            int.from_bytes(bytestring[60:62], "little"),                        # [26] AdjSoundSpeed
-            int.from_bytes(bytestring[62:64], "little"),                        # [27] NSampDiag
-            int.from_bytes(bytestring[64:66], "little"),                        # [28] NbeamsCellDiag
-            int.from_bytes(bytestring[66:68], "little"),                        # [29] NpingDiag
-            self._decode_usr_modetest(int.from_bytes(bytestring[68:70], "little")),     # [30] ModeTest
-            int.from_bytes(bytestring[68:72], "little"),                        # [31] AnaInAddr
-            int.from_bytes(bytestring[72:74], "little"),                        # [32] SWVersion
-            int.from_bytes(bytestring[74:76], "little"),                        # [33] Salinity
-            ubinascii.hexlify(bytestring[76:256]),                              # [34] VelAdjTable
-            bytestring[256:336].decode("utf-8"),                                # [35] Comments
-            ubinascii.hexlify(bytestring[336:384]),                             # [36] Spare
-            int.from_bytes(bytestring[384:386], "little"),                      # [37] Processing Method
-            ubinascii.hexlify(bytestring[386:436]),                             # [38] Spare
-            self._decode_usr_wavemode(int.from_bytes(bytestring[436:438], "little")),   # [39] Wave Measurement Mode
-            int.from_bytes(bytestring[438:440], "little"),                      # [40] DynPercPos
-            int.from_bytes(bytestring[440:442], "little"),                      # [41] T1
-            int.from_bytes(bytestring[442:444], "little"),                      # [42] T2
-            int.from_bytes(bytestring[444:446], "little"),                      # [43] T3
-            int.from_bytes(bytestring[446:448], "little"),                      # [44] NSamp
-            bytestring[448:450].decode("utf-8"),                                # [45] A1 Not used.
-            bytestring[450:452].decode("utf-8"),                                # [46] B0 Not used.
-            bytestring[452:454].decode("utf-8"),                                # [47] B1 Not used.
-            ubinascii.hexlify(bytestring[454:456]),                             # [48] Spare
-            int.from_bytes(bytestring[456:458], "little"),                      # [49] AnaOutScale
-            int.from_bytes(bytestring[458:460], "little"),                      # [50] CorrThresh
-            ubinascii.hexlify(bytestring[460:462]),                             # [51] Spare
-            int.from_bytes(bytestring[462:464], "little"),                      # [52] TiLag2
-            ubinascii.hexlify(bytestring[464:486]),                             # [53] Spare
-            bytestring[486:510]                                                 # [54] QualConst
+            "{:02x}".format(cfg[0]),                # [0] Sync
+            "{:02x}".format(cfg[1]),                # [1] Id
+            cfg[2],                                 # [2] Size
+            cfg[3],                                 # [3] T1
+            cfg[4],                                 # [4] T2, BlankingDistance
+            cfg[5],                                 # [5] T3
+            cfg[6],                                 # [6] T4
+            cfg[7],                                 # [7] T5
+            cfg[8],                                 # [8] NPings
+            cfg[9],                                 # [9] AvgInterval
+            cfg[10],                                # [10] NBeams
+            self._decode_usr_timctrlreg(cfg[11]),   # [11] TimCtrlReg
+            self._decode_usr_pwrctrlreg(cfg[12]),   # [12] Pwrctrlreg
+            cfg[13],                                # [13] A1 Not used.
+            cfg[14],                                # [14] B0 Not used.
+            cfg[15],                                # [15] B1 Not used.
+            cfg[16],                                # [16] CompassUpdRate
+            self.coord_system[cfg[17]],             # [17] CoordSystem
+            cfg[18],                                # [18] Nbins
+            cfg[19],                                # [19] BinLength
+            cfg[20],                                # [20] MeasInterval
+            cfg[21].decode("utf-8"),                # [21] DeployName
+            cfg[22],                                # [22] WrapMode
+            ubinascii.hexlify(cfg[23]).decode("utf-8"), # [23] ClockDeploy
+            cfg[24],                                # [24] DiagInterval
+            self._decode_usr_mode(cfg[25]),         # [25] Mode
+            cfg[26],                                # [26] AdjSoundSpeed
+            cfg[27],                                # [27] NSampDiag
+            cfg[28],                                # [28] NbeamsCellDiag
+            cfg[29],                                # [29] NpingDiag
+            self._decode_usr_modetest(cfg[30]),     # [30] ModeTest
+            cfg[31],                                # [31] AnaInAddr
+            cfg[32],                                # [32] SWVersion
+            cfg[33],                                # [33] Salinity
+            ubinascii.hexlify(cfg[34]),             # [34] VelAdjTable
+            cfg[35].decode("utf-8"),                # [35] Comments
+            ubinascii.hexlify(cfg[36]),             # [36] Spare
+            cfg[37],                                # [37] Processing Method
+            ubinascii.hexlify(cfg[38]),             # [38] Spare
+            self._decode_usr_wavemode(cfg[39]),     # [39] Wave Measurement Mode
+            cfg[40],                                # [40] DynPercPos
+            cfg[41],                                # [41] T1
+            cfg[42],                                # [42] T2
+            cfg[43],                                # [43] T3
+            cfg[44],                                # [44] NSamp
+            cfg[45].decode("utf-8"),                # [45] A1 Not used.
+            cfg[46].decode("utf-8"),                # [46] B0 Not used.
+            cfg[47].decode("utf-8"),                # [47] B1 Not used.
+            ubinascii.hexlify(cfg[48]),             # [48] Spare
+            cfg[49],                                # [49] AnaOutScale
+            cfg[50],                                # [50] CorrThresh
+            ubinascii.hexlify(cfg[51]),             # [51] Spare
+            cfg[52],                                # [52] TiLag2
+            ubinascii.hexlify(cfg[53]),             # [53] Spare
+            cfg[54]                                 # [54] QualConst
             )
 
     def _decode_usr_timctrlreg(self, bytestring):
@@ -467,9 +578,9 @@ class ADCP(DEVICE):
 
     def _get_head_cfg(self):
         """Retreives the current head config from the instrument."""
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 utils.log_file("{} => unable to retreive head config".format(self.__qualname__))  # DEBUG
                 return False
             if self._break():
@@ -484,17 +595,18 @@ class ADCP(DEVICE):
 
     def _parse_head_cfg(self, bytestring):
         """Parses the head constants."""
+        cfg = ustruct.unpack_from(nortek.HEAD_CFG, bytestring)
         return (
-            "{:02x}".format(bytestring[0]),                                     # [0] Sync
-            "{:02x}".format(int.from_bytes(bytestring[1:2], "little")),         # [1] Id
-            int.from_bytes(bytestring[2:4], "little") * 2,                      # [2] Size
-            self._decode_head_cfg(int.from_bytes(bytestring[4:6], "little")),   # [3] Config
-            int.from_bytes(bytestring[6:8], "little"),                          # [4] Frequency
-            bytestring[8:10],                                                   # [5] Type
-            bytestring[10:22].decode("ascii"),                                  # [6] SerialNo
-            bytestring[22:198],                                                 # [7] System
-            bytestring[198:220],                                                # [8] Spare
-            int.from_bytes(bytestring[220:222], "little")                       # [9] NBeams
+            "{:02x}".format(cfg[0]),                # [0] Sync
+            "{:02x}".format(cfg[1]),                # [1] Id
+            cfg[2] * 2,                             # [2] Size
+            self._decode_head_cfg(cfg[3]),          # [3] Config
+            cfg[4],                                 # [4] Frequency
+            cfg[5],                                 # [5] Type
+            cfg[6].decode("ascii"),                 # [6] SerialNo
+            cfg[7],                                 # [7] System
+            cfg[8],                                 # [8] Spare
+            cfg[9]                                  # [9] NBeams
             )
 
     def _decode_head_cfg(self, cfg):
@@ -549,14 +661,170 @@ class ADCP(DEVICE):
             "COORD. TRANSF. {}".format("ERROR" if error >> 3 & 1 else "OK")
             )
 
-    def _dump_recorder(self):
-        pass  # TODO
+    def dump(self):
+        """Downloads the recorder to a file in the DUMP_DIR, then restarts the
+        measurement.
+
+        The recorder is read once its size is known, the dump gives way as
+        soon as the device leaves the ready status or after Dump.Window sec.
+        and the next dump resumes from the first structure not verified. A
+        recorder dumped up to its end may be formatted by _start_delayed().
+
+        Returns:
+            True if the recorder is fully dumped
+        """
+        file = self._dump_file()
+        if not file:
+            utils.log_file("{} => no media to dump to".format(self.__qualname__))  # DEBUG
+            return False
+        if not self._break():
+            return False
+        try:
+            size = self._get_recorder_size()
+            if size is None:
+                utils.log_file("{} => unable to read recorder size".format(self.__qualname__))  # DEBUG
+                return False
+            offset, seq = self._dump_offset(file)
+            if offset > size:
+                utils.log_file("{} => recorder formatted, dumping from byte 0".format(self.__qualname__))  # DEBUG
+                offset, seq = self._dump_offset(file, 0, seq + 1)
+            offset = self._dump_recorder(file, offset, seq, size)
+            utils.log_file("{} => dumped {} of {} bytes".format(self.__qualname__, offset, size))  # DEBUG
+            if offset == size:
+                dumped.add(self.name)
+                return True
+            return False
+        finally:
+            self._start_delayed()
+
+    def _dump_file(self):
+        """Returns the dump files prefix, None if no media is available."""
+        dir = utils._get_data_dir(constants.DUMP_DIR)
+        if dir:
+            return dir + "/" + self.__qualname__ + "_" + self.instance
+
+    def _dump_offset(self, file, offset=None, seq=None):
+        """Returns or saves the recorder bytes already dumped and the number of
+        the recorder formats, the dump of each recorder goes to its own file.
+
+        Params:
+            file(str): dump files prefix
+            offset(int)
+            seq(int)
+        Returns:
+            offset(int), seq(int)
+        """
+        if offset is None:
+            try:
+                with open(file + ".off") as off:
+                    offset, seq = off.read().split()
+                    return int(offset), int(seq)
+            except:
+                return 0, 0
+        with open(file + ".off", "w") as off:
+            off.write("{} {}".format(offset, seq))
+        return offset, seq
+
+    def _get_recorder_size(self):
+        """Reads the recorder bytes in use.
+
+        Returns:
+            size(int) or None
+        """
+        utils.verbose("=> RA", constants.VERBOSE)
+        self.uart.write("RA")
+        rx = self._get_reply()
+        if self._ack(rx) and len(rx) == 6:
+            return ustruct.unpack_from("<I", rx)[0]
+        return
+
+    def _dump_recorder(self, file, offset, seq, size):
+        """Reads the recorder in Dump.Block byte blocks and appends the verified
+        structures to the dump file, the offset is saved after every block.
+
+        Params:
+            file(str): dump files prefix
+            offset(int): first byte
+            seq(int): recorder formats
+            size(int): recorder bytes in use
+        Returns:
+            offset(int): first byte not dumped
+        """
+        block = self.config["Dump"]["Block"]
+        buf = bytearray(block + 2)  # Data, ACK.
+        window = DEADLINE(self.config["Dump"]["Window"] * 1000)
+        name = "{}_{:03d}.prf".format(file, seq)
+        try:
+            dump = open(name, "r+b")  # Bytes written past the saved offset get overwritten.
+        except OSError:
+            dump = open(name, "wb")
+        with dump:
+            dump.seek(offset)
+            while offset < size:
+                if utils.status_table.get(self.name) != 2 or window.expired():
+                    break
+                for _ in range(RETRIES):
+                    n = self._read_block(offset, min(block, size - offset), buf)
+                    if n:
+                        break
+                    utils.log_file("{} => block {} failed".format(self.__qualname__, offset))  # DEBUG
+                else:
+                    break
+                dump.write(memoryview(buf)[:n])
+                dump.flush()
+                offset += n
+                self._dump_offset(file, offset, seq)
+        return offset
+
+    def _read_block(self, offset, count, buf):
+        """Reads a block of the recorder and verifies the structures it holds,
+        the last one is left to the next block if incomplete.
+
+        Params:
+            offset(int): first byte, a structure start
+            count(int): bytes
+            buf(bytearray): read buffer, at least count + 2 bytes
+        Returns:
+            bytes of verified structures from the block start, 0 if none
+        """
+        self.flush_uart()
+        self.uart.write(b"RD" + ustruct.pack("<IH", offset, count))
+        total = count + 2
+        view = memoryview(buf)
+        n = 0
+        deadline = DEADLINE(self.timeout)
+        while n < total:
+            if deadline.expired():
+                self.count(timing.TIMEOUTS)
+                return 0
+            waiting = self.wait_uart(deadline)
+            if waiting:
+                n += self.uart.readinto(view[n:], min(waiting, total - n)) or 0
+                deadline.set()
+        self.count(timing.BYTES, n)
+        if not self._ack(bytes(view[count:total])):
+            return 0
+        n = 0
+        while count - n >= 4:
+            if buf[n] != nortek.SYNC:
+                self.count(timing.REJECTED)
+                break  # Retried from here by the next block.
+            size = (buf[n + 2] | buf[n + 3] << 8) * 2
+            if n + size > count:
+                break  # Completed by the next block.
+            if not nortek.verify(view[n:n + size]):
+                self.count(timing.REJECTED)
+                break
+            n += size
+            self.count(timing.FRAMES)
+        return n
 
     def _format_recorder(self):
-        """Erase all recorded data if it reached the maximum allowed files number (31)"""
-        start = utime.time()
+        """Erase all recorded data if it reached the maximum allowed files
+        number (31), the next dump goes to a new file."""
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 utils.log_file("{} => unable to format recorder".format(self.__qualname__))  # DEBUG
                 return False
             if self._break():
@@ -564,6 +832,10 @@ class ADCP(DEVICE):
                 self.uart.write(b"\x46\x4F\x12\xD4\x1E\xEF")
                 if self._ack(self._get_reply()):
                     utils.log_file("{} => recorder formatted".format(self.__qualname__))  # DEBUG
+                    file = self._dump_file()
+                    if file:
+                        offset, seq = self._dump_offset(file)
+                        self._dump_offset(file, 0, seq + 1)
                     return True
 
     def _acquire_data(self):
@@ -572,9 +844,9 @@ class ADCP(DEVICE):
         Down Mode when measurement has been made.
         """
         utils.log_file("{} => acquiring 1 sample...".format(self.__qualname__))  # DEBUG
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 return False
             if self._break():
                 utils.verbose("=> AD", constants.VERBOSE)
@@ -589,80 +861,92 @@ class ADCP(DEVICE):
         configuration of the instrument. Data is stored to a new file in
         the recorder. Data is output on the serial port only if specified in
         the configuration.
+
+        If the recorder is full it is formatted only once dumped and verified
+        up to its end, until then the measurement starts without recording.
         """
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 utils.log_file("{} => unable to start measurement".format(self.__qualname__))  # DEBUG
                 return False
             if self._break():
                 utils.verbose("=> SD", constants.VERBOSE)
                 self.uart.write("SD")
                 rx = self._get_reply()
-                if not self._ack(rx):
-                    self._format_recorder()
-                else:
+                if self._ack(rx):
+                    full.discard(self.name)
                     utils.log_file("{} => measurement started".format(self.__qualname__))  # DEBUG
                     return True
+                if self.name in dumped:
+                    dumped.discard(self.name)  # Formats once, the dump is verified again before the next.
+                    self._format_recorder()
+                    continue
+                utils.verbose("=> ST", constants.VERBOSE)
+                self.uart.write("ST")
+                if self._ack(self._get_reply()):
+                    full.add(self.name)
+                    utils.log_file("{} => recorder full, measurement started without recording".format(self.__qualname__))  # DEBUG
+                    return True
 
     def _conv_data(self, bytestring):
-        """Converts sample bytestring to ascii string."""
+        """Converts sample bytestring to ascii string.
+
+        SoundSpeed and AnaIn2 share a word, it carries analog input 2 only
+        if the sound speed is user specified (deployment Mode bit 0), the
+        field it does not carry is None.
+        """
+        data = ustruct.unpack_from(nortek.VEL_HEADER, bytestring)
+        if self.usr_cfg and self.usr_cfg[25][-1] == "1":
+            sound_speed, ana_in2 = None, data[12] / 10
+        else:
+            sound_speed, ana_in2 = data[12] / 10, None
         return (
-            ubinascii.hexlify(bytestring[9:10]),                                # [0] Month
-            ubinascii.hexlify(bytestring[6:7]),                                 # [1] Day
-            ubinascii.hexlify(bytestring[8:9]),                                 # [2] Year
-            ubinascii.hexlify(bytestring[7:8]),                                 # [3] Hour
-            ubinascii.hexlify(bytestring[4:5]),                                 # [4] Minute
-            ubinascii.hexlify(bytestring[5:6]),                                 # [5] Second
-            self._get_error(int.from_bytes(bytestring[10:12], "little")),       # [6] Error code
-            self._get_status(int.from_bytes(bytestring[25:26], "little")),      # [7] Status code
-            int.from_bytes(bytestring[14:16], "little") / 10,                   # [8] Battery voltage
-            int.from_bytes(bytestring[16:18], "little") / 10,                   # [9] Soundspeed
-            int.from_bytes(bytestring[18:20], "little") / 10,                   # [10] Heading
-            int.from_bytes(bytestring[20:22], "little") / 10,                   # [11] Pitch
-            int.from_bytes(bytestring[22:24], "little") / 10,                   # [12] Roll
-            self._calc_pressure(bytestring[24:25], bytestring[26:28]) / 1000,   # [13] Pressure
-            int.from_bytes(bytestring[28:30], "little") / 100,                  # [14] Temperature
-            int.from_bytes(bytestring[12:14], "little") / 10,                   # [15] Analog input 1
-            int.from_bytes(bytestring[16:18], "little") / 10                    # [16] Analog input 2
-            ) + self._get_cells(bytestring[30:])                                # [17:] x1,y1,z1, x2, y2, z2, x3, y3, z3...
+            "{:02x}".format(data[8]),               # [0] Month
+            "{:02x}".format(data[5]),               # [1] Day
+            "{:02x}".format(data[7]),               # [2] Year
+            "{:02x}".format(data[6]),               # [3] Hour
+            "{:02x}".format(data[3]),               # [4] Minute
+            "{:02x}".format(data[4]),               # [5] Second
+            self._get_error(data[9]),               # [6] Error code
+            self._get_status(data[17]),             # [7] Status code
+            data[11] / 10,                          # [8] Battery voltage
+            sound_speed,                            # [9] Soundspeed
+            data[13] / 10,                          # [10] Heading
+            data[14] / 10,                          # [11] Pitch
+            data[15] / 10,                          # [12] Roll
+            self._calc_pressure(data[16], data[18]) / 1000, # [13] Pressure
+            data[19] / 100,                         # [14] Temperature
+            data[10] / 10,                          # [15] Analog input 1
+            ana_in2                                 # [16] Analog input 2
+            ) + self._get_cells(bytestring)         # [17:] x1,y1,z1, x2, y2, z2, x3, y3, z3...
 
     def _calc_pressure(self, pressureMSB, pressureLSW):
         """Calculates pressure value.
 
         Params:
-            pressureMSB, pressureLSW(float)
+            pressureMSB, pressureLSW(int)
         Returns:
-            pressure(float)
+            pressure(int)
         """
-        return 65536 * int.from_bytes(pressureMSB, "little") + int.from_bytes(pressureLSW, "little")
+        return 65536 * pressureMSB + pressureLSW
 
     def _get_cells(self, bytestring):
         """Extracts cells data from sample bytestring.
 
         Params:
-            bytestring
+            bytestring: velocity data structure
         Returns:
             list(x1, x2, x3... y1, y2, y3... z1, z2, z3..., a11, a12 , a13..., a21, a22, a23..., a31, a32, a33...)
         """
-        cells = []
         if self.usr_cfg:
-            nbins = self.usr_cfg[18]
-            nbeams = self.usr_cfg[10]
-            j = 0
-            for beam in range(nbeams):
-                for bin in range(nbins):
-                    cells.append(int.from_bytes(bytestring[j:j+2], "little"))
-                    j += 2
-            for beam in range(nbeams):
-                for bin in range(nbins):
-                    cells.append(int.from_bytes(bytestring[j:j+1], "little"))
-                    j += 1
-        return tuple(cells)
+            return ustruct.unpack_from(nortek.cells(self.usr_cfg[10], self.usr_cfg[18]), bytestring, nortek.VEL_HEADER_SIZE)
+        return ()
 
-    def _format_data(self, sample):
-        """Formats data according to output format."""
-        data = [
+    def _format_header(self, sample):
+        """Formats the sample header and the deployment settings, if the
+        config is cached."""
+        header = [
             "{:2s}/{:2s}/20{:2s}".format(sample[1], sample[0], sample[2]),  # dd/mm/yyyy
             "{:2s}:{:2s}".format(sample[3], sample[4]),                     # hh:mm
             "{}".format(sample[8]),                                         # Battery
@@ -673,6 +957,10 @@ class ADCP(DEVICE):
             "{}".format(sample[13]),                                        # Pressure
             "{}".format(sample[14]),                                        # Temperature
             "{}".format(self._get_flow()),                                  # Flow
+            ]
+        if not self.usr_cfg or not self.head_cfg:
+            return header
+        return header + [
             "{}".format(self.usr_cfg[17]),                                  # CoordSystem
             "{}".format(self.usr_cfg[4]),                                   # BlankingDistance
             "{}".format(self.usr_cfg[20]),                                  # MeasInterval
@@ -680,14 +968,91 @@ class ADCP(DEVICE):
             "{}".format(self.usr_cfg[18]),                                  # NBins
             "{}".format(self.head_cfg[3][3]),                               # TiltSensorMounting
             ]
-        j = 17
-        for bin in range(self.usr_cfg[18]):
+
+    def _format_data(self, sample):
+        """Formats data according to output format."""
+        data = self._format_header(sample)
+        nbins = self.usr_cfg[18]
+        for bin in range(nbins):
             data.append("#{}".format(bin + 1))                              # (#Cell number)
             for beam in range(self.usr_cfg[10]):
-                data.append("{}".format(sample[j]))                         # East, North, Up/Down
-                j += 1
+                data.append("{}".format(sample[17 + beam * nbins + bin]))   # East, North, Up/Down
+        return data
+
+    def _reduce(self, structure, sample):
+        """Adds a sample to the device profile, bins whose amplitude is below
+        Min_Amplitude on any beam are left out.
+
+        Params:
+            structure(memoryview): velocity data
+            sample(tuple): converted velocity data
+        Returns:
+            PROFILE
+        """
+        nbeams = self.usr_cfg[10]
+        nbins = self.usr_cfg[18]
+        if self.name not in profiles or profiles[self.name].bins != nbins:
+            profiles[self.name] = PROFILE(nbins)
+            attitudes[self.name] = (CIRCULAR(), STATS(), STATS())
+        profile = profiles[self.name]
+        heading, pitch, roll = attitudes[self.name]
+        heading.add(sample[10])
+        pitch.add(sample[11])
+        roll.add(sample[12])
+        min_amplitude = self.config["Adcp"]["Reduction"]["Min_Amplitude"]
+        scale = 0.1 if structure[25] >> 1 & 1 else 1  # Velocity scaling (mm/s).
+        amplitudes = 17 + nbeams * nbins
+        for bin in range(nbins):
+            for beam in range(nbeams):
+                if sample[amplitudes + beam * nbins + bin] < min_amplitude:
+                    break
+            else:
+                profile.add(bin, sample[17 + bin] * scale, sample[17 + nbins + bin] * scale)
+        profile.ensembles += 1
+        return profile
+
+    def _format_profile(self, sample, profile):
+        """Formats the mean speed (cm/s) and direction (deg) profile, heading,
+        pitch and roll are averaged over the ensembles as well."""
+        heading, pitch, roll = attitudes[self.name]
+        sample = sample[:10] + (round(heading.mean(), 1) % 360, round(pitch.mean(), 1), round(roll.mean(), 1)) + sample[13:]
+        data = self._format_header(sample)
+        data.append("{}".format(profile.ensembles))                         # Ensembles
+        for bin in range(profile.bins):
+            data.append("#{}".format(bin + 1))                              # (#Cell number)
+            speed = profile.speed(bin)
+            if speed is None:
+                data.extend(("", ""))
+            else:
+                data.append("{:.1f}".format(speed / 10))                    # Speed
+                data.append("{:.0f}".format(profile.direction(bin)))        # Direction
         return data
 
+    def _log_sample(self, structure):
+        """Writes out a velocity data structure, reduced to speed and direction
+        profiles averaged over Ensembles samples if Adcp.Reduction is set and
+        the velocities are ENU, the raw record goes to RAW_DIR if Raw is set.
+
+        Params:
+            structure(memoryview): velocity data
+        """
+        sample = self._conv_data(structure)
+        if not self.usr_cfg or not self.head_cfg:  # No config to decode the cells, bare record.
+            utils.log_data(";".join([self.config["String_Label"]] + self._format_header(sample)))
+            return
+        reduction = self.config["Adcp"].get("Reduction")
+        if not reduction or self.usr_cfg[17] != "ENU":
+            utils.log_data(";".join([self.config["String_Label"]] + self._format_data(sample)))
+            return
+        if reduction["Raw"]:
+            utils.log_data(";".join([self.config["String_Label"]] + self._format_data(sample)), constants.RAW_DIR)
+        profile = self._reduce(structure, sample)
+        if profile.ensembles >= reduction["Ensembles"]:
+            utils.log_data(";".join([self.config["String_Label"]] + self._format_profile(sample, profile)))
+            profile.reset()
+            for stats in attitudes[self.name]:
+                stats.reset()
+
     def _get_flow(self):
         """Calculates the fluid flow (rivers only)."""
         # TODO
@@ -716,16 +1081,16 @@ class ADCP(DEVICE):
 
     def _get_clock(self):
         """Reads the instrument RTC."""
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 return False
             if self._break():
                 utils.verbose("=> RC", constants.VERBOSE)
                 self.uart.write("RC")
                 rx = self._get_reply()
                 if self._ack(rx):
-                    rx = ubinascii.hexlify(rx)
+                    rx = ubinascii.hexlify(rx).decode("ascii")
                     return "20{:2s}-{:2s}-{:2s} {:2s}:{:2s}:{:2s}".format(
                         rx[8:10], # Year
                         rx[10:12],# Month
@@ -739,9 +1104,9 @@ class ADCP(DEVICE):
 
         mm ss DD hh YY MM (3 words of 2 bytes each)
         """
-        start = utime.time()
+        deadline = DEADLINE(self.timeout)
         while True:
-            if self._timeout(start):
+            if deadline.expired():
                 utils.log_file("{} => unable to sync clock".format(self.__qualname__))  # DEBUG
                 return False
             if self._break():
@@ -756,19 +1121,34 @@ class ADCP(DEVICE):
 
     def main(self):
         """Captures instrument data."""
-        if not self.init_uart():
-            return
         utils.log_file("{} => acquiring data...".format(self.__qualname__))  # DEBUG
+        if self.name in full:
+            utils.log_file("{} => recorder full, recording disabled".format(self.__qualname__))  # DEBUG
         self.led_on()
-        data = "$ADCP"
-        start = utime.time()
-        while True:
-            if utime.time() - start > self.config["Samples"] // self.config["Sample_Rate"]:
+        if self.name in cfgs:
+            self.hw_cfg, self.head_cfg, self.usr_cfg = cfgs[self.name]
+        else:
+            self._parse_cfg()
+        if self.name not in streams:
+            streams[self.name] = nortek.STREAM()
+        stream = streams[self.name]
+        rejected = stream.rejected
+        samples = 0
+        deadline = DEADLINE(self.config["Samples"] // self.config["Sample_Rate"] * 1000)
+        while not samples:
+            if deadline.expired():
                 utils.log_file("{} => timeout occourred".format(self.__qualname__))  # DEBUG
+                self.count(timing.TIMEOUTS)
+                utils.log_data(self.config["String_Label"])
                 break
-            if self.uart.any():
-                data = ";".join([self.config["String_Label"]] + self._format_data(self._conv_data(self.uart.read())))
-                break
-        utils.log_data(data)
+            if self.wait_uart(deadline):
+                rx = self.uart.read(self.uart.any())
+                self.count(timing.BYTES, len(rx))
+                for structure in stream.get_structures(rx):  # Logs all the samples in the chunk.
+                    if structure[1] == nortek.VELOCITY:
+                        self._log_sample(structure)
+                        self.count(timing.FRAMES)
+                        samples += 1
+        self.count(timing.REJECTED, stream.rejected - rejected)
         self.led_on()
         return
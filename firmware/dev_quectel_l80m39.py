@@ -23,27 +23,51 @@
 import pyb
 import utime
 import tools.utils as utils
+import tools.timing as timing
 import constants
-from device import DEVICE
-from tools.nmea import NMEA
-from math import sin, cos, sqrt, atan2, radians
+from device import DEVICE, TASK
+import tools.anchor as anchor
+import tools.clock as clock
+from array import array
+from tools.nmea import NMEA, build
+
+"""TTFF histogram bins width (sec.) and count, the last bin collects the longer ones."""
+TTFF_BIN = 5
+TTFF_BINS = 13
+
+"""A fix within this time (sec.) from the acquisition start was already there, its TTFF is unknown."""
+CENSOR_WINDOW = 2
+
+"""Contains pairs device:ticks_ms at power on."""
+powered = {}
+
+"""Contains pairs device:warmup duration (sec.) adapted from the observed TTFF."""
+warmups = {}
+
+"""Contains pairs device:TTFF histogram."""
+ttffs = {}
 
 class GPS(DEVICE, NMEA):
     """Creates a GPS object."""
 
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up"),
+        "log":TASK("log", main=True),
+        "last_fix":TASK("last_fix", main=True),
+        "sync_rtc":TASK("sync_rtc", main=True)
+        })
+
     def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
         DEVICE.__init__(self, *args, **kwargs)
         NMEA.__init__(self, *args, **kwargs)
-        data_tasks = ["log","last_fix","sync_rtc"]
+        self.set_filter(self.config["Gps"]["String_To_Acquire"])
+        self.cold_warmup = self.config["Warmup_Duration"]
+        if self.name in warmups:
+            self.config["Warmup_Duration"] = warmups[self.name]  # The scheduler plans the power on from it.
         if "tasks" in kwargs:
-            if any(elem in data_tasks for elem in kwargs["tasks"]):
-                if self.main():
-                    for task in kwargs["tasks"]:
-                        eval("self." + task + "()", {"self":self})
-            else:
-                for task in kwargs["tasks"]:
-                    eval("self." + task + "()", {"self":self})
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
@@ -51,70 +75,187 @@ class GPS(DEVICE, NMEA):
           return True
         return False
 
+    def on(self):
+        """Turns on device, keeping the time for the TTFF."""
+        DEVICE.on(self)
+        powered[self.name] = utime.ticks_ms()
+
+    def _configure(self):
+        """Restricts the output to RMC at the configured fix interval and enables EASY."""
+        config = self.config["Gps"].get("Fast_Fix")
+        if not config:
+            return
+        self.uart.write(build("PMTK314,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0"))  # RMC only.
+        self.uart.write(build("PMTK220,{}".format(config["Fix_Interval"])))  # ms between fixes.
+        if config["Easy"]:
+            self.uart.write(build("PMTK869,1,1"))  # Ephemeris prediction.
+
+    def _adapt_warmup(self, ttff, censored):
+        """Updates the TTFF histogram and the warmup the next power on is planned with.
+
+        A fix already there at the acquisition start says only that the TTFF
+        was shorter than the warmup, which is then probed down, never below
+        the 90th percentile of the observed TTFF plus a margin; a fix that
+        took longer sets the warmup to that floor.
+
+        Params:
+            ttff(float): sec. from power on to the first valid fix
+            censored(bool): fix found at the acquisition start
+        """
+        config = self.config["Gps"].get("Fast_Fix")
+        if not config:
+            return
+        if not censored:
+            if self.name not in ttffs:
+                ttffs[self.name] = array("H", bytes(2 * TTFF_BINS))
+            ttffs[self.name][min(int(ttff // TTFF_BIN), TTFF_BINS - 1)] += 1
+        floor = config["Min_Warmup"]
+        if self.name in ttffs:
+            histogram = ttffs[self.name]
+            total = sum(histogram)
+            count = 0
+            for i in range(TTFF_BINS):
+                count += histogram[i]
+                if count >= total * 0.9:
+                    break
+            floor = max(floor, min(self.cold_warmup, (i + 1) * TTFF_BIN + config["Margin"]))
+        if censored:
+            warmup = max(floor, int(self.config["Warmup_Duration"] * 0.75))
+        else:
+            warmup = floor
+        warmups[self.name] = warmup
+        utils.log_file("{} => TTFF {}{:.1f} s, next warmup {} s".format(self.name, "<" if censored else "", ttff, warmup), constants.LOG_LEVEL)
+
     def main(self):
         """Read nmea messages and search for RMC valid strings."""
         utils.log_file("{} => acquiring data...".format(self.name), constants.LOG_LEVEL)
+        self._configure()
+        start = utime.ticks_ms()
         while True:
             if not self.status() == "READY":
                 utils.log_file("{} => timeout occourred".format(self.name), constants.LOG_LEVEL, True)  # DEBUG
+                self.count(timing.TIMEOUTS)
+                if self.config["Gps"].get("Fast_Fix") and self.name in warmups:
+                    del warmups[self.name]  # No fix, back to the cold start warmup.
                 return False
             if self.uart.any():
-                if self.get_sentence(self.uart.readchar(), "RMC"):
-                    if not self.sentence[2] == "A":
+                data = self.uart.read(self.uart.any())
+                self.count(timing.BYTES, len(data))
+                for sentence in self.get_sentences(data):
+                    if not sentence.valid:
                         utils.log_file("{} => invalid data received".format(self.name), constants.LOG_LEVEL, True)  # DEBUG
+                        self.count(timing.REJECTED)
                     else:
+                        self.board_time = clock.board_time()  # Rtc at fix reception, for sync_rtc.
+                        self.count(timing.FRAMES)
+                        if self.name in powered:
+                            now = utime.ticks_ms()
+                            self._adapt_warmup(utime.ticks_diff(now, powered.pop(self.name)) / 1000, utime.ticks_diff(now, start) < CENSOR_WINDOW * 1000)
                         print(self.sentence)
                         return True
 
     def log(self):
         """Writes out acquired data to file."""
-        utils.log_data("$" + ",".join(map(str, self.sentence)))
+        utils.log_data(str(self.sentence))
         return
 
     def sync_rtc(self):
-        """Synchronizes rtc with gps data."""
-        if self.is_valid_gprmc():
+        """Synchronizes rtc with gps data.
+
+        With a Gps.Clock config the rtc is disciplined: its drift is trimmed
+        by calibration, it is stepped only beyond half the Max_Error and the
+        sync interval is stretched up to Max_Interval.
+        """
+        fix = self.sentence
+        if not fix.valid:
+            return
+        config = self.config["Gps"].get("Clock")
+        if not config:
             utils.log_file("{} => syncyng rtc...".format(self.name), constants.LOG_LEVEL)
-            utc_time = self.sentence[1]
-            utc_date = self.sentence[9]
             rtc = pyb.RTC()
             try:
-                rtc.datetime((int("20"+utc_date[4:6]), int(utc_date[2:4]), int(utc_date[0:2]), 0, int(utc_time[0:2]), int(utc_time[2:4]), int(utc_time[4:6]), float(utc_time[6:])))  # rtc.datetime(yyyy, mm, dd, 0, hh, ii, ss, sss)
+                utc = utime.localtime(fix.utc)
+                rtc.datetime((utc[0], utc[1], utc[2], utc[6] + 1, utc[3], utc[4], utc[5], 0))  # rtc.datetime(yyyy, mm, dd, wd, hh, ii, ss, sss)
                 utils.log_file("{} => rtc successfully synchronized (UTC: {})".format(self.name, utils.time_string(utime.time())), constants.LOG_LEVEL)
             except:
-                utils.log_file("{} => unable to synchronize rtc".format(self.name, utils.time_string(utime.time())), constants.LOG_LEVEL)
+                utils.log_file("{} => unable to synchronize rtc".format(self.name), constants.LOG_LEVEL)
+            return
+        if clock.discipline is None:
+            clock.discipline = clock.CLOCK(config["Max_Error"], config["Min_Interval"], config["Max_Interval"])
+        discipline = clock.discipline
+        interval = discipline.sync(fix.utc + fix.subseconds, self.board_time)  # Planned by event_interval().
+        utils.log_file("{} => rtc offset {:+.3f} s, drift {:+.2f} ppm, calibration {}, next sync in {} s".format(self.name, discipline.offset, discipline.drift, discipline.calibration, interval), constants.LOG_LEVEL)
         return
 
+    def event_interval(self, event, interval):
+        """Plans sync_rtc with the interval adapted by the rtc discipline.
+
+        sync_rtc runs only while the gps is on, so an adapted interval longer
+        than the power cycle of the other events is rounded down to a multiple
+        of it, otherwise the syncs would fall on the common multiples only.
+        """
+        if event == "sync_rtc" and clock.discipline is not None:
+            interval = clock.discipline.interval
+            cycle = self._power_cycle()
+            if interval > cycle:
+                return interval - interval % cycle
+        return interval
+
+    def _power_cycle(self):
+        """Returns the interval (sec.) the scheduler powers the gps at for the
+        events other than sync_rtc."""
+        events = constants.SCHEDULER.get(self.__qualname__ + "_" + self.instance, {})
+        intervals = [events[event] for event in events if event != "sync_rtc"]
+        if not "log" in events:
+            intervals.append(constants.DATA_ACQUISITION_INTERVAL)
+        return min(intervals)
+
     def last_fix(self):
         """Stores last gps valid position and utc."""
-        if self.is_valid_gprmc():
+        fix = self.sentence
+        if fix.valid:
             utils.log_file("{} => saving last gps fix...".format(self.name), constants.LOG_LEVEL)
-            utc_time = self.sentence[1]
-            utc_date = self.sentence[9]
-            lat = "{}{}".format(self.sentence[3], self.sentence[4])
-            lon = "{}{}".format(self.sentence[5], self.sentence[6])
-            utc = "{}-{}-{} {}:{}:{}".format("20"+utc_date[4:6], utc_date[2:4], utc_date[0:2], utc_time[0:2], utc_time[2:4], utc_time[4:6])
-            speed = "{}".format(self.sentence[7])
-            heading = "{}".format(self.sentence[8])
-            utils.gps = (utc, lat, lon, speed, heading)
-            utils.log_file("{} => last fix (UTC: {} POSITION: {} {}, SPEED: {}, HEADING: {})".format(self.name, utc, lat, lon, speed, heading), constants.LOG_LEVEL)  # DEBUG
+            utils.gps = (fix.utc, fix.lat, fix.lon, fix.speed, fix.course)
+            utils.log_file("{} => last fix (UTC: {} POSITION: {:.5f} {:.5f}, SPEED: {}, HEADING: {})".format(self.name, utils.time_string(fix.utc), fix.lat, fix.lon, fix.speed, fix.course), constants.LOG_LEVEL)  # DEBUG
+            self._anchor_watch(fix)
         return
 
-    def displacement(self):
-        # approximate radius of earth in km
-        R = 6373.0
-        lat1 = radians(utils.gps())
-        lon1 = radians(21.0122287)
-        lat2 = radians(52.406374)
-        lon2 = radians(16.9251681)
-
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    def _anchor_watch(self, fix):
+        """Checks a valid fix against the anchor watch circle, raising an alarm
+        record when the buoy leaves it.
 
-        distance = R * c
-
-        print("Result:", distance)
-        print("Should be:", 278.546, "km")
+        Params:
+            fix(RMC)
+        """
+        config = self.config["Gps"].get("Anchor")
+        if not config:
+            return
+        if anchor.watch is None:
+            if config["Lat"] != "" and config["Lon"] != "":
+                anchor.watch = anchor.ANCHOR(config["Radius"], float(config["Lat"]), float(config["Lon"]))
+            else:
+                reference = anchor.load()  # Kept across reboots, a dragged buoy must not re-anchor.
+                if reference is None:
+                    reference = (fix.lat, fix.lon)
+                    anchor.save(fix.lat, fix.lon)
+                    utils.log_file("{} => anchor watch set at {:.5f} {:.5f}".format(self.name, fix.lat, fix.lon), constants.LOG_LEVEL)
+                anchor.watch = anchor.ANCHOR(config["Radius"], reference[0], reference[1])
+        watch = anchor.watch
+        raised = watch.update(fix.lat, fix.lon, fix.utc)
+        speed, direction = watch.drift()
+        if raised:
+            utils.log_file("{} => ALARM buoy off station {:.0f} m at {:.0f} deg (radius {} m)".format(self.name, watch.distance, watch.bearing, watch.radius), constants.LOG_LEVEL)
+            utils.log_data(constants.DATA_SEPARATOR.join([
+                config["String_Label"],
+                utils.unix_epoch(fix.utc),
+                utils.datestamp(fix.utc),  # YYMMDD
+                utils.timestamp(fix.utc),  # hhmmss
+                "{:.5f}".format(fix.lat),
+                "{:.5f}".format(fix.lon),
+                "{:.0f}".format(watch.distance),  # distance from anchor (m)
+                "{:.0f}".format(watch.bearing),  # bearing from anchor (deg)
+                "{:.2f}".format(speed),  # drift speed (m/s)
+                "{:.0f}".format(direction)  # drift direction (deg)
+                ]))
+        elif watch.alarm:
+            utils.log_file("{} => buoy still off station {:.0f} m, drifting {:.2f} m/s at {:.0f} deg".format(self.name, watch.distance, speed, direction), constants.LOG_LEVEL)
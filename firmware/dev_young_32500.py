@@ -21,30 +21,47 @@
 # SOFTWARE.
 
 import utime
-from device import DEVICE
-from tools.nmea import NMEA
+import _thread
+from device import DEVICE, TASK
+from tools.deadline import DEADLINE
+from tools.nmea import NMEA, XDR
+from tools.stats import STATS, CIRCULAR, RUNNING, sin10, cos10
+from math import atan2, degrees
 import tools.utils as utils
+import tools.timing as timing
 import constants
-from math import sin, cos, radians, atan2, degrees, pow, sqrt
 
 #define PRESS_CONV_FACT(X) (X*0.075+800.00) //per barometro young modello 61201 VECCHIA !!!!
 #define PRESS_CONV_FACT(X) (X*0.125+600.00)   //per barometro young modello 61202V NUOVA !!!!
 
+"""WMO gust averaging window (sec.)."""
+GUST_WINDOW = 3
+
+"""Silence (sec.) after which the continuous mode stops."""
+STREAM_TIMEOUT = 10
+
+"""Time (ms) given to the streaming thread to leave the uart once stopped."""
+STOP_TIMEOUT = 1000
+
+"""Contains pairs device:METEO of the instruments streaming in continuous mode."""
+streams = {}
+
 class METEO(DEVICE, NMEA):
 
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up"),
+        "log":TASK("log", main=True)
+        })
+
     def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
         DEVICE.__init__(self, *args, **kwargs)
         NMEA.__init__(self, *args, **kwargs)
-        data_tasks = ["log"]
+        self.set_filter(self.config["String_To_Acquire"])
+        self.line = None  # STRING frame being received, None until the first \n.
         if "tasks" in kwargs:
-            if any(elem in data_tasks for elem in kwargs["tasks"]):
-                if self.main():
-                    for task in kwargs["tasks"]:
-                        eval("self." + task + "()", {"self":self})
-            else:
-                for task in kwargs["tasks"]:
-                    eval("self." + task + "()", {"self":self})
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
@@ -52,207 +69,117 @@ class METEO(DEVICE, NMEA):
             return True
         return False
 
-    def _wd_vect_avg(self, strings):
-        """Calculates wind vector average direction.
-
-        Params:
-            strings(list)
-        Returns:
-            avg(float)
-        """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append([int(sample[0])* float(self.config["Meteo"]["Windspeed_"+self.config["Meteo"]["Windspeed_Unit"]]), int(sample[1])/10])
-            x = 0
-            y = 0
-            for sample in sample_list:
-                direction = sample[1]
-                speed = sample[0]
-                x = x + (math.sin(math.radians(direction)) * speed)
-                y = y + (math.cos(math.radians(direction)) * speed)
-            avg = math.degrees(math.atan2(x, y))
-            if avg < 0:
-                avg += 360
-        except:
-            pass
-        return avg
-
-    def _ws_vect_avg(self, strings):
-        """Calculates wind vector average speed.
-
-        Params:
-            strings(list)
-        Returns:
-            avg(float)
-        """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append([int(sample[0])* float(self.config["Meteo"]["Windspeed_"+self.config["Meteo"]["Windspeed_Unit"]]), int(sample[1])/10])
-            x = 0
-            y = 0
-            for sample in sample_list:
-                direction = sample[1]
-                speed = sample[0]
-                x = x + (math.sin(math.radians(direction)) * math.pow(speed,2))
-                y = y + (math.cos(math.radians(direction)) * math.pow(speed,2))
-            avg = math.sqrt(x+y) / len(sample_list)
-        except:
-            pass
-        return avg
-
-    def _ws_avg(self, strings):
-        """Calculates average wind speed.
-
-        Params:
-            strings(list)
-        Returns:
-            avg(float)
-        """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append(int(sample[0]) * float(self.config["Meteo"]["Windspeed_"+self.config["Meteo"]["Windspeed_Unit"]]))
-            avg = sum(sample_list) / len(sample_list)
-        except:
-            pass
-        return avg
-
-    def _ws_max(self, strings):
-        """Calculates max wind speed (gust).
-
-        Params:
-            strings(list)
-        Returns:
-            max(float)
-        """
-        max = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append(int(sample[0]) * float(self.config["Meteo"]["Windspeed_"+self.config["Meteo"]["Windspeed_Unit"]]))
-            max = max(sample_list)
-        except:
-            pass
-        return max
-
-    def _wd_max(self, strings):
-        """Calculates gust direction.
-
-        Params:
-            strings(list)
-        Returns:
-            max(float)
-        """
-        max = 0
-        try:
-            for sample in strings:
-                if sample[0] == self._ws_max(strings):
-                    max = sample[1] / 10
-        except:
-            pass
-        return max
+    def _reset_stats(self):
+        """Creates the accumulators updated as each frame arrives."""
+        meteo = self.config["Meteo"]
+        self.factors = (
+            float(meteo["Windspeed_" + meteo["Windspeed_Unit"]]),
+            float(meteo["Temp_Conv_0"]),
+            float(meteo["Temp_Conv_1"]),
+            float(meteo["Press_Conv_0"]),
+            float(meteo["Press_Conv_1"]),
+            float(meteo["Hum_Conv_0"]),
+            float(meteo["Rad_Conv_0"])
+            )
+        self.wind = CIRCULAR()  # Direction weighted by speed.
+        self.direction = CIRCULAR()  # Unweighted, for the direction std.
+        self.speed = STATS()  # Argmax is the gust direction.
+        self.window = RUNNING(GUST_WINDOW * int(self.config["Sample_Rate"]))
+        self.window_x = RUNNING(self.window.size)  # Direction unit vectors over the gust window.
+        self.window_y = RUNNING(self.window.size)
+        self.gust = STATS()  # Max of the running means, argmax is its direction.
+        self.temp = STATS()
+        self.press = STATS()
+        self.hum = STATS()
+        self.heading = CIRCULAR()
+        self.rad = STATS()
 
-    def _temp_avg(self, strings):
-        """Calculates average air temperature.
+    def _add_string(self, fields):
+        """Accumulates a STRING frame, raw counts are converted with the config factors.
 
         Params:
-            strings(list)
+            fields(list): wind speed, direction, temp, press, hum, rad, heading counts
         Returns:
-            avg(float)
+            True or False if malformed
         """
-        avg = 0
-        sample_list = []
+        factors = self.factors
         try:
-            for sample in strings:
-                sample_list.append(int(sample[2]) * float(self.config["Meteo"]["Temp_Conv_0"]) - float(self.config["Meteo"]["Temp_Conv_1"]))
-            avg = sum(sample_list) / len(sample_list)
+            speed = int(fields[0]) * factors[0]
+            direction = int(fields[1]) % 3600
+            temp = int(fields[2]) * factors[1] - factors[2]
+            press = int(fields[3]) * factors[3] + factors[4]
+            hum = int(fields[4]) * factors[5]
+            rad = int(fields[5]) * factors[6]
+            heading = int(fields[6]) % 3600
         except:
-            pass
-        return avg
-
-    def _press_avg(self, strings):
-        """Calculates average barometric pressure.
-
-        Params:
-            strings(list)
-        Returns:
-            avg(float)
-        """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append(int(sample[3]) * float(self.config["Meteo"]["Press_Conv_0"]) + float(self.config["Meteo"]["Press_Conv_1"]))
-            avg = sum(sample_list) / len(sample_list)
-        except:
-            pass
-        return avg
+            return False
+        self._add_wind(speed, direction)
+        self.temp.add(temp)
+        self.press.add(press)
+        self.hum.add(hum)
+        self.rad.add(rad)
+        self.heading.add_tenths(heading)
+        return True
 
-    def _hum_avg(self, strings):
-        """Calculates average relative humidity.
+    def _add_sentence(self, sentence):
+        """Accumulates a NMEA sentence.
 
         Params:
-            strings(list)
+            sentence(MWV or XDR)
         Returns:
-            avg(float)
+            True if a wind sample, False if invalid, None otherwise
         """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append(int(sample[4]) * float(self.config["Meteo"]["Hum_Conv_0"]))
-            avg = sum(sample_list) / len(sample_list)
-        except:
-            pass
-        return avg
+        if isinstance(sentence, XDR):
+            for stats, id, factor in ((self.temp, "TEMP", 1), (self.press, "BARO", 1000), (self.hum, "%RH", 1)):
+                value = sentence.measurement(id)
+                if value is not None:
+                    stats.add(value * factor)
+            return None
+        if not sentence.valid or sentence.speed is None or sentence.angle is None:
+            return False
+        self._add_wind(sentence.speed, int(sentence.angle * 10 + 0.5) % 3600)
+        return True
 
-    def _compass_avg(self, strings):
-        """Calculates average heading.
+    def _add_wind(self, speed, direction):
+        """Accumulates a wind sample.
 
         Params:
-            strings(list)
-        Returns:
-            avg(float)
+            speed(float)
+            direction(int): tenths of degree
         """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append(int(sample[6]) / 10)
-            x = 0
-            y = 0
-            for sample in sample_list:
-                x = x + math.sin(math.radians(sample))
-                y = y + math.cos(math.radians(sample))
-            avg = math.degrees(math.atan2(x, y))
-            if avg < 0:
-                avg += 360
-        except:
-            pass
-        return avg
-
-    def _radiance_avg(self, strings):
-        """Calculates average solar radiance.
+        self.wind.add_tenths(direction, speed)
+        self.direction.add_tenths(direction)
+        self.speed.add(speed, direction / 10)
+        gust = self.window.add(speed)
+        x = self.window_x.add(sin10(direction))
+        y = self.window_y.add(cos10(direction))
+        if gust is not None:
+            self.gust.add(gust, degrees(atan2(x, y)) % 360)  # Mean direction of the gust window.
 
-        Params:
-            strings(list)
-        Returns:
-            avg(float)
-        """
-        avg = 0
-        sample_list = []
-        try:
-            for sample in strings:
-                sample_list.append(int(sample[5]) * float(self.config["Meteo"]["Rad_Conv_0"]))
-            avg = sum(sample_list) / len(sample_list)
-        except:
-            pass
-        return avg
+    def _stats_fields(self):
+        """Returns the record fields, empty if the instrument did not provide the quantity."""
+        fields = []
+        for value, stats in (
+                (self.wind.mean(), self.wind),  # vectorial avg wind direction
+                (self.speed.mean(), self.speed),  # avg wind speed
+                (self.temp.mean(), self.temp),  # avg temp
+                (self.press.mean(), self.press),  # avg pressure
+                (self.hum.mean(), self.hum),  # avg relative humidity
+                (self.heading.mean(), self.heading),  # avg heading
+                (self.wind.resultant(), self.wind),  # vectorial avg wind speed
+                (self.speed.max, self.speed),  # gust speed
+                (self.speed.argmax, self.speed)):  # gust direction
+            fields.append("{:.1f}".format(value) if stats.count else "")
+        fields.append("{:0d}".format(self.speed.count))  # number of strings
+        fields.append("{:.1f}".format(self.rad.mean()) if self.rad.count else "")  # solar radiance (optional)
+        for value, stats in (
+                (self.direction.std(), self.direction),  # wind direction std (Yamartino)
+                (self.speed.std(), self.speed),  # wind speed std
+                (self.gust.max, self.gust),  # 3 s gust speed, empty if fewer samples than the window
+                (self.gust.argmax, self.gust)):  # 3 s gust direction
+            fields.append("{:.1f}".format(value) if stats.count else "")
+        fields.append("{:.2f}".format(self.speed.std() / self.speed.mean()) if self.speed.mean() else "")  # turbulence intensity
+        return fields
 
     def main(self):
         """Gets data from weather station
@@ -286,60 +213,147 @@ class METEO(DEVICE, NMEA):
         Returns:
             None
         """
+        stream = streams.get(self.name)
+        if stream:
+            return self._snapshot(stream)
         utils.log_file("{} => acquiring data...".format(self.name), constants.LOG_LEVEL)
         self.led_on()
-        string_count = 0
-        new_string = False
-        string = ""
-        strings = []
+        self._reset_stats()
         self.data = []
-        start = utime.time()
-        while string_count < self.config["Samples"]:
+        while self.speed.count < self.config["Samples"]:
             if not self.status() == "READY":
                 utils.log_file("{} => timeout occourred".format(self.name), constants.LOG_LEVEL, True)  # DEBUG
+                self.count(timing.TIMEOUTS)
                 return False
             if self.uart.any():
-                char = self.uart.readchar()
-                if self.config["Data_Format"] == "STRING":
-                    if chr(char) == "\n":
-                        new_string = True
-                    elif chr(char) == "\r":
-                        if new_string:
-                            strings.append(string.split(self.config["Data_Separator"]))
-                            string = ""
-                            new_string = False
-                            string_count += 1
-                    else:
-                        if new_string:
-                            string = string + chr(char)
-                elif self.config["Data_Format"] == "NMEA":
-                    self.get_sentence(char)
-                    if self.checksum_verified:
-                        if self.sentence[0] in self.config["String_To_Acquire"]:
-                            if self.sentence[0] == "WIMWV":
-                                valid_data = False
-                                if self.sentence[5] == "A":
-                                    return True
-                                else:
-                                    utils.log_file("{} => invalid data received".format(self.name), constants.LOG_LEVEL, True)  # DEBUG
+                self._read()
+        self._record()
+        if "Continuous" in self.config and self.speed.mean() >= self.config["Continuous"]["Enable_Above"]:
+            self._start_stream()
+        return True
+
+    def _read(self):
+        """Feeds the available bytes to the accumulators.
+
+        Returns:
+            samples(int): number of wind samples added
+        """
+        data = self.uart.read(self.uart.any())
+        if not data:
+            return 0
+        self.count(timing.BYTES, len(data))
+        samples = 0
+        if self.config["Data_Format"] == "STRING":
+            for char in data:
+                if char == 10:  # \n
+                    self.line = bytearray()
+                elif char == 13:  # \r
+                    if self.line is not None:
+                        if self._add_string(self.line.decode("ascii", "ignore").split(self.config["Data_Separator"])):
+                            samples += 1
+                            self.count(timing.FRAMES)
+                        else:
+                            self.count(timing.REJECTED)
+                        self.line = None
+                elif self.line is not None:
+                    self.line.append(char)
+        elif self.config["Data_Format"] == "NMEA":
+            for sentence in self.get_sentences(data):
+                valid = self._add_sentence(sentence)
+                if valid:
+                    samples += 1
+                    self.count(timing.FRAMES)
+                elif valid is False:
+                    utils.log_file("{} => invalid data received".format(self.name), constants.LOG_LEVEL, True)  # DEBUG
+                    self.count(timing.REJECTED)
+        return samples
+
+    def _record(self):
+        """Formats the accumulated statistics as a data record."""
         epoch = utime.time()
-        self.data.append(self.config["String_Label"])
-        self.data.append(utils.unix_epoch(epoch))
-        self.data.append(utils.datestamp(epoch))  # YYMMDD
-        self.data.append(utils.timestamp(epoch))  # hhmmss
-        self.data.append("{:.1f}".format(self._wd_vect_avg(strings)))  # vectorial avg wind direction
-        self.data.append("{:.1f}".format(self._ws_avg(strings)))  # avg wind speed
-        self.data.append("{:.1f}".format(self._temp_avg(strings)))  # avg temp
-        self.data.append("{:.1f}".format(self._press_avg(strings)))  # avg pressure
-        self.data.append("{:.1f}".format(self._hum_avg(strings)))  # avg relative humidity
-        self.data.append("{:.1f}".format(self._compass_avg(strings)))  # avg heading
-        self.data.append("{:.1f}".format(self._ws_vect_avg(strings)))  # vectorial avg wind speed
-        self.data.append("{:.1f}".format(self._ws_max(strings)))  # gust speed
-        self.data.append("{:.1f}".format(self._wd_max(strings)))  # gust direction
-        self.data.append("{:0d}".format(len(strings)))  # number of strings
-        self.data.append("{:.1f}".format(self._radiance_avg(strings)))  # solar radiance (optional)
+        self.data = [
+            self.config["String_Label"],
+            utils.unix_epoch(epoch),
+            utils.datestamp(epoch),  # YYMMDD
+            utils.timestamp(epoch)  # hhmmss
+            ]
+        self.data.extend(self._stats_fields())
+
+    def _start_stream(self):
+        """Keeps the instrument powered and streams frames into the accumulators
+        from a thread, a record is taken at every log event.
+        """
+        utils.log_file("{} => wind above {} m/s, continuous mode on".format(self.name, self.config["Continuous"]["Enable_Above"]), constants.LOG_LEVEL)
+        self.lock = _thread.allocate_lock()
+        self.running = True
+        self.stopped = False
+        self._reset_stats()
+        streams[self.name] = self
+        _thread.start_new_thread(self._stream, ())
+
+    def _stream(self):
+        """Streaming thread, stops if the instrument goes silent. The uart is
+        only touched holding the lock, stopped is set once the thread is done
+        with it."""
+        deadline = DEADLINE(STREAM_TIMEOUT * 1000)
+        while True:
+            with self.lock:
+                if not self.running:
+                    break
+                if self.uart.any():
+                    if self._read():
+                        deadline.set()
+                    continue
+                if deadline.expired():
+                    utils.log_file("{} => no data coming from serial, continuous mode off".format(self.name), constants.LOG_LEVEL)
+                    self.count(timing.TIMEOUTS)
+                    self.running = False
+                    streams.pop(self.name, None)
+                    break
+            utime.sleep_ms(10)
+        self.stopped = True
+
+    def _stop_stream(self):
+        """Stops the streaming thread and waits for it to leave the uart, so
+        that the device can be turned off."""
+        with self.lock:
+            self.running = False
+            streams.pop(self.name, None)
+        deadline = DEADLINE(STOP_TIMEOUT)
+        while not self.stopped and not deadline.expired():
+            utime.sleep_ms(10)
+
+    def _snapshot(self, stream):
+        """Takes the record accumulated by the streaming thread since the previous
+        log event and restarts the accumulators.
+
+        Params:
+            stream(METEO): the object running the streaming thread
+        Returns:
+            True or False if no samples
+        """
+        with stream.lock:
+            if not stream.speed.count:
+                return False
+            stream._record()
+            self.data = stream.data
+            speed = stream.speed.mean()
+            stream._reset_stats()
+        if speed < self.config["Continuous"]["Disable_Below"]:
+            utils.log_file("{} => wind below {} m/s, continuous mode off".format(self.name, self.config["Continuous"]["Disable_Below"]), constants.LOG_LEVEL)
+            stream._stop_stream()
         return True
 
+    def off(self):
+        """Turns off device, unless streaming in continuous mode: it is set
+        back to on so that the next log event needs no warmup.
+        """
+        if self.name in streams:
+            utils.status_table[self.name] = 1
+            utils.log_file("{} => continuous mode, kept on".format(self.name), constants.LOG_LEVEL)
+            return
+        DEVICE.off(self)
+
     def log(self):
         """Writes out acquired data to file."""
         utils.log_data(",".join(map(str, self.data)))
@@ -22,16 +22,43 @@
 
 import pyb
 import utime
+import uselect
 import tools.utils as utils
+import tools.timing as timing
 import constants
 
+class TASK(object):
+    """Describes an entry of a device task table.
+
+    Params:
+        method(str): device method executing the task
+        main(bool): task needs fresh data from main()
+        duration(int): expected duration (sec.), acquisition excluded, the
+            scheduler keeps the device ready at least as long
+    """
+
+    def __init__(self, method, main=False, duration=0):
+        self.method = method
+        self.main = main
+        self.duration = duration
+
 class DEVICE(object):
 
+    task_table = {
+        "init_power":TASK("init_power"),
+        "on":TASK("on"),
+        "off":TASK("off"),
+        "toggle":TASK("toggle")
+        }  # {task:TASK,...}
+
     def __init__(self, *args, **kwargs):
         self.instance = args[0]
+        self.__qualname__ = type(self).__name__  # Instances have no __qualname__ on CPython.
+        self.counters = timing.counters()
         self.name = self.__module__ + "." + self.__qualname__ + "_" + self.instance
         self.get_config()
-        self.init_uart()
+        if utils.status_table.get(self.name) != 0:  # Off devices get their uart back on power up.
+            self.init_uart()
         self.init_gpio()
         self.init_led()
 
@@ -45,29 +72,82 @@ class DEVICE(object):
             return False
 
     def init_uart(self):
-        """Initializes the uart bus."""
+        """Initializes the uart bus.
+
+        The uart outlives the device object: it is kept in utils.uarts and
+        reused as is by the next acquisition cycle, so bytes received in the
+        meantime stay in its rx buffer. It is reinitialized only if the
+        settings changed and released by off() of the last device sharing the
+        bus. The poll object wait_uart() sleeps on is registered once per uart
+        and kept along with it.
+
+        Returns:
+            True or False
+        """
         if "Uart" in self.config:
             try:
-                self.uart = pyb.UART(int(constants.UARTS[constants.DEVICES[self.__qualname__ + "_" + self.instance]]), int(self.config["Uart"]["Baudrate"]))
-                self.uart.init(int(self.config["Uart"]["Baudrate"]),
-                    bits=int(self.config["Uart"]["Bits"]),
-                    parity=eval(self.config["Uart"]["Parity"]),
-                    stop=int(self.config["Uart"]["Stop"]),
-                    timeout=int(self.config["Uart"]["Timeout"]),
-                    flow=int(self.config["Uart"]["Flow_Control"]),
-                    timeout_char=int(self.config["Uart"]["Timeout_Char"]),
-                    read_buf_len=int(self.config["Uart"]["Read_Buf_Len"]))
+                self.bus = int(self.config["Uart"]["Bus"])
+                if self.__qualname__ + "_" + self.instance in constants.DEVICES:
+                    self.bus = int(constants.UARTS[constants.DEVICES[self.__qualname__ + "_" + self.instance]])
+                settings = (
+                    int(self.config["Uart"]["Baudrate"]),
+                    int(self.config["Uart"]["Bits"]),
+                    self.config["Uart"]["Parity"],
+                    int(self.config["Uart"]["Stop"]),
+                    int(self.config["Uart"]["Timeout"]),
+                    int(self.config["Uart"]["Flow_Control"]),
+                    int(self.config["Uart"]["Timeout_Char"]),
+                    int(self.config["Uart"]["Read_Buf_Len"])
+                    )
+                users = utils.uarts[self.bus][3] if self.bus in utils.uarts else set()
+                users.add(self.name)
+                if self.bus in utils.uarts and utils.uarts[self.bus][1] == settings:
+                    self.uart, _, self.poll, _ = utils.uarts[self.bus]
+                    return True
+                self.uart = pyb.UART(self.bus, settings[0])
+                self.uart.init(settings[0],
+                    bits=settings[1],
+                    parity=eval(settings[2]),
+                    stop=settings[3],
+                    timeout=settings[4],
+                    flow=settings[5],
+                    timeout_char=settings[6],
+                    read_buf_len=settings[7])
+                self.poll = uselect.poll()
+                self.poll.register(self.uart, uselect.POLLIN)
+                utils.uarts[self.bus] = (self.uart, settings, self.poll, users)
+                return True
             except (ValueError) as err:
                 utils.log_file("{} => {}.".format(self.name, err), constants.LOG_LEVEL)
+        return False
 
     def deinit_uart(self):
-        """Deinitializes the uart bus."""
+        """Deinitializes and releases the uart bus, a bus shared with devices
+        still on is only released."""
+        if self.bus in utils.uarts and utils.uarts[self.bus][0] is self.uart:
+            users = utils.uarts[self.bus][3]
+            users.discard(self.name)
+            if users:
+                return
+            del utils.uarts[self.bus]
         self.uart.deinit()
 
     def flush_uart(self):
         """Flushes the uart read buffer."""
         self.uart.read()
 
+    def wait_uart(self, deadline):
+        """Sleeps until the uart receives or the deadline expires.
+
+        Params:
+            deadline(DEADLINE)
+        Returns:
+            bytes waiting(int)
+        """
+        if not self.uart.any():
+            self.poll.poll(deadline.remaining_ms())
+        return self.uart.any()
+
     def init_gpio(self):
         """Creates the device pin object."""
         if "Ctrl_Pin" in self.config:
@@ -93,17 +173,28 @@ class DEVICE(object):
         self.led.off()
 
     def init_power(self):
-        """Initializes power status at startup."""
+        """Initializes power status at startup.
+
+        Returns:
+            True if the device has been powered on, False otherwise.
+        """
         if self.config["Status"] == 1:
+            if utils.status_table.get(self.name):  # Already powered, e.g. by the start up orchestrator.
+                if not hasattr(self, "uart"):
+                    self.init_uart()
+                return True
             utime.sleep_ms(100)
             self.on()
-        else:
-            self.off()
+            return True
+        self.off()
+        return False
 
     def on(self):
         """Turns on device."""
         if hasattr(self, "gpio"):
             self.gpio.on()  # set pin to off
+        if not hasattr(self, "uart"):
+            self.init_uart()
         utils.status_table[self.name] = 1
         utils.log_file("{} => ON".format(self.name), constants.LOG_LEVEL)  #
         return
@@ -112,6 +203,9 @@ class DEVICE(object):
         """Turns off device."""
         if hasattr(self, "gpio"):
             self.gpio.off()  # set pin to off
+        if hasattr(self, "uart"):
+            self.deinit_uart()
+            del self.uart
         utils.status_table[self.name] = 0
         utils.log_file("{} => OFF".format(self.name), constants.LOG_LEVEL)  # DEBUG
         return
@@ -125,6 +219,99 @@ class DEVICE(object):
                 self.gpio.on()
         return
 
+    def event_interval(self, event, interval):
+        """Returns the interval the scheduler plans an event with, devices
+        adapting it at run time override this.
+
+        Params:
+            event(str): task scheduled in SCHEDULER
+            interval(int): configured interval (sec.)
+        Returns:
+            interval(int)
+        """
+        return interval
+
+    def get_task(self, task):
+        """Returns the bound method executing a task.
+
+        Params:
+            task(str)
+        Returns:
+            method or None
+        """
+        if task in self.task_table:
+            return getattr(self, self.task_table[task].method)
+        utils.log_file("{} => unknown task {}".format(self.name, task), constants.LOG_LEVEL)
+        return
+
+    def run_tasks(self, tasks):
+        """Executes tasks through the device task table, main() runs once
+        if any of them needs fresh data.
+
+        Params:
+            tasks(list)
+        Returns:
+            True or False
+        """
+        methods = []
+        for task in tasks:
+            method = self.get_task(task)
+            if method is None:
+                return False
+            methods.append(method)
+        if any(self.task_table[task].main for task in tasks):
+            if not self._timed("main", self.main):
+                return False
+        for i in range(len(tasks)):
+            self._timed(tasks[i], methods[i])
+        return True
+
+    def _timed(self, task, method):
+        """Runs a task method recording its timing and counters.
+
+        Params:
+            task(str)
+            method(method)
+        Returns:
+            the method result
+        """
+        for i in range(len(self.counters)):
+            self.counters[i] = 0
+        start = timing.start()
+        result = method()
+        timing.record(self.name, task, start, self.counters)
+        return result
+
+    def count(self, counter, n=1):
+        """Increments a task counter.
+
+        Params:
+            counter(int): timing.BYTES, FRAMES, REJECTED or TIMEOUTS
+            n(int)
+        """
+        self.counters[counter] += n
+
+    def tasks_duration(self, tasks):
+        """Returns the expected duration of a list of tasks.
+
+        Params:
+            tasks(list)
+        Returns:
+            duration(int): sec.
+        """
+        duration = 0
+        main = False
+        for task in tasks:
+            if task in self.task_table:
+                duration += self.task_table[task].duration
+                main = main or self.task_table[task].main or self.task_table[task].method == "main"
+        if main:
+            try:
+                duration += self.config["Samples"] // self.config["Sample_Rate"]
+            except:
+                pass
+        return duration
+
     def status(self, status=None):
         """Returns or sets the current device status."""
         for key, value in constants.DEVICE_STATUS.items():
@@ -24,6 +24,7 @@ import pyb
 import utime
 import uos
 import tools.utils as utils
+import tools.timing as timing
 import constants
 import _thread
 import ubinascii
@@ -50,6 +51,7 @@ class MENU(object):
         "[2] DATA FILES\r\n" +
         "[3] NEXT EVENTS\r\n" +
         "[4] LAST LOG\r\n" +
+        "[5] TIMING\r\n" +
         "[BACKSPACE] BACK TO SCHEDULED MODE")
 
     def _devices_menu(self):
@@ -143,6 +145,13 @@ class MENU(object):
                 print("{} ({}) ".format(device, constants.DEVICE_STATUS[utils.status_table[device.__qualname__]]), end="")
             print("\r")
 
+    def _get_timing(self):
+        """Shows per device task timings, slowest first."""
+        print("\r\n\r\nTIMING (last {} tasks)".format(timing.count))
+        print("{:<32s} {:<12s} {:>4s} {:>8s} {:>8s} {:>7s} {:>7s} {:>6s} {:>6s} {:>4s}".format("DEVICE", "TASK", "RUNS", "AVG MS", "MAX MS", "HEAP", "BYTES", "FRAMES", "REJ", "TMO"))
+        for row in timing.summary():
+            print("{:<32s} {:<12s} {:>4d} {:>8d} {:>8d} {:>7d} {:>7d} {:>6d} {:>6d} {:>4d}".format(*row))
+
     def get_config(self, device):
         """Shows device configuration."""
         print("\r\n\r\nCONFIGURATION")
@@ -222,4 +231,6 @@ class MENU(object):
                             self._get_data_files()
                         elif 51 in key_buff:
                             self._get_event_table()
+                        elif 53 in key_buff:
+                            self._get_timing()
                     key_buff = []
@@ -24,9 +24,10 @@ import pyb
 import uos
 import utime
 import uselect
-from device import DEVICE
+from device import DEVICE, TASK
 import _thread
 import tools.utils as utils
+from tools.stats import SAMPLES
 import constants
 import tools.inspect as inspect
 import sys
@@ -144,8 +145,18 @@ class BOARD(object):
             irq.disable()
 
     def init_devices(self):
-        """ Initializes all configured devices. """
+        """Initializes all configured devices.
+
+        Powers up all devices at once, then runs their start up sequences
+        concurrently, one thread per uart bus, so slow handshakes do not hold
+        up the other instruments.
+        """
         utils.log_file("Initializing devices...", constants.LOG_LEVEL)
+        start = utime.ticks_ms()
+        self.ready = {}  # {device:ms,...}
+        self.ready_lock = _thread.allocate_lock()
+        groups = {}  # {uart:[device1, device2,...],...}
+        durations = {}  # {uart:sec,...}
         for file in uos.listdir(constants.CONFIG_PATH):
             f_name = file.split(".")[0]
             f_ext =  file.split(".")[1]
@@ -154,10 +165,47 @@ class BOARD(object):
                 for key in cfg.keys():
                     for obj in cfg[key]:
                         if cfg[key][obj]["Device"]:
+                            device = f_name + "." + key + "_" + obj
                             try:
-                                utils.create_device(f_name + "." + key + "_" + obj, tasks=["start_up"])
+                                dev = utils.create_device(device, tasks=["init_power"])
                             except ImportError:
-                                pass
+                                continue
+                            uart = constants.UARTS.get(constants.DEVICES.get(key + "_" + obj), device)
+                            groups.setdefault(uart, []).append(device)
+                            durations[uart] = durations.get(uart, 0) + dev.tasks_duration(["start_up"])
+        for uart in groups:
+            _thread.start_new_thread(self._start_up, (groups[uart], start))
+        timeout = max([0] + list(durations.values())) + constants.TIMEOUT
+        total = sum(len(group) for group in groups.values())
+        while True:
+            self.ready_lock.acquire()
+            ready = list(self.ready)
+            self.ready_lock.release()
+            if len(ready) >= total:
+                break
+            if utime.ticks_diff(utime.ticks_ms(), start) > timeout * 1000:
+                for uart in groups:
+                    for device in groups[uart]:
+                        if device not in ready:
+                            utils.log_file("{} => start up timeout".format(device), constants.LOG_LEVEL)
+                break
+            utime.sleep_ms(100)
+        utils.log_file("Devices initialized in {} ms".format(utime.ticks_diff(utime.ticks_ms(), start)), constants.LOG_LEVEL)
+
+    def _start_up(self, devices, start):
+        """Starts up the devices sharing a uart bus one after another.
+
+        Params:
+            devices(list)
+            start(int): orchestrator start ticks (ms)
+        """
+        for device in devices:
+            utils.execute(device, ["start_up"])
+            elapsed = utime.ticks_diff(utime.ticks_ms(), start)
+            self.ready_lock.acquire()
+            self.ready[device] = elapsed
+            self.ready_lock.release()
+            utils.log_file("{} => ready in {} ms".format(device, elapsed), constants.LOG_LEVEL)
 
 
     def set_mode(self, timeout):
@@ -210,18 +258,17 @@ class BOARD(object):
 
 class ADC(DEVICE):
 
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up"),
+        "log":TASK("log", main=True)
+        })
+
     def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
         DEVICE.__init__(self, *args, **kwargs)
-        data_tasks = ["log"]
         if "tasks" in kwargs:
-            if any(elem in data_tasks for elem in kwargs["tasks"]):
-                if self.main():
-                    for task in kwargs["tasks"]:
-                        eval("self." + task + "()", {"self":self})
-            else:
-                for task in kwargs["tasks"]:
-                    eval("self." + task + "()", {"self":self})
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
@@ -259,34 +306,31 @@ class ADC(DEVICE):
     def main(self):
         """Gets data from internal sensors."""
         utils.log_file("{} => checking up system status...".format(self.name), constants.LOG_LEVEL)
-        core_temp = 0
-        core_vbat = 0
-        core_vref = 0
-        vref = 0
-        battery_level = 0
-        current_level = 0
-        ambient_temperature = 0
         self.data = []
         channels = []
         for key in self.config["Adc"]["Channels"].keys():
             channels.append(self.config["Adc"]["Channels"][key]["Ch"])
         adcall = pyb.ADCAll(int(self.config["Adc"]["Bit"]), self.adcall_mask(channels))
-        for i in range(int(self.config["Samples"]) * int(self.config["Sample_Rate"])):
-            core_temp += adcall.read_core_temp()
-            core_vbat += adcall.read_core_vbat()
-            core_vref += adcall.read_core_vref()
-            vref += adcall.read_vref()
-            battery_level += adcall.read_channel(self.config["Adc"]["Channels"]["Battery_Level"]["Ch"])
-            current_level += adcall.read_channel(self.config["Adc"]["Channels"]["Current_Level"]["Ch"])
-            ambient_temperature += adcall.read_channel(self.config["Adc"]["Channels"]["Ambient_Temperature"]["Ch"])
-            i += 1
-        core_temp = core_temp / i
-        core_vbat = core_vbat / i
-        core_vref = core_vref / i
-        vref = vref / i
-        battery_level = battery_level / i * vref / pow(2, int(self.config["Adc"]["Bit"]))
-        current_level = current_level / i * vref / pow(2, int(self.config["Adc"]["Bit"]))
-        ambient_temperature = ambient_temperature / i * vref / pow(2, int(self.config["Adc"]["Bit"]))
+        battery_ch = self.config["Adc"]["Channels"]["Battery_Level"]["Ch"]
+        current_ch = self.config["Adc"]["Channels"]["Current_Level"]["Ch"]
+        ambient_ch = self.config["Adc"]["Channels"]["Ambient_Temperature"]["Ch"]
+        samples = SAMPLES(int(self.config["Samples"]) * int(self.config["Sample_Rate"]), "ffffHHH")
+        while len(samples) < samples.capacity:
+            samples.add(
+                adcall.read_core_temp(),
+                adcall.read_core_vbat(),
+                adcall.read_core_vref(),
+                adcall.read_vref(),
+                adcall.read_channel(battery_ch),
+                adcall.read_channel(current_ch),
+                adcall.read_channel(ambient_ch))
+        core_temp = samples.mean(0)
+        core_vbat = samples.mean(1)
+        core_vref = samples.mean(2)
+        vref = samples.mean(3)
+        battery_level = samples.mean(4) * vref / pow(2, int(self.config["Adc"]["Bit"]))
+        current_level = samples.mean(5) * vref / pow(2, int(self.config["Adc"]["Bit"]))
+        ambient_temperature = samples.mean(6) * vref / pow(2, int(self.config["Adc"]["Bit"]))
         battery_level = self.battery_level(battery_level)
         current_level = self.current_level(current_level)
         ambient_temperature = self.ad22103(ambient_temperature, vref)
@@ -24,15 +24,23 @@ import pyb
 import uos
 import utime
 import uselect
-from device import DEVICE
+from device import DEVICE, TASK
+from tools.deadline import DEADLINE
 from tools.ymodem import YMODEM
 import tools.utils as utils
+import tools.timing as timing
 import constants
 import _thread
 
 class MODEM(DEVICE, YMODEM):
 
-    def __init__(self, , *args, **kwargs):
+    task_table = DEVICE.task_table.copy()
+    task_table.update({
+        "start_up":TASK("start_up"),
+        "data_transfer":TASK("data_transfer", duration=120)
+        })
+
+    def __init__(self, *args, **kwargs):
         self.config_file = __name__ + "." + constants.CONFIG_TYPE
         DEVICE.__init__(self, *args, **kwargs)
         self.sending = False
@@ -47,8 +55,10 @@ class MODEM(DEVICE, YMODEM):
         self.ats_delay = self.config["Modem"]["Ats_Delay"]
         self.call_attempt = self.config["Modem"]["Call_Attempt"]
         self.call_delay = self.config["Modem"]["Call_Delay"]
-        self.call_timeout = self.config["Modem"]["Call_Timeout"]
+        self.call_timeout = self.config["Modem"]["Call_Timeout"] * 1000  # ms
         YMODEM.__init__(self, self._getc, self._putc, mode="Ymodem1k")
+        if "tasks" in kwargs:
+            self.run_tasks(kwargs["tasks"])
 
     def start_up(self):
         """Performs device specific initialization sequence."""
@@ -67,11 +77,11 @@ class MODEM(DEVICE, YMODEM):
         for _ in range(constants.TIMEOUT):
             rx_buff = []
             self.uart.write("AT\r")
-            t0 = utime.time()
+            deadline = DEADLINE(5000)  # Waits 5 sec for response.
             while True:
-                if utime.time() - t0 > 5:  # Waits 5 sec for response.
+                if deadline.expired():
                     break
-                if self.uart.any():
+                if self.wait_uart(deadline):
                     byte = self.uart.read(1)
                     if byte == b"\n":
                         continue
@@ -102,12 +112,12 @@ class MODEM(DEVICE, YMODEM):
             for at in ["AT\r","AT+CREG=0\r","AT+CBST=7,0,1\r","ATS0=2\r","ATS0?\r"]:
                 self.uart.write(at)
                 rx_buff = []
-                t = utime.time()
+                deadline = DEADLINE(self.call_timeout)
                 while True:
-                    if utime.time() - t == self.call_timeout:
+                    if deadline.expired():
                         print("TIMEOUT OCCURRED")
                         return False
-                    if self.uart.any():
+                    if self.wait_uart(deadline):
                         byte = self.uart.read(1)
                         if byte == b"\n":
                             continue
@@ -194,12 +204,13 @@ class MODEM(DEVICE, YMODEM):
         for at in self.pre_ats:
             self.uart.write(at)
             rx_buff = []
-            now = utime.time()
+            deadline = DEADLINE(self.call_timeout)
             while True:
-                if utime.time() - now == self.call_timeout:
+                if deadline.expired():
                     print("TIMEOUT OCCURRED")
+                    self.count(timing.TIMEOUTS)
                     return False
-                if self.uart.any():
+                if self.wait_uart(deadline):
                     byte = self.uart.read(1)
                     if byte == b"\n":
                         continue
@@ -234,12 +245,13 @@ class MODEM(DEVICE, YMODEM):
         for at in self.post_ats:
             self.uart.write(at)
             rx_buff = []
-            now = utime.time()
+            deadline = DEADLINE(self.call_timeout)
             while True:
-                if utime.time() - now == self.call_timeout:
+                if deadline.expired():
                     print("TIMEOUT OCCURRED WHILE HANG UP")
+                    self.count(timing.TIMEOUTS)
                     return False
-                if self.uart.any():
+                if self.wait_uart(deadline):
                     byte = self.uart.read(1)
                     if byte == b"\n":
                         continue
@@ -260,8 +272,6 @@ class MODEM(DEVICE, YMODEM):
 
     def data_transfer(self):
         """Sends files over the gsm network."""
-        if not self.init_uart():
-            return
         self.sending = True
         self.led_on()
         print("########################################")
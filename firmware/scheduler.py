@@ -28,6 +28,7 @@ import _thread
 class SCHEDULER(object):
 
     def __init__(self):
+        self.running = {}  # {device:(timestamp, [task1, task2,...]),...}
         utils.log_file("Initializing the event table...", constants.LOG_LEVEL)
         self.calc_event_table()
 
@@ -61,20 +62,26 @@ class SCHEDULER(object):
         if "on" in tasks:
             utils.create_device(device, tasks=["on"])
         elif "off" in tasks:
+            self.running.pop(device, None)
             utils.create_device(device, tasks=["off"])
         else:
             utils.status_table[device] = 2  # Sets device ready.
+            self.running[device] = (utime.time(), tasks)
             _thread.start_new_thread(utils.execute, (device, tasks,))
             utils.log_file("{} => {}".format(device, constants.DEVICE_STATUS[utils.status_table[device]]), constants.LOG_LEVEL)
 
-    def calc_data_acquisition_interval(self, device):
-        tmp = [constants.DATA_ACQUISITION_INTERVAL]
-        if device.split(".")[1] in constants.SCHEDULER:
-            for event in constants.SCHEDULER[device.split(".")[1]]:
-                if event == "log":
-                    tmp = constants.SCHEDULER[device.split(".")[1]]["log"]
-                else:
-                    tmp.append(constants.SCHEDULER[device.split(".")[1]][event])
+    def calc_data_acquisition_interval(self, device, obj):
+        """Returns the shortest interval among the device events, log runs
+        every DATA_ACQUISITION_INTERVAL unless scheduled.
+
+        Params:
+            device(str)
+            obj(DEVICE): adapts the event intervals
+        """
+        events = constants.SCHEDULER.get(device.split(".")[1], {})
+        tmp = [obj.event_interval(event, events[event]) for event in events]
+        if not "log" in events:
+            tmp.append(constants.DATA_ACQUISITION_INTERVAL)
         return min(tmp)
 
     def calc_event_table(self):
@@ -83,9 +90,9 @@ class SCHEDULER(object):
         now = utime.time()
         for device in utils.status_table:
             status = utils.status_table[device]
-            data_aquisition_interval = self.calc_data_acquisition_interval(device)
-            next_acquisition = now - now % data_aquisition_interval + data_aquisition_interval
             obj = utils.create_device(device)
+            data_aquisition_interval = self.calc_data_acquisition_interval(device, obj)
+            next_acquisition = now - now % data_aquisition_interval + data_aquisition_interval
             activation_delay = obj.config["Activation_Delay"]
             warmup_duration = obj.config["Warmup_Duration"]
             samples = obj.config["Samples"]
@@ -113,13 +120,16 @@ class SCHEDULER(object):
                         task = "log"
                         self.add_event(timestamp, device, task)
                     for event in constants.SCHEDULER[device.split(".")[1]]:
-                        data_aquisition_interval = int(constants.SCHEDULER[device.split(".")[1]][event])
+                        data_aquisition_interval = int(obj.event_interval(event, constants.SCHEDULER[device.split(".")[1]][event]))
                         next_acquisition = now - now % data_aquisition_interval + data_aquisition_interval
                         timestamp = next_acquisition - sampling_duration + activation_delay
                         task = event
                         self.add_event(timestamp, device, task)
             elif status == 2:  # device is ready / acquiring data
                 timestamp =  next_acquisition + activation_delay
+                if device in self.running:  # Lets the tasks end before turning off.
+                    start, tasks = self.running[device]
+                    timestamp = max(timestamp, start + obj.tasks_duration(tasks))
                 '''if data_aquisition_interval - sampling_duration - warmup_duration == 0:
                     task = "on"
                 else:
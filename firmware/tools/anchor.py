@@ -0,0 +1,143 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import ujson
+from math import sin, cos, asin, atan2, sqrt, radians, degrees
+
+"""Mean earth radius (m)."""
+R = 6371000
+
+"""Distance (m) up to which the equirectangular approximation is used instead of haversine."""
+FAST_RANGE = 10000
+
+"""Weight of the newest fix in the drift estimate."""
+DRIFT_SMOOTHING = 0.2
+
+"""Contains the ANCHOR kept across gps fixes."""
+watch = None
+
+"""File keeping the reference position taken from a fix across reboots."""
+FILE = "anchor.json"
+
+def load(file=FILE):
+    """Reads the saved reference position.
+
+    Params:
+        file(str): default FILE
+    Returns:
+        (lat, lon) deg or None if not saved
+    """
+    try:
+        with open(file) as file_:
+            reference = ujson.load(file_)
+        return float(reference["Lat"]), float(reference["Lon"])
+    except:
+        return None
+
+def save(lat, lon, file=FILE):
+    """Saves the reference position.
+
+    Params:
+        lat(float): deg
+        lon(float): deg
+        file(str): default FILE
+    """
+    with open(file, "w") as file_:
+        ujson.dump({"Lat":lat, "Lon":lon}, file_)
+
+class ANCHOR(object):
+    """Creates an anchor watch, a circle around a reference position.
+
+    Params:
+        radius(float): watch circle radius (m)
+        lat(float): reference latitude (deg), default the first fix
+        lon(float): reference longitude (deg), default the first fix
+    """
+
+    def __init__(self, radius, lat=None, lon=None):
+        self.radius = radius
+        self.lat = None
+        self.alarm = False
+        self.last = None  # Previous fix (lat, lon, epoch) in radians.
+        self.drift_n = 0  # Smoothed drift velocity north, east (m/s).
+        self.drift_e = 0
+        self.distance = 0
+        self.bearing = 0
+        if lat is not None and lon is not None:
+            self.set_reference(lat, lon)
+
+    def set_reference(self, lat, lon):
+        """Sets the watch circle center.
+
+        Params:
+            lat(float): deg
+            lon(float): deg
+        """
+        self.lat = radians(lat)
+        self.lon = radians(lon)
+        self.cos_lat = cos(self.lat)
+
+    def _offset(self, lat1, lon1, lat2, lon2, cos_lat):
+        """Returns the north and east offsets (m) from 1 to 2, equirectangular."""
+        return (lat2 - lat1) * R, (lon2 - lon1) * cos_lat * R
+
+    def _haversine(self, lat, lon):
+        """Returns the distance (m) and bearing (deg) from the reference on the sphere."""
+        a = sin((lat - self.lat) / 2) ** 2 + self.cos_lat * cos(lat) * sin((lon - self.lon) / 2) ** 2
+        distance = 2 * R * asin(min(1, sqrt(a)))
+        bearing = atan2(sin(lon - self.lon) * cos(lat), self.cos_lat * sin(lat) - sin(self.lat) * cos(lat) * cos(lon - self.lon))
+        return distance, degrees(bearing) % 360
+
+    def update(self, lat, lon, epoch):
+        """Evaluates a fix against the watch circle and updates the drift estimate.
+
+        Params:
+            lat(float): deg
+            lon(float): deg
+            epoch(int): fix time (sec.)
+        Returns:
+            True if the fix has just left the watch circle, otherwise False
+        """
+        lat = radians(lat)
+        lon = radians(lon)
+        if self.lat is None:
+            self.set_reference(degrees(lat), degrees(lon))
+        north, east = self._offset(self.lat, self.lon, lat, lon, self.cos_lat)
+        self.distance = sqrt(north * north + east * east)
+        self.bearing = degrees(atan2(east, north)) % 360
+        if self.distance > FAST_RANGE:
+            self.distance, self.bearing = self._haversine(lat, lon)
+        if self.last and epoch > self.last[2]:
+            dt = epoch - self.last[2]
+            north, east = self._offset(self.last[0], self.last[1], lat, lon, self.cos_lat)
+            self.drift_n += DRIFT_SMOOTHING * (north / dt - self.drift_n)
+            self.drift_e += DRIFT_SMOOTHING * (east / dt - self.drift_e)
+        self.last = (lat, lon, epoch)
+        outside = self.distance > self.radius
+        raised = outside and not self.alarm
+        self.alarm = outside
+        return raised
+
+    def drift(self):
+        """Returns the smoothed drift speed (m/s) and direction (deg)."""
+        return sqrt(self.drift_n * self.drift_n + self.drift_e * self.drift_e), degrees(atan2(self.drift_e, self.drift_n)) % 360
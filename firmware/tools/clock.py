@@ -0,0 +1,96 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import pyb
+import utime
+
+"""Pyboard RTC smooth calibration step (ppm), cal units of 2^-20."""
+CAL_STEP = 0.954
+
+"""RTC calibration range."""
+CAL_MIN = -511
+CAL_MAX = 512
+
+"""Minimum time (sec.) between two offsets for a drift estimate."""
+MIN_BASELINE = 600
+
+"""Contains the CLOCK kept across gps syncs."""
+discipline = None
+
+def board_time():
+    """Returns the rtc time as embedded epoch with subseconds."""
+    dt = pyb.RTC().datetime()
+    return utime.mktime((dt[0], dt[1], dt[2], dt[4], dt[5], dt[6], 0, 0)) + (255 - dt[7]) / 256
+
+class CLOCK(object):
+    """Creates a rtc discipline, it measures the board vs. gps offset at each
+    sync, trims the rtc frequency by the estimated drift and stretches the
+    sync interval while the offset stays within the error bound.
+
+    Params:
+        max_error(float): allowed timestamps error (sec.)
+        min_interval(int): sync interval bounds (sec.)
+        max_interval(int)
+    """
+
+    def __init__(self, max_error, min_interval, max_interval):
+        self.max_error = max_error
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.calibration = pyb.RTC().calibration()
+        self.reference = None  # (gps time, offset) since the last step or trim.
+        self.drift = 0  # ppm, positive if the rtc runs fast.
+        self.offset = 0
+
+    def sync(self, gps, board):
+        """Disciplines the rtc against a gps fix.
+
+        Params:
+            gps(float): fix time, embedded epoch with subseconds
+            board(float): rtc time when the fix was received, see board_time()
+        Returns:
+            interval(int): next sync interval (sec.)
+        """
+        rtc = pyb.RTC()
+        offset = board - gps
+        anchored = self.reference is not None
+        if anchored and gps - self.reference[0] >= MIN_BASELINE:
+            self.drift = (offset - self.reference[1]) / (gps - self.reference[0]) * 1000000
+            steps = int(round(self.drift / CAL_STEP))
+            if steps:
+                self.calibration = max(CAL_MIN, min(CAL_MAX, self.calibration - steps))
+                rtc.calibration(self.calibration)
+                anchored = False
+        stepped = abs(offset) > self.max_error / 2 or self.reference is None
+        if stepped:
+            t = utime.localtime(int(gps))
+            rtc.datetime((t[0], t[1], t[2], t[6] + 1, t[3], t[4], t[5], int(255 - (gps % 1) * 256)))
+        if stepped or not anchored:
+            self.reference = (gps, 0 if stepped else offset)
+        self.offset = offset
+        if abs(offset) > self.max_error / 2:
+            self.interval = max(self.min_interval, self.interval // 2)
+        elif abs(offset) < self.max_error / 4:
+            self.interval = min(self.max_interval, self.interval * 2)
+        return self.interval
@@ -0,0 +1,75 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import utime
+
+class DEADLINE(object):
+    """Expires timeout ms after it is set.
+
+    The end is kept in ticks_ms and compared through ticks_diff, so the ticks
+    wraparound is harmless for timeouts shorter than half the ticks period.
+
+    Params:
+        timeout(int): ms, 0 or None never expires
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.set()
+
+    def set(self, timeout=None):
+        """Restarts the deadline.
+
+        Params:
+            timeout(int): ms, default the current one
+        """
+        if timeout is not None:
+            self.timeout = timeout
+        self.start = utime.ticks_ms()
+        if self.timeout:
+            self.end = utime.ticks_add(self.start, self.timeout)
+
+    def elapsed_ms(self):
+        """Returns the ms since the deadline was set."""
+        return utime.ticks_diff(utime.ticks_ms(), self.start)
+
+    def remaining_ms(self):
+        """Returns the ms left, as poll timeouts expect.
+
+        Returns:
+            ms(int): 0 once expired, -1 if it never expires
+        """
+        if not self.timeout:
+            return -1
+        return max(0, utime.ticks_diff(self.end, utime.ticks_ms()))
+
+    def expired(self):
+        """Returns True once the deadline has passed."""
+        return self.remaining_ms() == 0
+
+    def sleep_ms(self, ms):
+        """Sleeps ms, never beyond the deadline."""
+        remaining = self.remaining_ms()
+        if remaining >= 0:
+            ms = min(ms, remaining)
+        utime.sleep_ms(ms)
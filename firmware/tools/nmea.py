@@ -20,72 +20,318 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import utime
 import tools.utils as utils
 import constants
 
-class NMEA(object):
+"""NMEA 0183 maximum sentence length, "$" and "\r\n" included."""
+MAX_LENGTH = 82
 
-    def __init__(self, *args, **kwargs):
-        self.new_sentence_flag = False
-        self.checksum_flag = False
-        self.checksum = ""
-        self.word = ""
-        self.sentence = []
+"""Length of $ and the address field, e.g. $GPRMC, the sentence filter is applied on it."""
+ADDRESS_LENGTH = 6
+
+"""Upper case hex digits of the checksum field."""
+HEX = b"0123456789ABCDEF"
+
+"""Wind speed units of MWV sentences to m/s."""
+SPEED_UNITS = {"N":0.514444, "M":1.0, "K":1 / 3.6}
+
+class SENTENCE(object):
+    """Creates a NMEA sentence, fields are kept as raw bytes and decoded on access.
+
+    Params:
+        data(bytes): sentence between $ and *
+    """
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data):
+        self.data = data
+        self.offsets = bytearray(1)  # Fields start, the address is field 0.
+        i = data.find(b",")
+        while i >= 0:
+            self.offsets.append(i + 1)
+            i = data.find(b",", i + 1)
+
+    def __len__(self):
+        return len(self.offsets)
 
-    def verify_checksum(self, checksum, sentence):
-        """Verifies the NMEA sentence integrity.
+    def __getitem__(self, i):
+        return self.field(i)
+
+    def __str__(self):
+        return "$" + self.data.decode("ascii")
+
+    def field(self, i):
+        """Returns a field as string.
 
         Params:
-            checksum(hex)
-            sentence(list)
+            i(int): field index, 0 is the address
+        Returns:
+            field(str)
         """
-        calculated_checksum = 0
-        for char in ",".join(map(str, sentence)):
-            calculated_checksum ^= ord(char)
-        if "{:02X}".format(calculated_checksum) != checksum:
-            utils.log_file("NMEA invalid checksum calculated: {:02X} got: {}".format(calculated_checksum, checksum), constants.LOG_LEVEL)
-            return False
-        else:
-            return True
+        start = self.offsets[i]
+        if i + 1 < len(self.offsets):
+            return self.data[start:self.offsets[i + 1] - 1].decode("ascii")
+        return self.data[start:].decode("ascii")
+
+    def number(self, i):
+        """Returns a field as float, None if empty."""
+        field = self.field(i)
+        if field:
+            return float(field)
+        return None
+
+    def coordinate(self, i):
+        """Returns a (d)ddmm.mmmm field and its hemisphere as decimal degrees, None if empty."""
+        value = self.number(i)
+        if value is None:
+            return None
+        degrees = int(value // 100)
+        value = degrees + (value - degrees * 100) / 60
+        if self.field(i + 1) in ("S", "W"):
+            return -value
+        return value
+
+class RMC(SENTENCE):
+    """Recommended minimum specific GNSS data."""
+
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        return self.field(2) == "A"
+
+    @property
+    def utc(self):
+        """Returns the fix time as embedded epoch, None if not available."""
+        time = self.field(1)
+        date = self.field(9)
+        if len(time) < 6 or len(date) < 6:
+            return None
+        return utime.mktime((2000 + int(date[4:6]), int(date[2:4]), int(date[0:2]), int(time[0:2]), int(time[2:4]), int(time[4:6]), 0, 0))
+
+    @property
+    def subseconds(self):
+        """Returns the fraction of second of the fix time."""
+        time = self.field(1)
+        if len(time) > 6:
+            return float(time[6:])
+        return 0
+
+    @property
+    def lat(self):
+        return self.coordinate(3)
+
+    @property
+    def lon(self):
+        return self.coordinate(5)
+
+    @property
+    def speed(self):
+        """Returns the speed over ground (knots)."""
+        return self.number(7)
+
+    @property
+    def course(self):
+        """Returns the course over ground (deg)."""
+        return self.number(8)
+
+class GGA(SENTENCE):
+    """Global positioning system fix data."""
+
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        return self.field(6) not in ("", "0")
+
+    @property
+    def lat(self):
+        return self.coordinate(2)
+
+    @property
+    def lon(self):
+        return self.coordinate(4)
+
+    @property
+    def satellites(self):
+        return int(self.number(7) or 0)
+
+    @property
+    def hdop(self):
+        return self.number(8)
+
+    @property
+    def altitude(self):
+        """Returns the altitude above mean sea level (m)."""
+        return self.number(9)
+
+class VTG(SENTENCE):
+    """Course over ground and ground speed."""
+
+    __slots__ = ()
 
-    def get_sentence(self, char_code, sentence):
-        """Gets a single NMEA sentence, each sentence is a list of words itself.
+    @property
+    def course(self):
+        """Returns the true course over ground (deg)."""
+        return self.number(1)
+
+    @property
+    def speed(self):
+        """Returns the speed over ground (knots)."""
+        return self.number(5)
+
+class MWV(SENTENCE):
+    """Wind speed and angle."""
+
+    __slots__ = ()
+
+    @property
+    def valid(self):
+        return self.field(5) == "A"
+
+    @property
+    def angle(self):
+        """Returns the wind angle (deg)."""
+        return self.number(1)
+
+    @property
+    def speed(self):
+        """Returns the wind speed (m/s)."""
+        speed = self.number(3)
+        if speed is None:
+            return None
+        return speed * SPEED_UNITS.get(self.field(4), 1.0)
+
+class XDR(SENTENCE):
+    """Transducer measurements, in groups of type, value, unit and id."""
+
+    __slots__ = ()
+
+    def measurement(self, id):
+        """Returns the value of a transducer, None if not found.
 
         Params:
-            char_code(int)
+            id(str): transducer id, e.g. TEMP, %RH, BARO
+        Returns:
+            value(float)
         """
-        if char_code in range(32, 126):
-            ascii_char = chr(char_code)
-            if ascii_char == "$":
-                self.new_sentence_flag = True
-                self.word = ""
-                self.sentence = []
-                self.checksum = ""
-                self.checksum_flag = False
-            elif ascii_char == ",":
-                if self.new_sentence_flag:
-                    self.sentence.append(self.word)
-                    self.word = ""
-            elif ascii_char == "*":
-                if self.new_sentence_flag:
-                    self.sentence.append(self.word)
-                    self.checksum_flag = True
-            elif self.new_sentence_flag:
-                if self.checksum_flag:
-                    self.checksum = self.checksum + ascii_char
-                    if len(self.checksum) == 2:
-                        if self.verify_checksum(self.checksum, self.sentence):
-                            if sentence and self.sentence[0][-3:] == sentence:
-                                return True
-                else:
-                    self.word = self.word + ascii_char
-
-    def is_valid_gprmc(self):
-        """Checks if a GPRMC sentence contains valid data.
+        for i in range(4, len(self), 4):
+            if self.field(i) == id:
+                return self.number(i - 2)
+        return None
+
+"""Pairs sentence type:class of the decoded sentences, the others are plain SENTENCE."""
+TYPES = ((b"RMC", RMC), (b"GGA", GGA), (b"VTG", VTG), (b"MWV", MWV), (b"XDR", XDR))
+
+def build(body):
+    """Builds a sentence with its checksum, e.g. a PMTK command.
+
+    Params:
+        body(str): sentence between $ and *
+    Returns:
+        sentence(bytes)
+    """
+    checksum = 0
+    for char in body.encode("ascii"):
+        checksum ^= char
+    return "${}*{:02X}\r\n".format(body, checksum).encode("ascii")
+
+def sentence(data):
+    """Creates the typed sentence matching the address of data.
 
+    Params:
+        data(bytes): sentence between $ and *
+    Returns:
+        SENTENCE
+    """
+    for type, cls in TYPES:
+        if data.startswith(type, 2):
+            return cls(data)
+    return SENTENCE(data)
+
+class NMEA(object):
+
+    def __init__(self, *args, **kwargs):
+        self.buffer = b""
+        self.sentence = None
+        self.addresses = ()
+
+    def set_filter(self, addresses):
+        """Sets the addresses of the sentences to acquire, the others are skipped before checksum and split.
+
+        Params:
+            addresses(str or list): e.g. GPRMC or [WIMWV, WIXDR], empty acquires all
+        """
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        self.addresses = tuple(address.encode("ascii") for address in addresses if address)
+
+    def _accepted(self, data, start):
+        """Matches the address following $ against the filter, without slicing."""
+        for address in self.addresses:
+            if data.startswith(address, start + 1):
+                return True
+        return False
+
+    def verify_checksum(self, data, start, end):
+        """Verifies the NMEA sentence integrity, xoring the raw bytes between $ and *.
+
+        Params:
+            data(bytes)
+            start(int): index of $
+            end(int): index of *
         Returns:
-          True or False
+            True or False
         """
-        if self.sentence[2] == "A":
+        calculated_checksum = 0
+        for i in range(start + 1, end):
+            calculated_checksum ^= data[i]
+        if data[end + 1] == HEX[calculated_checksum >> 4] and data[end + 2] == HEX[calculated_checksum & 0x0F]:
             return True
+        utils.log_file("NMEA invalid checksum calculated: {:02X} got: {}".format(calculated_checksum, data[end + 1:end + 3].decode("ascii", "ignore")), constants.LOG_LEVEL)
         return False
+
+    def get_sentences(self, data):
+        """Gets the NMEA sentences contained in a chunk of bytes as typed sentences.
+
+        Frames are delimited by $ and *hh, an incomplete frame is kept and
+        completed by the next chunk. Sentences whose address is not in the
+        filter are skipped on their first bytes.
+
+        Params:
+            data(bytes)
+        Returns:
+            generator of sentences, the last one is also kept in self.sentence
+        """
+        if self.buffer:
+            data = self.buffer + data
+            self.buffer = b""
+        length = len(data)
+        start = data.find(b"$")
+        while start >= 0:
+            if length - start < ADDRESS_LENGTH:
+                self.buffer = data[start:]  # Address not received yet.
+                break
+            if self.addresses and not self._accepted(data, start):
+                start = data.find(b"$", start + ADDRESS_LENGTH)
+                continue
+            end = data.find(b"*", start + 1, start + MAX_LENGTH)
+            resync = data.find(b"$", start + 1, end if end >= 0 else start + MAX_LENGTH)
+            if resync >= 0:
+                start = resync  # Truncated frame, resyncs on the next one.
+                continue
+            if end < 0 and length - start >= MAX_LENGTH:
+                start = data.find(b"$", start + MAX_LENGTH)  # Garbage, no checksum field.
+                continue
+            if end < 0 or end + 3 > length:
+                self.buffer = data[start:]
+                break
+            if self.verify_checksum(data, start, end):
+                self.sentence = sentence(data[start + 1:end])
+                self.buffer = data[end + 3:]  # Keeps the remainder if the caller stops iterating.
+                yield self.sentence
+                self.buffer = b""
+            start = data.find(b"$", end + 3)
+
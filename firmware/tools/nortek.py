@@ -0,0 +1,182 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Nortek binary structures, as ustruct layouts decoded in place from the
+received buffers. Words are little endian, layouts exclude the checksum."""
+
+import ustruct
+
+"""Checksum seed, added to the sum of the structure words."""
+CHECKSUM = 0xb58c
+
+"""First byte of every structure."""
+SYNC = 0xa5
+
+"""Aquadopp profiler velocity data id."""
+VELOCITY = 0x21
+
+"""Stream ring length (bytes), a few of the largest profiler structures."""
+RING_SIZE = 4096
+
+"""Hardware configuration (id 0x05, 48 bytes)."""
+HW_CFG = "<BBH14sHH2sHHH12s4s"
+
+"""Head configuration (id 0x04, 224 bytes)."""
+HEAD_CFG = "<BBHHH2s12s176s22sH"
+
+"""Deployment configuration (id 0x00, 512 bytes)."""
+USR_CFG = "<BBHHHHHHHHHHH2s2s2sHHHHH6sH6sIHHHHHHHHH180s80s48sH50sHHHHHH2s2s2s2sHH2sH22s24s"
+
+"""Aquadopp profiler velocity data (id 0x21) header, the cells follow: Sync, Id,
+Size, Clock (6), Error, AnaIn1, Battery, SoundSpeed/AnaIn2, Heading, Pitch,
+Roll, PressureMSB, Status, PressureLSW, Temperature."""
+VEL_HEADER = "<BBH6BHHHHHhhBBHh"
+
+VEL_HEADER_SIZE = ustruct.calcsize(VEL_HEADER)
+
+def cells(nbeams, nbins):
+    """Returns the layout of the velocity data cells, velocities (mm/s) then
+    amplitudes (counts), beam by beam.
+
+    Params:
+        nbeams(int)
+        nbins(int)
+    Returns:
+        layout(str)
+    """
+    return "<{0}h{0}B".format(nbeams * nbins)
+
+try:
+    import micropython
+
+    @micropython.viper
+    def _sum(data, words: int) -> int:
+        """Sums the first words of a buffer in place, little endian target."""
+        p = ptr16(data)
+        total = 0
+        for i in range(words):
+            total += p[i]
+        return total
+except ImportError:
+    def _sum(data, words):
+        """Sums the first words of a buffer with a single unpack."""
+        return sum(ustruct.unpack_from("<{}H".format(words), data))
+
+def checksum(data):
+    """Returns the checksum of a structure, the checksum word excluded.
+
+    Params:
+        data(bytes, bytearray or memoryview): structure, its size is read from
+            the header
+    Returns:
+        checksum(int)
+    """
+    words = min((data[2] | data[3] << 8) - 1, len(data) // 2)
+    return (CHECKSUM + _sum(data, words)) & 0xffff
+
+class STREAM(object):
+    """Reassembles the Nortek structures of a byte stream.
+
+    Bytes are gathered in a preallocated ring, the pending bytes are moved
+    back to its start only when the next chunk does not fit after them, so a
+    structure is always contiguous and handed out without copies.
+
+    Params:
+        size(int): ring length (bytes)
+    """
+
+    def __init__(self, size=RING_SIZE):
+        self.ring = bytearray(size)
+        self.head = 0  # First pending byte.
+        self.tail = 0  # End of the received bytes.
+        self.rejected = 0  # Checksum failures.
+        self.skipped = 0  # Bytes out of any structure.
+
+    def _append(self, data):
+        """Copies a chunk after the pending bytes, dropping the oldest ones if
+        the ring overflows."""
+        size = len(self.ring)
+        if len(data) > size:
+            self.skipped += len(data) - size
+            data = memoryview(data)[len(data) - size:]
+        if self.tail + len(data) > size:
+            if self.tail - self.head + len(data) > size:
+                self.skipped += self.tail - self.head + len(data) - size
+                self.head = self.tail - size + len(data)
+            self.ring[0:self.tail - self.head] = self.ring[self.head:self.tail]
+            self.tail -= self.head
+            self.head = 0
+        self.ring[self.tail:self.tail + len(data)] = data
+        self.tail += len(data)
+
+    def get_structures(self, data):
+        """Gets the complete structures contained in a chunk of bytes.
+
+        Structures start on the sync byte and their size is read from the
+        header, an incomplete one is kept and completed by the next chunks.
+        A structure failing its checksum was a false sync, the search resumes
+        on the following byte.
+
+        Params:
+            data(bytes)
+        Returns:
+            generator of memoryviews on the ring, valid until the next call
+        """
+        self._append(data)
+        ring = self.ring
+        while True:
+            while self.head < self.tail and ring[self.head] != SYNC:
+                self.head += 1
+                self.skipped += 1
+            if self.tail - self.head < 4:
+                return
+            size = (ring[self.head + 2] | ring[self.head + 3] << 8) * 2
+            if size < 6 or size > len(ring):
+                self.head += 1  # Not a header.
+                self.skipped += 1
+                continue
+            if self.tail - self.head < size:
+                return
+            structure = memoryview(ring)[self.head:self.head + size]
+            if verify(structure):
+                self.head += size
+                yield structure
+            else:
+                self.rejected += 1
+                self.head += 1
+                self.skipped += 1
+
+def verify(data):
+    """Verifies the checksum word of a structure.
+
+    Params:
+        data(bytes, bytearray or memoryview)
+    Returns:
+        True or False
+    """
+    if len(data) < 4:
+        return False
+    size = (data[2] | data[3] << 8) * 2
+    if size < 4 or len(data) < size:
+        return False
+    return checksum(data) == data[size - 2] | data[size - 1] << 8
@@ -0,0 +1,292 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from array import array
+from math import sin, asin, radians, degrees, atan2, sqrt
+
+"""Item sizes (bytes) of the array typecodes usable as SAMPLES columns."""
+ITEMSIZES = {"b":1, "B":1, "h":2, "H":2, "i":4, "I":4, "f":4}
+
+"""Quarter wave sine table, 0-90 deg in tenths of degree (3.6 kB)."""
+SINES = array("f", [sin(radians(i / 10)) for i in range(901)])
+
+def sin10(tenths):
+    """Returns the sine of an angle in tenths of degree from the lookup table.
+
+    Params:
+        tenths(int): 0-3599
+    Returns:
+        sine(float)
+    """
+    if tenths < 900:
+        return SINES[tenths]
+    if tenths < 1800:
+        return SINES[1800 - tenths]
+    if tenths < 2700:
+        return -SINES[tenths - 1800]
+    return -SINES[3600 - tenths]
+
+def cos10(tenths):
+    """Returns the cosine of an angle in tenths of degree from the lookup table."""
+    return sin10((tenths + 900) % 3600)
+
+class STATS(object):
+    """Creates a single pass accumulator of a scalar quantity.
+
+    Memory does not depend on the number of samples, mean and variance are
+    updated with Welford's method, which holds in single precision.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.avg = 0
+        self.m2 = 0
+        self.max = None
+        self.argmax = None
+
+    def add(self, value, arg=None):
+        """Accumulates a sample.
+
+        Params:
+            value(float)
+            arg(any): stored as argmax if value is the new max, e.g. the direction of a gust
+        """
+        self.count += 1
+        delta = value - self.avg
+        self.avg += delta / self.count
+        self.m2 += delta * (value - self.avg)
+        if self.max is None or value > self.max:
+            self.max = value
+            self.argmax = arg
+
+    def mean(self):
+        """Returns the mean, 0 if no samples."""
+        return self.avg
+
+    def std(self):
+        """Returns the population standard deviation, 0 if no samples."""
+        if self.count:
+            return sqrt(self.m2 / self.count)
+        return 0
+
+class RUNNING(object):
+    """Creates a running mean over the last size samples, kept in a ring.
+
+    Params:
+        size(int): window length (samples)
+    """
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.ring = array("f", bytes(self.size * ITEMSIZES["f"]))
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.head = 0
+        self.sum = 0
+
+    def add(self, value):
+        """Adds a sample.
+
+        Returns:
+            mean(float): of the window, None until the window is full
+        """
+        self.sum += value - self.ring[self.head]
+        self.ring[self.head] = value
+        self.head = (self.head + 1) % self.size
+        if not self.head:
+            self.sum = sum(self.ring)  # Drops the rounding drift once per lap.
+        if self.count < self.size:
+            self.count += 1
+            if self.count < self.size:
+                return None
+        return self.sum / self.size
+
+class CIRCULAR(object):
+    """Creates a single pass accumulator of directions (deg), optionally
+    weighted, e.g. by wind speed.
+
+    Directions are resolved to a tenth of degree and their sine and cosine
+    come from the lookup table.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.x = 0
+        self.y = 0
+
+    def add(self, direction, weight=1):
+        """Accumulates a sample.
+
+        Params:
+            direction(float): degrees clockwise from north
+            weight(float)
+        """
+        self.add_tenths(int(direction % 360 * 10 + 0.5) % 3600, weight)  # Non negative before rounding.
+
+    def add_tenths(self, tenths, weight=1):
+        """Accumulates a sample in tenths of degree, as output by most instruments.
+
+        Params:
+            tenths(int): 0-3599
+            weight(float)
+        """
+        quadrant, i = divmod(tenths, 900)  # Both values from the same quarter wave lookups.
+        if quadrant == 0:
+            s, c = SINES[i], SINES[900 - i]
+        elif quadrant == 1:
+            s, c = SINES[900 - i], -SINES[i]
+        elif quadrant == 2:
+            s, c = -SINES[i], -SINES[900 - i]
+        else:
+            s, c = -SINES[900 - i], SINES[i]
+        self.count += 1
+        self.x += s * weight
+        self.y += c * weight
+
+    def mean(self):
+        """Returns the vector mean direction 0-360 (deg)."""
+        if not self.count:
+            return 0
+        return degrees(atan2(self.x, self.y)) % 360
+
+    def resultant(self):
+        """Returns the mean resultant, i.e. the vector mean speed if weighted by speed."""
+        if not self.count:
+            return 0
+        return sqrt(self.x * self.x + self.y * self.y) / self.count
+
+    def std(self):
+        """Returns the Yamartino standard deviation (deg) of unweighted directions."""
+        if not self.count:
+            return 0
+        epsilon = sqrt(max(0, 1 - min(1, self.resultant() ** 2)))
+        return degrees(asin(epsilon) * (1 + (2 / sqrt(3) - 1) * epsilon ** 3))
+
+class PROFILE(object):
+    """Creates a bin by bin vector average of horizontal current profiles.
+
+    Params:
+        bins(int)
+    """
+
+    def __init__(self, bins):
+        self.bins = bins
+        self.east = array("f", bytes(bins * ITEMSIZES["f"]))
+        self.north = array("f", bytes(bins * ITEMSIZES["f"]))
+        self.counts = array("H", bytes(bins * ITEMSIZES["H"]))
+        self.reset()
+
+    def reset(self):
+        self.ensembles = 0
+        for bin in range(self.bins):
+            self.east[bin] = 0
+            self.north[bin] = 0
+            self.counts[bin] = 0
+
+    def add(self, bin, east, north):
+        """Accumulates a bin velocity.
+
+        Params:
+            bin(int)
+            east, north(float)
+        """
+        self.east[bin] += east
+        self.north[bin] += north
+        self.counts[bin] += 1
+
+    def speed(self, bin):
+        """Returns the mean speed of a bin, None if no valid samples."""
+        if not self.counts[bin]:
+            return None
+        return sqrt(self.east[bin] * self.east[bin] + self.north[bin] * self.north[bin]) / self.counts[bin]
+
+    def direction(self, bin):
+        """Returns the mean direction 0-360 (deg) the current flows to, None if no valid samples."""
+        if not self.counts[bin]:
+            return None
+        return degrees(atan2(self.east[bin], self.north[bin])) % 360
+
+class SAMPLES(object):
+    """Creates a columnar buffer of samples, each column is an array
+    preallocated to capacity so that acquisitions do not grow the heap.
+
+    Params:
+        capacity(int): max number of samples
+        typecodes(str): one array typecode per column, e.g. "ffH"
+    """
+
+    def __init__(self, capacity, typecodes):
+        self.capacity = capacity
+        self.columns = [array(typecode, bytes(capacity * ITEMSIZES[typecode])) for typecode in typecodes]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        self.count = 0
+
+    def add(self, *values):
+        """Appends a sample, one value per column.
+
+        Returns:
+            True or False if full
+        """
+        if self.count >= self.capacity:
+            return False
+        for column, value in zip(self.columns, values):
+            column[self.count] = value
+        self.count += 1
+        return True
+
+    def column(self, i):
+        """Returns the filled part of a column without copying it."""
+        return memoryview(self.columns[i])[:self.count]
+
+    def sum(self, i):
+        return sum(self.column(i))
+
+    def mean(self, i):
+        """Returns the mean of a column, 0 if no samples."""
+        if self.count:
+            return self.sum(i) / self.count
+        return 0
+
+    def max(self, i):
+        """Returns the max of a column and its sample index, (None, None) if no samples."""
+        column = self.columns[i]
+        argmax = None
+        for j in range(self.count):
+            if argmax is None or column[j] > column[argmax]:
+                argmax = j
+        if argmax is None:
+            return None, None
+        return column[argmax], argmax
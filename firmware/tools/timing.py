@@ -0,0 +1,111 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import gc
+import utime
+import _thread
+from array import array
+
+"""Ring length (records)."""
+SIZE = 32
+
+"""Per task counters, indexes into a counters() array."""
+BYTES = 0
+FRAMES = 1
+REJECTED = 2
+TIMEOUTS = 3
+
+"""Record layout: device, task, ms, heap, bytes, frames, rejected, timeouts."""
+FIELDS = 8
+
+"""Device and task names, the ring stores their indexes."""
+names = []
+
+ring = array("l", [0] * SIZE * FIELDS)
+
+head = 0
+
+count = 0
+
+lock = _thread.allocate_lock()
+
+def counters():
+    """Returns a zeroed set of task counters."""
+    return array("l", [0, 0, 0, 0])
+
+def _index(name):
+    if name not in names:
+        names.append(name)
+    return names.index(name)
+
+def start():
+    """Returns the current ticks (ms) and heap allocation."""
+    return utime.ticks_ms(), gc.mem_alloc()
+
+def record(device, task, start, counts=None):
+    """Stores a record in the ring, overwriting the oldest one.
+
+    Params:
+        device(str)
+        task(str)
+        start(tuple): start() at task beginning
+        counts(array): counters()
+    """
+    ms = utime.ticks_diff(utime.ticks_ms(), start[0])
+    heap = gc.mem_alloc() - start[1]
+    global head, count
+    with lock:
+        i = head * FIELDS
+        ring[i] = _index(device)
+        ring[i + 1] = _index(task)
+        ring[i + 2] = ms
+        ring[i + 3] = heap
+        for j in range(4):
+            ring[i + 4 + j] = counts[j] if counts else 0
+        head = (head + 1) % SIZE
+        count = min(count + 1, SIZE)
+
+def summary():
+    """Summarizes the ring per device and task.
+
+    Returns:
+        list of (device, task, runs, avg ms, max ms, avg heap, bytes, frames, rejected, timeouts)
+    """
+    totals = {}  # {(device, task):[runs, ms, max ms, heap, bytes, frames, rejected, timeouts],...}
+    with lock:
+        for n in range(count):
+            i = n * FIELDS
+            key = (ring[i], ring[i + 1])
+            if key not in totals:
+                totals[key] = [0, 0, 0, 0, 0, 0, 0, 0]
+            total = totals[key]
+            total[0] += 1
+            total[1] += ring[i + 2]
+            total[2] = max(total[2], ring[i + 2])
+            total[3] += ring[i + 3]
+            for j in range(4):
+                total[4 + j] += ring[i + 4 + j]
+    rows = []
+    for key in sorted(totals, key=lambda key: -totals[key][1]):
+        total = totals[key]
+        rows.append((names[key[0]], names[key[1]], total[0], total[1] // total[0], total[2], total[3] // total[0]) + tuple(total[4:]))
+    return rows
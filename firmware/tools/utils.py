@@ -26,6 +26,7 @@ import uos
 import utime
 import constants
 import _thread
+import tools.timing as timing
 
 """Creates a lock to handling data file secure."""
 file_lock = _thread.allocate_lock()
@@ -39,8 +40,12 @@ processes = []
 """Contains pairs device:status."""
 status_table = {}
 
+"""Contains pairs bus:(uart, settings, poll, users) of the uarts kept open across acquisition cycles, users is the set of devices sharing the bus."""
+uarts = {}
+
 unsent_files = []
 
+"""Contains the last gps fix (utc, lat, lon, speed, course), utc as embedded epoch, lat and lon in decimal degrees."""
 gps = ()
 
 def read_config(file, path=constants.CONFIG_PATH):
@@ -153,17 +158,21 @@ def _make_data_dir(dir):
         dir = dir + sep + dir_list[i+1]  # changes dir
     return True
 
-def _get_data_dir():
-    """Gets the dir to write data to based on media availability."""
+def _get_data_dir(dir=constants.DATA_DIR):
+    """Gets the dir to write data to based on media availability.
+
+    Params:
+        dir(str): default DATA_DIR
+    """
     import errno
     for media in constants.MEDIA:
         made = False
         while True:
             try:
-                if constants.DATA_DIR in uos.listdir(media):
-                    return media + "/" + constants.DATA_DIR
+                if dir in uos.listdir(media):
+                    return media + "/" + dir
                 elif not made:
-                    _make_data_dir(media + "/" + constants.DATA_DIR)
+                    _make_data_dir(media + "/" + dir)
                     made = True
                     continue
                 else:
@@ -219,17 +228,18 @@ def files_to_send():
         return True
     return False
 
-def log_data(data):
+def log_data(data, dir=constants.DATA_DIR):
     """Appends device samples to data log file.
 
     Params:
         data(str):
+        dir(str): default DATA_DIR
     """
     while file_lock.locked():
         continue
     file_lock.acquire()
     try:
-        file = _get_data_dir() + "/" + eval(constants.DATA_FILE_NAME)
+        file = _get_data_dir(dir) + "/" + eval(constants.DATA_FILE_NAME)
         with open(file, "a") as data_file:  # append row to existing file
             log_file("Writing out to file {} => {}".format(file, data), constants.LOG_LEVEL)
             data_file.write(data + "\r\n")
@@ -280,7 +290,9 @@ def execute(device, tasks):
     if processes_access_lock.acquire(1, timeout):
         processes.append(_thread.get_ident())
         processes_access_lock.release()
+        start = timing.start()
         create_device(device, tasks=tasks)
+        timing.record(device, "execute", start)
         if processes_access_lock.acquire(1, timeout):
             processes.remove(_thread.get_ident())
             processes_access_lock.release()
@@ -0,0 +1,191 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Benchmarks the NMEA parser on a recorded Quectel L80 stream.
+
+Usage:
+    python sim/bench_nmea.py
+    python sim/bench_nmea.py --record l80.nmea --epochs 600
+    python sim/bench_nmea.py --file l80.nmea --chunk 64
+
+Without --file the stream is recorded from the simulated L80 with the
+factory output (GLL, RMC, VTG, GGA, GSA, 3 x GSV per fix). Throughput is
+reported in sentences per second, for the per character parser the
+firmware used before and for the chunk parser in tools.nmea, without and
+with the address filter. The chunk parser must acquire the same sentences
+with the same fields as the per character parser, for every address in
+the stream, otherwise the script exits with status 1.
+"""
+
+import argparse
+import sys
+import time
+
+import run
+
+class LEGACY(object):
+    """Per character parser, as in tools.nmea before chunk parsing."""
+
+    def __init__(self):
+        self.new_sentence_flag = False
+        self.checksum_flag = False
+        self.checksum = ""
+        self.word = ""
+        self.sentence = []
+
+    def verify_checksum(self, checksum, sentence):
+        calculated_checksum = 0
+        for char in ",".join(map(str, sentence)):
+            calculated_checksum ^= ord(char)
+        return "{:02X}".format(calculated_checksum) == checksum
+
+    def get_sentence(self, char_code, sentence):
+        if char_code in range(32, 126):
+            ascii_char = chr(char_code)
+            if ascii_char == "$":
+                self.new_sentence_flag = True
+                self.word = ""
+                self.sentence = []
+                self.checksum = ""
+                self.checksum_flag = False
+            elif ascii_char == ",":
+                if self.new_sentence_flag:
+                    self.sentence.append(self.word)
+                    self.word = ""
+            elif ascii_char == "*":
+                if self.new_sentence_flag:
+                    self.sentence.append(self.word)
+                    self.checksum_flag = True
+            elif self.new_sentence_flag:
+                if self.checksum_flag:
+                    self.checksum = self.checksum + ascii_char
+                    if len(self.checksum) == 2:
+                        if self.verify_checksum(self.checksum, self.sentence):
+                            if sentence and self.sentence[0][-3:] == sentence:
+                                return True
+                else:
+                    self.word = self.word + ascii_char
+
+def record(epochs):
+    """Records the output of the simulated L80 with a valid fix.
+
+    Params:
+        epochs(int): number of fixes
+    Returns:
+        stream(bytes)
+    """
+    import instruments
+    gps = instruments.QUECTELL80(ttff=0)
+    gps.powered_at = 0
+    gps.on_power_up()
+    stream = b""
+    for epoch in range(epochs):
+        stream += gps.frame(epoch + 1)
+    return stream
+
+def check(stream, chunk):
+    """Compares the sentences acquired by both parsers, address by address.
+
+    Params:
+        stream(bytes)
+        chunk(int): bytes per uart read
+    Returns:
+        mismatching addresses(list)
+    """
+    from tools.nmea import NMEA
+    addresses = set()
+    for frame in stream.split(b"$")[1:]:
+        addresses.add(frame[:5].decode("ascii"))
+    mismatches = []
+    for address in sorted(addresses):
+        legacy = LEGACY()
+        expected = []
+        for char in stream:
+            if legacy.get_sentence(char, address[-3:]) and legacy.sentence[0] == address:
+                expected.append(list(legacy.sentence))
+        parser = NMEA()
+        parser.set_filter(address)
+        acquired = []
+        for i in range(0, len(stream), chunk):
+            for sentence in parser.get_sentences(stream[i:i + chunk]):
+                acquired.append([sentence.field(j) for j in range(len(sentence))])
+        if not expected or acquired != expected:
+            mismatches.append(address)
+    return mismatches
+
+def bench_legacy(stream, sentence):
+    """Feeds the stream char by char, as the firmware did."""
+    parser = LEGACY()
+    hits = 0
+    start = time.perf_counter()
+    for char in stream:
+        if parser.get_sentence(char, sentence):
+            hits += 1
+    return hits, time.perf_counter() - start
+
+def bench_chunks(stream, sentence, chunk):
+    """Feeds the stream in uart sized chunks through the address filter."""
+    from tools.nmea import NMEA
+    parser = NMEA()
+    parser.set_filter(sentence)
+    hits = 0
+    start = time.perf_counter()
+    for i in range(0, len(stream), chunk):
+        for _ in parser.get_sentences(stream[i:i + chunk]):
+            hits += 1
+    return hits, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--file", help="recorded stream, default records from the simulator")
+    parser.add_argument("--record", help="saves the recorded stream to file")
+    parser.add_argument("--epochs", type=int, default=300, help="fixes to record")
+    parser.add_argument("--chunk", type=int, default=64, help="bytes per uart read")
+    parser.add_argument("--sentence", default="GPRMC", help="sentence address to acquire, empty for all")
+    args = parser.parse_args()
+    for path in (run.SIM, run.FIRMWARE):  # No run.setup(), tracemalloc would skew the timings.
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    if args.file:
+        with open(args.file, "rb") as file:
+            stream = file.read()
+    else:
+        stream = record(args.epochs)
+    if args.record:
+        with open(args.record, "wb") as file:
+            file.write(stream)
+    sentences = stream.count(b"$")
+    print("{} bytes, {} sentences".format(len(stream), sentences))
+    mismatches = check(stream, args.chunk)
+    if mismatches:
+        print("chunk parser differs from per char parser on {}".format(", ".join(mismatches)))
+        sys.exit(1)
+    print("chunk parser matches per char parser")
+    for label, (hits, elapsed) in (
+            ("per char", bench_legacy(stream, args.sentence[-3:])),
+            ("unfiltered", bench_chunks(stream, "", args.chunk)),
+            ("chunk {}".format(args.chunk), bench_chunks(stream, args.sentence, args.chunk))):
+        print("{:<10} {:>6} acquired {:>10.0f} sentences/s".format(label, hits, sentences / elapsed))
+
+if __name__ == "__main__":
+    main()
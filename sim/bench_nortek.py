@@ -0,0 +1,379 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmarks the Aquadopp structure decoding on recorded frames.
+
+Usage:
+    python sim/bench_nortek.py
+    python sim/bench_nortek.py --record adcp.bin --frames 500
+    python sim/bench_nortek.py --file adcp.bin
+
+Without --file a GA configuration reply and the velocity data frames are
+recorded from the simulated Aquadopp with the deployment config in
+firmware/config. The per field slicing decoders the firmware used before
+are compared with the ustruct layouts in tools.nortek, and the per word
+checksum loop with tools.nortek.checksum: time and peak transient allocation
+per frame, and the fields that decode differently.
+
+The layouts must decode every structure as the slicing decoders do, but
+for the fixes they were written for: pitch, roll, temperature and cell
+velocities are signed words, AnaInAddr is the word at offset 70, the
+SoundSpeed/AnaIn2 word goes to one of the two fields only. Any other
+difference, or a checksum that differs, makes the script exit with status 1.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import run
+
+GA_SIZE = 784  # Hardware, head and deployment configurations.
+
+def legacy():
+    """Returns the ADCP driver with the per field slicing decoders."""
+    import ubinascii
+    from dev_nortek_aquadopp import ADCP
+
+    class LEGACY(ADCP):
+        """Decoders and checksum as in the driver before the ustruct layouts."""
+
+        def _calc_checksum(self, reply):
+            """Computes data checksum: b58c(hex) + sum of all words in structure.
+
+            Params:
+                reply(bytes)
+            """
+            sum=0
+            j=0
+            for i in range(int.from_bytes(reply[2:4], "little")-1):
+                sum += int.from_bytes(reply[j:j+2], "little")
+                j = j+2
+            return (int.from_bytes(b"\xb5\x8c", "big") + sum) % 65536
+
+        def _parse_hw_cfg(self, reply):
+            """Parses the hardware configuration
+
+            Params:
+                reply(bytes)
+            Returns:
+                string
+            """
+            return (
+                "{:02x}".format(reply[0]),                                         # [0] Sync
+                "{:02x}".format(int.from_bytes(reply[1:2], "little")),             # [1] Id
+                int.from_bytes(reply[2:4], "little"),                              # [2] Size
+                reply[4:18].decode("ascii"),                                       # [3] SerialNo
+                self._decode_hw_cfg(int.from_bytes(reply[18:20], "little")),       # [4] Config
+                int.from_bytes(reply[20:22], "little"),                            # [5] Frequency
+                reply[22:24],                                                      # [6] PICVersion
+                int.from_bytes(reply[24:26], "little"),                            # [7] HWRevision
+                int.from_bytes(reply[26:28], "little"),                            # [8] RecSize
+                self._decode_hw_status(int.from_bytes(reply[28:30], "little")),    # [9] Status
+                reply[30:42],                                                      # [10] Spare
+                reply[42:46].decode("ascii")                                       # [11] FWVersion
+                )
+
+        def _parse_usr_cfg(self, bytestring):
+            """Parses the deployment constants."""
+            return (
+                "{:02x}".format(bytestring[0]),                                     # [0] Sync
+                "{:02x}".format((int.from_bytes(bytestring[1:2], "little"))),       # [1] Id
+                int.from_bytes(bytestring[2:4], "little"),                          # [2] Size
+                int.from_bytes(bytestring[4:6], "little"),                          # [3] T1
+                int.from_bytes(bytestring[6:8], "little"),                          # [4] T2, BlankingDistance
+                int.from_bytes(bytestring[8:10], "little"),                         # [5] T3
+                int.from_bytes(bytestring[10:12], "little"),                        # [6] T4
+                int.from_bytes(bytestring[12:14], "little"),                        # [7] T5
+                int.from_bytes(bytestring[14:16], "little"),                        # [8] NPings
+                int.from_bytes(bytestring[16:18], "little"),                        # [9] AvgInterval
+                int.from_bytes(bytestring[18:20], "little"),                        # [10] NBeams
+                self._decode_usr_timctrlreg(int.from_bytes(bytestring[20:22], "little")),   # [11] TimCtrlReg
+                self._decode_usr_pwrctrlreg(int.from_bytes(bytestring[22:24], "little")),   # [12] Pwrctrlreg
+                bytestring[24:26],                                                  # [13] A1 Not used.
+                bytestring[26:28],                                                  # [14] B0 Not used.
+                bytestring[28:30],                                                  # [15] B1 Not used.
+                int.from_bytes(bytestring[30:32], "little"),                        # [16] CompassUpdRate
+                self.coord_system[int.from_bytes(bytestring[32:34], "little")],     # [17] CoordSystem
+                int.from_bytes(bytestring[34:36], "little"),                        # [18] Nbins
+                int.from_bytes(bytestring[36:38], "little"),                        # [19] BinLength
+                int.from_bytes(bytestring[38:40], "little"),                        # [20] MeasInterval
+                bytestring[40:46].decode("utf-8"),                                  # [21] DeployName
+                int.from_bytes(bytestring[46:48], "little"),                        # [22] WrapMode
+                ubinascii.hexlify(bytestring[48:54]).decode("utf-8"),               # [23] ClockDeploy
+                int.from_bytes(bytestring[54:58], "little"),                        # [24] DiagInterval
+                self._decode_usr_mode(int.from_bytes(bytestring[58:60], "little")), # [25] Mode
+                int.from_bytes(bytestring[60:62], "little"),                        # [26] AdjSoundSpeed
+                int.from_bytes(bytestring[62:64], "little"),                        # [27] NSampDiag
+                int.from_bytes(bytestring[64:66], "little"),                        # [28] NbeamsCellDiag
+                int.from_bytes(bytestring[66:68], "little"),                        # [29] NpingDiag
+                self._decode_usr_modetest(int.from_bytes(bytestring[68:70], "little")),     # [30] ModeTest
+                int.from_bytes(bytestring[68:72], "little"),                        # [31] AnaInAddr
+                int.from_bytes(bytestring[72:74], "little"),                        # [32] SWVersion
+                int.from_bytes(bytestring[74:76], "little"),                        # [33] Salinity
+                ubinascii.hexlify(bytestring[76:256]),                              # [34] VelAdjTable
+                bytestring[256:336].decode("utf-8"),                                # [35] Comments
+                ubinascii.hexlify(bytestring[336:384]),                             # [36] Spare
+                int.from_bytes(bytestring[384:386], "little"),                      # [37] Processing Method
+                ubinascii.hexlify(bytestring[386:436]),                             # [38] Spare
+                self._decode_usr_wavemode(int.from_bytes(bytestring[436:438], "little")),   # [39] Wave Measurement Mode
+                int.from_bytes(bytestring[438:440], "little"),                      # [40] DynPercPos
+                int.from_bytes(bytestring[440:442], "little"),                      # [41] T1
+                int.from_bytes(bytestring[442:444], "little"),                      # [42] T2
+                int.from_bytes(bytestring[444:446], "little"),                      # [43] T3
+                int.from_bytes(bytestring[446:448], "little"),                      # [44] NSamp
+                bytestring[448:450].decode("utf-8"),                                # [45] A1 Not used.
+                bytestring[450:452].decode("utf-8"),                                # [46] B0 Not used.
+                bytestring[452:454].decode("utf-8"),                                # [47] B1 Not used.
+                ubinascii.hexlify(bytestring[454:456]),                             # [48] Spare
+                int.from_bytes(bytestring[456:458], "little"),                      # [49] AnaOutScale
+                int.from_bytes(bytestring[458:460], "little"),                      # [50] CorrThresh
+                ubinascii.hexlify(bytestring[460:462]),                             # [51] Spare
+                int.from_bytes(bytestring[462:464], "little"),                      # [52] TiLag2
+                ubinascii.hexlify(bytestring[464:486]),                             # [53] Spare
+                bytestring[486:510]                                                 # [54] QualConst
+                )
+
+        def _parse_head_cfg(self, bytestring):
+            """Parses the head constants."""
+            return (
+                "{:02x}".format(bytestring[0]),                                     # [0] Sync
+                "{:02x}".format(int.from_bytes(bytestring[1:2], "little")),         # [1] Id
+                int.from_bytes(bytestring[2:4], "little") * 2,                      # [2] Size
+                self._decode_head_cfg(int.from_bytes(bytestring[4:6], "little")),   # [3] Config
+                int.from_bytes(bytestring[6:8], "little"),                          # [4] Frequency
+                bytestring[8:10],                                                   # [5] Type
+                bytestring[10:22].decode("ascii"),                                  # [6] SerialNo
+                bytestring[22:198],                                                 # [7] System
+                bytestring[198:220],                                                # [8] Spare
+                int.from_bytes(bytestring[220:222], "little")                       # [9] NBeams
+                )
+
+        def _conv_data(self, bytestring):
+            """Converts sample bytestring to ascii string."""
+            return (
+                ubinascii.hexlify(bytestring[9:10]).decode("ascii"),                # [0] Month
+                ubinascii.hexlify(bytestring[6:7]).decode("ascii"),                 # [1] Day
+                ubinascii.hexlify(bytestring[8:9]).decode("ascii"),                 # [2] Year
+                ubinascii.hexlify(bytestring[7:8]).decode("ascii"),                 # [3] Hour
+                ubinascii.hexlify(bytestring[4:5]).decode("ascii"),                 # [4] Minute
+                ubinascii.hexlify(bytestring[5:6]).decode("ascii"),                 # [5] Second
+                self._get_error(int.from_bytes(bytestring[10:12], "little")),       # [6] Error code
+                self._get_status(int.from_bytes(bytestring[25:26], "little")),      # [7] Status code
+                int.from_bytes(bytestring[14:16], "little") / 10,                   # [8] Battery voltage
+                int.from_bytes(bytestring[16:18], "little") / 10,                   # [9] Soundspeed
+                int.from_bytes(bytestring[18:20], "little") / 10,                   # [10] Heading
+                int.from_bytes(bytestring[20:22], "little") / 10,                   # [11] Pitch
+                int.from_bytes(bytestring[22:24], "little") / 10,                   # [12] Roll
+                self._calc_pressure(bytestring[24:25], bytestring[26:28]) / 1000,   # [13] Pressure
+                int.from_bytes(bytestring[28:30], "little") / 100,                  # [14] Temperature
+                int.from_bytes(bytestring[12:14], "little") / 10,                   # [15] Analog input 1
+                int.from_bytes(bytestring[16:18], "little") / 10                    # [16] Analog input 2
+                ) + self._get_cells(bytestring[30:])                                # [17:] x1,y1,z1, x2, y2, z2, x3, y3, z3...
+
+        def _calc_pressure(self, pressureMSB, pressureLSW):
+            """Calculates pressure value.
+
+            Params:
+                pressureMSB, pressureLSW(float)
+            Returns:
+                pressure(float)
+            """
+            return 65536 * int.from_bytes(pressureMSB, "little") + int.from_bytes(pressureLSW, "little")
+
+        def _get_cells(self, bytestring):
+            """Extracts cells data from sample bytestring.
+
+            Params:
+                bytestring
+            Returns:
+                list(x1, x2, x3... y1, y2, y3... z1, z2, z3..., a11, a12 , a13..., a21, a22, a23..., a31, a32, a33...)
+            """
+            cells = []
+            if self.usr_cfg:
+                nbins = self.usr_cfg[18]
+                nbeams = self.usr_cfg[10]
+                j = 0
+                for beam in range(nbeams):
+                    for bin in range(nbins):
+                        cells.append(int.from_bytes(bytestring[j:j+2], "little"))
+                        j += 2
+                for beam in range(nbeams):
+                    for bin in range(nbins):
+                        cells.append(int.from_bytes(bytestring[j:j+1], "little"))
+                        j += 1
+            return tuple(cells)
+
+    return LEGACY
+
+def record(frames):
+    """Records a GA reply and velocity data frames from the simulated Aquadopp.
+
+    Params:
+        frames(int)
+    Returns:
+        stream(bytes): GA reply, then the frames
+    """
+    import instruments
+    with open(os.path.join(run.FIRMWARE, "config", "_dev_nortek_aquadopp.pdc"), "rb") as pdc:
+        adcp = instruments.AQUADOPP(usr_cfg=pdc.read(), seed=1)
+    stream = adcp.hw_cfg() + adcp.head_cfg() + bytes(adcp.usr_cfg)
+    for _ in range(frames):
+        stream += adcp.velocity_data()
+    return stream
+
+def decoder(cls, ga):
+    """Returns a driver object with the configuration decoded, no device set up."""
+    obj = cls.__new__(cls)
+    obj.hw_cfg, obj.head_cfg, obj.usr_cfg = decode_cfg(obj, ga)
+    return obj
+
+def decode_cfg(obj, ga):
+    return obj._parse_hw_cfg(ga[0:48]), obj._parse_head_cfg(ga[48:272]), obj._parse_usr_cfg(ga[272:784])
+
+def bench(decode, items, repeat):
+    """Returns time (us) and peak transient allocation (bytes) per item."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            decode(item)
+    elapsed = (time.perf_counter() - start) / repeat / len(items) * 1000000
+    tracemalloc.start()
+    peak = 0
+    for item in items:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        decode(item)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return elapsed, peak
+
+"""Fields the slicing decoders read unsigned, as index:scale."""
+SIGNED = {11:10, 12:10, 14:100}
+
+def differences(old, new):
+    """Returns the indexes of the fields decoded differently."""
+    return [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+
+def signed(value, scale):
+    """Returns an unsigned scaled word read as signed."""
+    word = round(value * scale)
+    if word >= 32768:
+        word -= 65536
+    return word / scale if scale > 1 else word
+
+def fixed(label, obj, old):
+    """Returns the legacy fields with the documented fixes applied.
+
+    Params:
+        label(str): hw, head, usr or velocity
+        obj(ADCP): decoder with the configuration
+        old(tuple): legacy fields
+    """
+    old = list(old)
+    if label == "usr":
+        old[31] >>= 16  # Read from 4 bytes at offset 68, the word at 70 is the high one.
+    elif label == "velocity":
+        for i, scale in SIGNED.items():
+            old[i] = signed(old[i], scale)
+        for i in range(17, 17 + obj.usr_cfg[10] * obj.usr_cfg[18]):
+            old[i] = signed(old[i], 1)
+        if obj.usr_cfg[25][-1] == "1":  # User specified sound speed, the word is AnaIn2.
+            old[9] = None
+        else:
+            old[16] = None
+    return tuple(old)
+
+def check(old, new, ga, frames, structures):
+    """Compares the layouts with the slicing decoders.
+
+    Returns:
+        mismatches(list): labels of the structures decoded differently
+    """
+    mismatches = []
+    if [old._calc_checksum(data) for data in structures] != [new._calc_checksum(data) for data in structures]:
+        mismatches.append("checksum")
+    for label, a, b in (
+            ("hw", old.hw_cfg, new.hw_cfg),
+            ("head", old.head_cfg, new.head_cfg),
+            ("usr", old.usr_cfg, new.usr_cfg)):
+        if fixed(label, new, a) != tuple(b):
+            mismatches.append(label)
+    for frame in frames:
+        if fixed("velocity", new, old._conv_data(frame)) != tuple(new._conv_data(frame)):
+            mismatches.append("velocity")
+            break
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--file", help="recorded stream, default records from the simulator")
+    parser.add_argument("--record", help="saves the recorded stream to file")
+    parser.add_argument("--frames", type=int, default=200, help="velocity frames to record")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    for path in (run.SIM, run.FIRMWARE):  # No run.setup(), tracemalloc would skew the timings.
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    os.chdir(run.FIRMWARE)  # The driver reads its config on import.
+    from dev_nortek_aquadopp import ADCP
+    if args.file:
+        with open(args.file, "rb") as file:
+            stream = file.read()
+    else:
+        stream = record(args.frames)
+    if args.record:
+        with open(args.record, "wb") as file:
+            file.write(stream)
+    ga = stream[:GA_SIZE]
+    old, new = decoder(legacy(), ga), decoder(ADCP, ga)
+    frames = []
+    i = GA_SIZE
+    while i < len(stream):
+        size = int.from_bytes(stream[i + 2:i + 4], "little") * 2
+        frames.append(stream[i:i + size])
+        i += size
+    structures = [ga[0:48], ga[48:272], ga[272:784]] + frames
+    print("{} velocity frames of {} bytes, {} beams x {} bins".format(len(frames), len(frames[0]), new.usr_cfg[10], new.usr_cfg[18]))
+    for label, items, method in (
+            ("GA config", [ga], lambda obj: lambda data: decode_cfg(obj, data)),
+            ("velocity", frames, lambda obj: obj._conv_data),
+            ("checksum", structures, lambda obj: obj._calc_checksum)):
+        for name, obj in (("legacy", old), ("ustruct", new)):
+            elapsed, peak = bench(method(obj), items, args.repeat if len(items) > 1 else args.repeat * 100)
+            print("{:<10} {:<8} {:>8.1f} us/frame {:>7} bytes peak".format(label, name, elapsed, peak))
+    for label, a, b in (
+            ("hw", old.hw_cfg, new.hw_cfg),
+            ("head", old.head_cfg, new.head_cfg),
+            ("usr", old.usr_cfg, new.usr_cfg),
+            ("velocity", old._conv_data(frames[0]), new._conv_data(frames[0]))):
+        print("{:<8} fields decoded differently: {}".format(label, differences(a, b) or "none"))
+    mismatches = check(old, new, ga, frames, structures)
+    if mismatches:
+        print("layouts differ from slicing decoders beyond the fixes: {}".format(", ".join(mismatches)))
+        sys.exit(1)
+    print("layouts match slicing decoders but for the fixes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""Benchmarks the sine/cosine lookup table against the math module.
+
+Usage:
+    python sim/bench_trig.py
+    python sim/bench_trig.py --samples 100000
+
+Reports the throughput of a speed weighted circular mean accumulated with
+math.sin(math.radians()) and with tools.stats.CIRCULAR, the max error of
+the table over all the 3600 tenths of degree and the error of the mean
+direction and speed on random wind samples.
+
+The table must stay within TABLE_ERROR of math over all the tenths and
+the means within MEAN_ERROR of the math ones, otherwise the script exits
+with status 1.
+
+On CPython libm is native code and the interpreter overhead dominates, so
+the host figures understate the table gain on the pyboard, where math.sin
+runs in software single precision.
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+
+import run
+
+"""Max error of the table, single precision floats resolve about 6e-8 at 1."""
+TABLE_ERROR = 1e-6
+
+"""Max error of the mean direction (deg) and of the mean speed."""
+MEAN_ERROR = 1e-4
+
+def math_mean(samples):
+    """Speed weighted mean direction and resultant, as the firmware computed it."""
+    x = 0
+    y = 0
+    for tenths, speed in samples:
+        x += math.sin(math.radians(tenths / 10)) * speed
+        y += math.cos(math.radians(tenths / 10)) * speed
+    return math.degrees(math.atan2(x, y)) % 360, math.sqrt(x * x + y * y) / len(samples)
+
+def table_mean(samples):
+    from tools.stats import CIRCULAR
+    wind = CIRCULAR()
+    for tenths, speed in samples:
+        wind.add_tenths(tenths, speed)
+    return wind.mean(), wind.resultant()
+
+def timed(function, samples):
+    start = time.perf_counter()
+    result = function(samples)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=20000, help="wind samples")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    for path in (run.SIM, run.FIRMWARE):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    from tools.stats import sin10, cos10
+    error = 0
+    for tenths in range(3600):
+        error = max(error, abs(sin10(tenths) - math.sin(math.radians(tenths / 10))), abs(cos10(tenths) - math.cos(math.radians(tenths / 10))))
+    print("table max error {:.2e} over 3600 tenths".format(error))
+    rnd = random.Random(args.seed)
+    samples = [(int(rnd.gauss(1800, 300)) % 3600, max(0, rnd.gauss(5, 2))) for _ in range(args.samples)]
+    (math_dir, math_speed), math_time = timed(math_mean, samples)
+    (table_dir, table_speed), table_time = timed(table_mean, samples)
+    print("math   {:>10.0f} samples/s  direction {:.4f}  speed {:.4f}".format(args.samples / math_time, math_dir, math_speed))
+    print("table  {:>10.0f} samples/s  direction {:.4f}  speed {:.4f}".format(args.samples / table_time, table_dir, table_speed))
+    print("error  direction {:.2e} deg  speed {:.2e}".format(abs(math_dir - table_dir), abs(math_speed - table_speed)))
+    if error > TABLE_ERROR or abs(math_dir - table_dir) > MEAN_ERROR or abs(math_speed - table_speed) > MEAN_ERROR:
+        print("table out of bounds")
+        sys.exit(1)
+    print("table within bounds")
+
+if __name__ == "__main__":
+    main()
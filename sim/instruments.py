@@ -0,0 +1,815 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Simulated instruments for host side regression and performance tests.
+
+Each instrument sits behind a pyb.UART stub (see pyb.attach) and talks the
+protocol of the real one closely enough for the firmware drivers to run
+unmodified. All of them share:
+
+    baudrate: bytes are delivered at the line rate (10 bits per char), None
+              delivers them at once.
+    noise: probability of a bit error per transmitted byte.
+    faults: {"drop":p, "garbage":p, "stall":(start, duration), "mute":p}
+            drop: probability to lose a whole frame or reply.
+            garbage: probability to prepend random bytes to a frame.
+            stall: silent window (sec.) counted from power on.
+            mute: probability to ignore a command.
+    seed: random generator seed, for repeatable runs.
+"""
+
+import math
+import time
+import random
+import threading
+import calendar
+from collections import deque
+
+def _nmea(body):
+    """Returns a complete NMEA sentence from its body (no $ and checksum)."""
+    checksum = 0
+    for char in body.encode("ascii"):
+        checksum ^= char
+    return "${}*{:02X}\r\n".format(body, checksum).encode("ascii")
+
+def _bcd(value):
+    return (value // 10) << 4 | value % 10
+
+def _unbcd(value):
+    return (value >> 4) * 10 + (value & 0x0f)
+
+class INSTRUMENT(object):
+    """Base simulated instrument."""
+
+    def __init__(self, baudrate=9600, noise=0, faults=None, warmup=0, seed=None):
+        self.baudrate = baudrate
+        self.noise = noise
+        self.faults = faults or {}
+        self.warmup = warmup
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.powered = False
+        self.powered_at = 0
+        self.connected = False
+        self.read_buf_len = 64
+        self.line_free_at = 0  # Time the line ends transmitting queued bytes.
+        self.pending = deque()  # (time, byte) on the line.
+        self.rx = bytearray()  # Board uart rx buffer.
+        self.overruns = 0
+        self.frames = 0
+        self.dropped = 0
+
+    def connect(self, baudrate, read_buf_len):
+        """Called by the uart stub on init, which resets the rx buffer."""
+        with self.lock:
+            self._pump()
+            self.connected = True
+            self.read_buf_len = read_buf_len
+            self.rx = bytearray()
+
+    def disconnect(self):
+        """Called by the uart stub on deinit, unread bytes are lost."""
+        with self.lock:
+            self.connected = False
+            self.rx = bytearray()
+            self.pending.clear()
+
+    def power(self, on):
+        """Called when the control pin changes."""
+        with self.lock:
+            if on and not self.powered:
+                self.powered = True
+                self.powered_at = time.monotonic()
+                self.on_power_up()
+            elif not on and self.powered:
+                self.powered = False
+                self.pending.clear()
+                self.on_power_down()
+
+    def on_power_up(self):
+        pass
+
+    def on_power_down(self):
+        pass
+
+    def uptime(self):
+        return time.monotonic() - self.powered_at
+
+    def ready(self):
+        """Powered, warmed up and not stalled."""
+        if not self.powered or self.uptime() < self.warmup:
+            return False
+        stall = self.faults.get("stall")
+        if stall and stall[0] <= self.uptime() < stall[0] + stall[1]:
+            return False
+        return True
+
+    def _fault(self, name):
+        return self.random.random() < self.faults.get(name, 0)
+
+    def transmit(self, data, delay=0):
+        """Queues bytes on the line towards the board, applying faults.
+
+        Params:
+            data(bytes)
+            delay(float): sec. before the first byte
+        """
+        with self.lock:
+            if not self.ready():
+                return
+            if self._fault("drop"):
+                self.dropped += 1
+                return
+            if self._fault("garbage"):
+                data = bytes(self.random.randrange(256) for _ in range(self.random.randrange(1, 16))) + data
+            self.frames += 1
+            now = time.monotonic()
+            start = max(now + delay, self.line_free_at)
+            char_time = 10 / self.baudrate if self.baudrate else 0
+            for i, byte in enumerate(data):
+                if self.noise and self.random.random() < self.noise:
+                    byte ^= 1 << self.random.randrange(8)
+                self.pending.append((start + (i + 1) * char_time, byte))
+            self.line_free_at = start + len(data) * char_time
+
+    def _pump(self):
+        """Moves bytes arrived by now to the board rx buffer."""
+        now = time.monotonic()
+        self.tick(now)
+        while self.pending and self.pending[0][0] <= now:
+            byte = self.pending.popleft()[1]
+            if not self.connected:
+                continue
+            if len(self.rx) >= self.read_buf_len:
+                self.overruns += 1
+                continue
+            self.rx.append(byte)
+
+    def tick(self, now):
+        """Periodic output, overridden by streaming instruments."""
+        pass
+
+    def available(self):
+        with self.lock:
+            self._pump()
+            return len(self.rx)
+
+    def take(self, nbytes=None):
+        with self.lock:
+            self._pump()
+            if nbytes is None:
+                nbytes = len(self.rx)
+            data = bytes(self.rx[:nbytes])
+            del self.rx[:nbytes]
+            return data
+
+    def receive(self, data):
+        """Bytes written by the board."""
+        with self.lock:
+            if not self.powered or self._fault("mute"):
+                return
+            self.handle(data)
+
+    def handle(self, data):
+        pass
+
+class YOUNG32500(INSTRUMENT):
+    """Young 32500 compass / wind interface.
+
+    Params:
+        data_format(str): "STRING" or "NMEA"
+        rate(float): frames per second
+        wind(tuple): mean speed (m/s), mean direction (deg), speed sd, direction sd
+        temp, press, hum, rad, heading(float)
+    """
+
+    def __init__(self, data_format="STRING", rate=2, wind=(5, 180, 1, 10), temp=20, press=1013, hum=70, rad=300, heading=90, **kwargs):
+        INSTRUMENT.__init__(self, **kwargs)
+        self.data_format = data_format
+        self.rate = rate
+        self.wind = wind
+        self.temp = temp
+        self.press = press
+        self.hum = hum
+        self.rad = rad
+        self.heading = heading
+        self.next_frame = 0
+
+    def on_power_up(self):
+        self.next_frame = self.powered_at + self.warmup
+
+    def sample(self):
+        """Returns a wind speed (m/s) and direction (deg) sample."""
+        speed = max(0, self.random.gauss(self.wind[0], self.wind[2]))
+        direction = self.random.gauss(self.wind[1], self.wind[3]) % 360
+        return speed, direction
+
+    def frame(self):
+        speed, direction = self.sample()
+        if self.data_format == "NMEA":
+            return _nmea("WIMWV,{:03.0f},R,{:05.1f},N,A".format(direction, speed / 0.514444)) + \
+                _nmea("WIXDR,C,{:05.1f},C,TEMP,H,{:03.0f},P,%RH,P,{:.3f},B,BARO".format(self.temp, self.hum, self.press / 1000))
+        return "{:d} {:d} {:d} {:d} {:d} {:d} {:d}\r\n".format(
+            int(speed / 0.049029417),
+            int(direction * 10) % 3600,
+            int((self.temp + 50) / 0.025),
+            int((self.press - 950) / 0.02),
+            int(self.hum / 0.025),
+            int(self.rad / 0.35862),
+            int(self.heading * 10) % 3600
+            ).encode("ascii")
+
+    def tick(self, now):
+        if not self.ready():
+            return
+        while self.next_frame <= now:
+            self.transmit(self.frame(), self.next_frame - now)
+            self.next_frame += 1 / self.rate
+
+class QUECTELL80(INSTRUMENT):
+    """Quectel L80 gps, NMEA output at fix_rate.
+
+    Params:
+        position(tuple): lat, lon (deg)
+        drift(tuple): north, east speed (m/s)
+        ttff(float): cold start time to first fix (sec.)
+        hot_ttff(float): time to first fix with backup power (sec.)
+        clock_offset(float): gps vs host clock (sec.)
+    """
+
+    sentences = ("GLL", "RMC", "VTG", "GGA", "GSA", "GSV")
+
+    def __init__(self, position=(45.70, 13.71), drift=(0, 0), ttff=35, hot_ttff=2, clock_offset=0, **kwargs):
+        INSTRUMENT.__init__(self, **kwargs)
+        self.position = position
+        self.drift = drift
+        self.ttff = ttff
+        self.hot_ttff = hot_ttff
+        self.clock_offset = clock_offset
+        self.fix_interval = 1.0
+        self.output = {"GLL":1, "RMC":1, "VTG":1, "GGA":1, "GSA":1, "GSV":1}
+        self.backup = False  # Backup power keeps almanac and last fix.
+        self.has_fixed = False
+        self.fix_at = 0
+        self.next_frame = 0
+        self.epochs = 0
+        self.rx_line = bytearray()
+
+    def on_power_up(self):
+        self.epochs = 0
+        self.fix_at = self.powered_at + (self.hot_ttff if self.backup and self.has_fixed else self.ttff)
+        self.next_frame = self.powered_at + self.warmup + self.fix_interval
+
+    def fixed(self, now):
+        return now >= self.fix_at
+
+    def coordinates(self, now):
+        dt = now - self.powered_at
+        lat = self.position[0] + self.drift[0] * dt / 111320
+        lon = self.position[1] + self.drift[1] * dt / (111320 * max(0.01, abs(math.cos(math.radians(lat)))))
+        return lat, lon
+
+    def _ddmm(self, value, width):
+        deg = int(abs(value))
+        return "{:0{}d}{:07.4f}".format(deg, width, (abs(value) - deg) * 60)
+
+    def frame(self, now):
+        utc = time.gmtime(time.time() + self.clock_offset)
+        hhmmss = "{:02d}{:02d}{:02d}.000".format(utc.tm_hour, utc.tm_min, utc.tm_sec)
+        ddmmyy = "{:02d}{:02d}{:02d}".format(utc.tm_mday, utc.tm_mon, utc.tm_year % 100)
+        fixed = self.fixed(now)
+        if fixed:
+            self.has_fixed = True
+            lat, lon = self.coordinates(now)
+            lat_s, lat_h = self._ddmm(lat, 2), "N" if lat >= 0 else "S"
+            lon_s, lon_h = self._ddmm(lon, 3), "E" if lon >= 0 else "W"
+        else:
+            lat_s = lat_h = lon_s = lon_h = ""
+        frame = b""
+        self.epochs += 1
+        for sentence in self.sentences:
+            rate = self.output.get(sentence, 0)
+            if not rate or self.epochs % rate:
+                continue
+            if sentence == "RMC":
+                frame += _nmea("GPRMC,{},{},{},{},{},{},{},{},{},,,{}".format(hhmmss, "A" if fixed else "V", lat_s, lat_h, lon_s, lon_h, "0.12" if fixed else "", "271.40" if fixed else "", ddmmyy, "A" if fixed else "N"))
+            elif sentence == "VTG":
+                frame += _nmea("GPVTG,{},T,,M,{},N,{},K,{}".format("271.40" if fixed else "", "0.12" if fixed else "", "0.22" if fixed else "", "A" if fixed else "N"))
+            elif sentence == "GGA":
+                frame += _nmea("GPGGA,{},{},{},{},{},{},{},{},{},M,{},M,,".format(hhmmss, lat_s, lat_h, lon_s, lon_h, 1 if fixed else 0, "08" if fixed else "00", "1.02" if fixed else "", "12.3" if fixed else "", "44.8" if fixed else ""))
+            elif sentence == "GSA":
+                frame += _nmea("GPGSA,A,{},05,13,15,18,20,21,24,29,,,,,1.35,1.02,0.88".format(3 if fixed else 1))
+            elif sentence == "GSV":
+                frame += _nmea("GPGSV,3,1,12,05,55,181,42,13,68,062,45,15,39,286,40,18,14,321,33")
+                frame += _nmea("GPGSV,3,2,12,20,33,112,41,21,22,050,36,24,10,280,29,29,45,213,44")
+                frame += _nmea("GPGSV,3,3,12,02,05,040,,10,02,170,,26,01,330,,30,03,096,")
+            elif sentence == "GLL":
+                frame += _nmea("GPGLL,{},{},{},{},{},{},{}".format(lat_s, lat_h, lon_s, lon_h, hhmmss, "A" if fixed else "V", "A" if fixed else "N"))
+        return frame
+
+    def tick(self, now):
+        if not self.ready():
+            return
+        while self.next_frame <= now:
+            self.transmit(self.frame(self.next_frame), self.next_frame - now)
+            self.next_frame += self.fix_interval
+
+    def handle(self, data):
+        self.rx_line.extend(data)
+        while b"\n" in self.rx_line:
+            line, _, rest = bytes(self.rx_line).partition(b"\n")
+            self.rx_line = bytearray(rest)
+            self.command(line.strip().decode("ascii", "replace"))
+
+    def command(self, line):
+        """Handles PMTK packets."""
+        if not line.startswith("$PMTK") or "*" not in line:
+            return
+        body, checksum = line[1:].split("*", 1)
+        calc = 0
+        for char in body.encode("ascii"):
+            calc ^= char
+        fields = body.split(",")
+        cmd = fields[0][4:]
+        if "{:02X}".format(calc) != checksum.upper():
+            self.transmit(_nmea("PMTK001,{},1".format(cmd)))
+            return
+        flag = 3
+        if cmd == "314":
+            if len(fields) > 1 and fields[1] == "-1":
+                self.output = {"GLL":1, "RMC":1, "VTG":1, "GGA":1, "GSA":1, "GSV":1}
+            else:
+                for i, sentence in enumerate(("GLL", "RMC", "VTG", "GGA", "GSA", "GSV")):
+                    self.output[sentence] = int(fields[i + 1]) if i + 1 < len(fields) and fields[i + 1] else 0
+        elif cmd == "220":
+            self.fix_interval = max(0.1, int(fields[1]) / 1000)
+        elif cmd == "101":  # Hot start.
+            self.on_power_up()
+        elif cmd == "102":  # Warm start.
+            self.fix_at = time.monotonic() + (self.ttff + self.hot_ttff) / 2
+        elif cmd in ("103", "104"):  # Cold / full cold start.
+            self.has_fixed = False
+            self.fix_at = time.monotonic() + self.ttff
+        elif cmd == "225":  # Periodic / backup modes.
+            self.backup = True
+        elif cmd == "869":  # EASY.
+            pass
+        else:
+            flag = 1
+        self.transmit(_nmea("PMTK001,{},{}".format(cmd, flag)))
+
+class METRECX(INSTRUMENT):
+    """AML Metrec-X ctd, streams scans while scanning, answers commands at the
+    ">" prompt after <CTRL+C>.
+
+    Params:
+        boot_time(float): sec. before the instrument answers after power up
+        latency(float): reply delay (sec.)
+        sample_rate(int): sec. between scans
+        values(tuple): channel readings
+        scans(int): scans already in memory
+    """
+
+    def __init__(self, boot_time=1, latency=0.005, sample_rate=1, values=(12.345, 37.512, 15.210, 10.05), scans=0, **kwargs):
+        INSTRUMENT.__init__(self, **kwargs)
+        self.boot_time = boot_time
+        self.latency = latency
+        self.sample_rate = sample_rate
+        self.values = values
+        self.logging = True
+        self.scanning = False
+        self.clock_offset = 0  # Instrument vs host clock (sec.).
+        self.memory = []  # Logged scans.
+        self.next_scan = 0
+        self.line = bytearray()
+        for _ in range(scans):
+            self.memory.append(self.scan())
+
+    def on_power_up(self):
+        self.scanning = True
+        self.next_scan = self.powered_at + self.boot_time + self.sample_rate
+
+    def ready(self):
+        return INSTRUMENT.ready(self) and self.uptime() >= self.boot_time
+
+    def now(self):
+        return time.time() + self.clock_offset
+
+    def scan(self):
+        t = time.gmtime(self.now())
+        values = "  ".join("{:.3f}".format(value + self.random.gauss(0, 0.001)) for value in self.values)
+        return "{:02d}/{:02d}/{:02d} {:02d}:{:02d}:{:02d}  {}".format(t.tm_mon, t.tm_mday, t.tm_year % 100, t.tm_hour, t.tm_min, t.tm_sec, values)
+
+    def tick(self, now):
+        if not self.ready() or not self.scanning:
+            return
+        while self.next_scan <= now:
+            scan = self.scan()
+            if self.logging:
+                self.memory.append(scan)
+            self.transmit(scan.encode("ascii") + b"\r\n", self.next_scan - now)
+            self.next_scan += self.sample_rate
+
+    def reply(self, echo, *lines):
+        self.transmit(echo.encode("ascii") + b"\r\n" + b"".join(line.encode("ascii") + b"\r\n" for line in lines) + b">", self.latency)
+
+    def handle(self, data):
+        if not self.ready():
+            return
+        for byte in data:
+            if byte == 0x03:  # <CTRL+C>
+                self.scanning = False
+                self.line = bytearray()
+                self.transmit(b"\r\n>", self.latency)
+            elif self.scanning:
+                continue
+            elif byte == 0x0d:
+                self.command(self.line.decode("ascii", "replace").strip())
+                self.line = bytearray()
+            else:
+                self.line.append(byte)
+
+    def command(self, cmd):
+        words = cmd.upper().split()
+        if not words:
+            self.reply("")
+        elif words[:2] == ["SET", "DATE"] and len(words) == 3:
+            t = time.gmtime(self.now())
+            m, d, y = (int(x) for x in words[2].split("/"))
+            self.clock_offset += calendar.timegm((2000 + y, m, d, t.tm_hour, t.tm_min, t.tm_sec)) - int(self.now())
+            self.reply(cmd)
+        elif words[:2] == ["SET", "TIME"] and len(words) == 3:
+            t = time.gmtime(self.now())
+            h, m, s = (int(x) for x in words[2].split(":"))
+            self.clock_offset += calendar.timegm((t.tm_year, t.tm_mon, t.tm_mday, h, m, s)) - int(self.now())
+            self.reply(cmd)
+        elif words[:2] == ["DISPLAY", "DATE"]:
+            t = time.gmtime(self.now())
+            self.reply(cmd, "Date  {:02d}/{:02d}/{:04d}".format(t.tm_mon, t.tm_mday, t.tm_year))
+        elif words[:2] == ["DISPLAY", "TIME"]:
+            t = time.gmtime(self.now())
+            self.reply(cmd, "Time  {:02d}:{:02d}:{:02d}.00".format(t.tm_hour, t.tm_min, t.tm_sec))
+        elif words[:2] == ["SET", "S"] and len(words) >= 3:
+            self.sample_rate = max(1, int(words[2]))
+            self.reply(cmd)
+        elif words[:2] == ["DIS", "S"]:
+            self.reply(cmd, "Sample rate {} S".format(self.sample_rate))
+        elif words == ["SET", "SCAN", "LOGGING"]:
+            self.logging = True
+            self.reply(cmd)
+        elif words == ["SET", "SCAN", "NOLOGGING"]:
+            self.logging = False
+            self.reply(cmd)
+        elif words[:2] == ["DIS", "MEM"]:
+            self.reply(cmd, "Memory {} scans".format(len(self.memory)))
+        elif words[0] == "DUMP" and len(words) == 3:
+            start, count = int(words[1]), int(words[2])
+            self.reply(cmd, *self.memory[start:start + count])
+        elif words[0] in ("MONITOR", "MON"):
+            self.scanning = True
+            self.next_scan = time.monotonic() + self.sample_rate
+            self.transmit(cmd.encode("ascii") + b"\r\n", self.latency)
+        else:
+            self.reply(cmd, "?")
+
+class AQUADOPP(INSTRUMENT):
+    """Nortek Aquadopp profiler, binary command / ACK protocol.
+
+    Params:
+        usr_cfg(bytes): 512 bytes deployment configuration
+        serial(str)
+        latency(float): reply delay (sec.)
+        velocity(tuple): mean east, north, up velocities (mm/s)
+        recorder_files(int): files already in the recorder
+        recorded(int): velocity structures already in the recorder
+    """
+
+    ACK = b"\x06\x06"
+    NAK = b"\x15\x15"
+
+    def __init__(self, usr_cfg=None, serial="AQD 1234", latency=0.01, velocity=(120, -80, 5), recorder_files=0, recorded=0, **kwargs):
+        INSTRUMENT.__init__(self, **kwargs)
+        self.latency = latency
+        self.velocity = velocity
+        self.serial = serial
+        self.usr_cfg = bytearray(usr_cfg) if usr_cfg else self.default_usr_cfg()
+        self.usr_cfg[-2:] = self.checksum(self.usr_cfg[:-2]).to_bytes(2, "little")
+        self.recorder_files = recorder_files
+        self.recorder = bytearray()  # Recorded data structures.
+        self.clock_offset = 0
+        self.mode = "COMMAND"
+        self.recording = False
+        self.interval = 1
+        self.next_sample = 0
+        self.rx_buf = bytearray()
+        for _ in range(recorded):
+            self.recorder += self.velocity_data()
+
+    @staticmethod
+    def checksum(data):
+        total = 0xb58c
+        for i in range(0, len(data) - 1, 2):
+            total += data[i] | data[i + 1] << 8
+        return total & 0xffff
+
+    def structure(self, sid, body):
+        """Returns a complete structure: sync, id, size (words), body, checksum."""
+        data = bytearray(b"\xa5" + bytes([sid]) + ((len(body) + 6) // 2).to_bytes(2, "little") + body)
+        if len(data) % 2:
+            data.append(0)
+        return bytes(data + self.checksum(data).to_bytes(2, "little"))
+
+    def default_usr_cfg(self):
+        cfg = bytearray(512)
+        cfg[0:4] = b"\xa5\x00\x00\x01"
+        cfg[18:20] = (3).to_bytes(2, "little")  # NBeams
+        cfg[34:36] = (20).to_bytes(2, "little")  # NBins
+        cfg[36:38] = (20).to_bytes(2, "little")  # BinLength
+        cfg[38:40] = (300).to_bytes(2, "little")  # MeasInterval
+        cfg[40:46] = b"adcp\x00\x00"
+        return cfg
+
+    def hw_cfg(self):
+        body = self.serial.encode("ascii").ljust(14, b"\x00") + (4).to_bytes(2, "little") + (2000).to_bytes(2, "little") + b"\x00\x00" + (4).to_bytes(2, "little") + (144).to_bytes(2, "little") + b"\x00\x00" + bytes(12) + b"3.37"
+        return self.structure(0x05, body)
+
+    def head_cfg(self):
+        body = (0x0f).to_bytes(2, "little") + (2000).to_bytes(2, "little") + b"\x00\x00" + b"AQP 5678".ljust(12, b"\x00") + bytes(176) + bytes(22) + (3).to_bytes(2, "little")
+        return self.structure(0x04, body)
+
+    def nbeams(self):
+        return int.from_bytes(self.usr_cfg[18:20], "little")
+
+    def nbins(self):
+        return int.from_bytes(self.usr_cfg[34:36], "little")
+
+    def now(self):
+        return time.time() + self.clock_offset
+
+    def clock(self):
+        t = time.gmtime(self.now())
+        return bytes((_bcd(t.tm_min), _bcd(t.tm_sec), _bcd(t.tm_mday), _bcd(t.tm_hour), _bcd(t.tm_year % 100), _bcd(t.tm_mon)))
+
+    def velocity_data(self):
+        """Returns an Aquadopp profiler velocity data structure (id 0x21)."""
+        nbeams, nbins = self.nbeams(), self.nbins()
+        body = bytearray(self.clock())
+        body += (0).to_bytes(2, "little")  # Error
+        body += (0).to_bytes(2, "little")  # AnaIn1
+        body += (125).to_bytes(2, "little")  # Battery
+        body += (15000).to_bytes(2, "little")  # SoundSpeed / AnaIn2
+        body += (900).to_bytes(2, "little", signed=True)  # Heading
+        body += (12).to_bytes(2, "little", signed=True)  # Pitch
+        body += (-7).to_bytes(2, "little", signed=True)  # Roll
+        body += bytes((0, 0x34))  # PressureMSB, Status
+        body += (12345).to_bytes(2, "little")  # PressureLSW
+        body += (1520).to_bytes(2, "little", signed=True)  # Temperature
+        for beam in range(nbeams):
+            for bin in range(nbins):
+                vel = self.velocity[beam % 3] * (1 - bin / (2 * nbins)) + self.random.gauss(0, 10)
+                body += int(vel).to_bytes(2, "little", signed=True)
+        for beam in range(nbeams):
+            for bin in range(nbins):
+                body.append(max(0, min(255, int(160 - bin * 4 + self.random.gauss(0, 3)))))
+        return self.structure(0x21, bytes(body))
+
+    def on_power_up(self):
+        self.mode = "COMMAND"
+        self.rx_buf = bytearray()
+
+    def tick(self, now):
+        if not self.ready() or self.mode != "MEASUREMENT":
+            return
+        while self.next_sample <= now:
+            sample = self.velocity_data()
+            if self.recording:
+                self.recorder += sample
+            self.transmit(sample, self.next_sample - now)
+            self.next_sample += self.interval
+
+    def start(self, recording, delay=0):
+        self.mode = "MEASUREMENT"
+        self.recording = recording
+        self.interval = int.from_bytes(self.usr_cfg[38:40], "little") or 1
+        self.next_sample = time.monotonic() + delay
+
+    def reply(self, data=b"", ok=True):
+        self.transmit(data + (self.ACK if ok else self.NAK), self.latency)
+
+    def handle(self, data):
+        if not self.ready():
+            return
+        self.rx_buf.extend(data)
+        while True:
+            buf = bytes(self.rx_buf)
+            if b"K1W%!Q" in buf:  # Break.
+                del self.rx_buf[:buf.index(b"K1W%!Q") + 6]
+                if self.mode == "MEASUREMENT":
+                    self.transmit(b"\x0a\x0dConfirm:" + self.ACK, self.latency)
+                    self.mode = "CONFIRMATION"
+                else:
+                    self.reply(b"\x0a\x0dAQUADOPP PROFILER\x0a\x0dVersion 3.37\x0a\x0dCommand mode\x0a\x0d")
+                continue
+            if buf.startswith(b"@"):
+                del self.rx_buf[0]
+                continue
+            if len(buf) < 2:
+                return
+            cmd = buf[0:2]
+            size = {b"SC":8, b"CC":514, b"FO":6, b"RD":8}.get(cmd, 2)
+            if len(buf) < size:
+                return
+            del self.rx_buf[:size]
+            self.command(cmd, buf[2:size])
+
+    def command(self, cmd, args):
+        if self.mode == "CONFIRMATION":
+            if cmd == b"MC":
+                self.mode = "COMMAND"
+                self.reply()
+            return
+        if cmd == b"II":
+            self.reply(b"\x02\x00")
+        elif cmd == b"RC":
+            self.reply(self.clock())
+        elif cmd == b"SC":
+            m, s, d, h, y, mo = (_unbcd(x) for x in args)
+            self.clock_offset += calendar.timegm((2000 + y, mo, d, h, m, s)) - int(self.now())
+            self.reply()
+        elif cmd == b"CC":
+            if len(args) == 512 and self.checksum(args[:-2]) == int.from_bytes(args[-2:], "little"):
+                self.usr_cfg = bytearray(args)
+                self.reply()
+            else:
+                self.reply(ok=False)
+        elif cmd == b"GA":
+            self.reply(self.hw_cfg() + self.head_cfg() + bytes(self.usr_cfg))
+        elif cmd == b"GP":
+            self.reply(self.hw_cfg())
+        elif cmd == b"GH":
+            self.reply(self.head_cfg())
+        elif cmd == b"GC":
+            self.reply(bytes(self.usr_cfg))
+        elif cmd == b"FO":
+            if args == b"\x12\xd4\x1e\xef":
+                self.recorder_files = 0
+                self.recorder = bytearray()
+                self.reply()
+            else:
+                self.reply(ok=False)
+        elif cmd == b"RA":
+            self.reply(len(self.recorder).to_bytes(4, "little"))
+        elif cmd == b"RD":
+            offset = int.from_bytes(args[0:4], "little")
+            count = int.from_bytes(args[4:6], "little")
+            block = bytes(self.recorder[offset:offset + count])
+            if len(block) < count:
+                self.reply(ok=False)
+            else:
+                self.reply(block)
+        elif cmd == b"SD":
+            if self.recorder_files >= 31:
+                self.reply(ok=False)
+            else:
+                self.recorder_files += 1
+                self.reply()
+                self.start(True, 1)
+        elif cmd in (b"ST", b"SR"):
+            self.reply()
+            self.start(cmd == b"SR", 1)
+        elif cmd == b"AD":
+            self.reply()
+            self.transmit(self.velocity_data(), 0.2)
+        elif cmd == b"PD":
+            self.mode = "POWER DOWN"
+            self.reply()
+        else:
+            self.reply(ok=False)
+
+class QUASAR(INSTRUMENT):
+    """Quasar GSM modem, AT command set plus a YMODEM receiver once
+    connected.
+
+    Params:
+        dial_time(float): sec. from ATD to CONNECT
+        latency(float): reply delay (sec.)
+        faults: also {"no_carrier":p, "error":p}
+    """
+
+    def __init__(self, dial_time=2, latency=0.05, **kwargs):
+        INSTRUMENT.__init__(self, **kwargs)
+        self.dial_time = dial_time
+        self.latency = latency
+        self.online = False
+        self.line = bytearray()
+        self.data = bytearray()
+        self.last_rx = 0
+        self.files = {}  # {filename:bytes,...}
+        self.file = None
+        self.registers = {"S0":0}
+
+    def on_power_up(self):
+        self.online = False
+        self.line = bytearray()
+
+    def result(self, *lines, delay=None):
+        self.transmit(b"".join(b"\r\n" + line.encode("ascii") + b"\r\n" for line in lines), self.latency if delay is None else delay)
+
+    def handle(self, data):
+        now = time.monotonic()
+        if self.online:
+            if data == b"+++" and now - self.last_rx >= 1:
+                self.online = False
+                self.result("OK", delay=1)
+            else:
+                self.ymodem(data)
+            self.last_rx = now
+            return
+        for byte in data:
+            if byte == 0x0d:
+                self.command(self.line.decode("ascii", "replace").strip())
+                self.line = bytearray()
+            elif byte != 0x0a:
+                self.line.append(byte)
+        self.last_rx = now
+
+    def command(self, cmd):
+        upper = cmd.upper()
+        if not upper:
+            return
+        if not upper.startswith("AT") or self._fault("error"):
+            self.result("ERROR")
+        elif upper.startswith("ATD"):
+            if self._fault("no_carrier"):
+                self.result("NO CARRIER", delay=self.dial_time)
+            else:
+                self.online = True
+                self.data = bytearray()
+                self.result("CONNECT 9600", delay=self.dial_time)
+                self.transmit(b"C", self.dial_time + 0.5)
+        elif upper.startswith("ATH"):
+            self.online = False
+            self.result("OK")
+        elif upper == "AT+CREG?":
+            self.result("+CREG: 0,1", "OK")
+        elif upper.endswith("?") and upper[2:-1] in self.registers:
+            self.result("{:03d}".format(self.registers[upper[2:-1]]), "OK")
+        elif "=" in upper and upper[2:].split("=")[0] in self.registers:
+            self.registers[upper[2:].split("=")[0]] = int(upper.split("=")[1])
+            self.result("OK")
+        else:
+            self.result("OK")
+
+    def ymodem(self, data):
+        """Minimal YMODEM receiver, acks every well formed packet."""
+        self.data.extend(data)
+        while self.data:
+            head = self.data[0]
+            if head == 0x04:  # EOT
+                del self.data[0]
+                self.file = None
+                self.transmit(b"\x06C", self.latency)
+                continue
+            if head == 0x18:  # CAN
+                del self.data[0]
+                continue
+            if head not in (0x01, 0x02):
+                del self.data[0]
+                continue
+            size = 128 if head == 0x01 else 1024
+            if len(self.data) < 3 + size + 2:
+                return
+            packet = bytes(self.data[:3 + size + 2])
+            del self.data[:3 + size + 2]
+            seq, payload = packet[1], packet[3:3 + size]
+            if seq == 0 and self.file is None:
+                name = payload.split(b"\x00")[0].decode("ascii", "replace")
+                if not name:
+                    self.transmit(b"\x06", self.latency)
+                    continue
+                self.file = name
+                self.files[name] = bytearray()
+                self.transmit(b"\x06C", self.latency)
+            else:
+                if self.file is not None:
+                    self.files[self.file] += payload.rstrip(b"\x1a")
+                self.transmit(b"\x06", self.latency)
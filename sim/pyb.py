@@ -0,0 +1,291 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Host replacement of the MicroPython pyb module.
+
+UART buses and control pins are routed to the simulated instruments
+attached with attach(), everything else is a no-op stand-in of the
+pyboard peripherals used by the firmware.
+"""
+
+import time as _time
+import utime
+
+_buses = {}  # {bus:INSTRUMENT,...}
+_pins = {}  # {pin:INSTRUMENT,...}
+
+def attach(instrument, bus, pin=None):
+    """Connects a simulated instrument to a uart bus and its control pin.
+
+    Params:
+        instrument(INSTRUMENT)
+        bus(int)
+        pin(str)
+    """
+    previous = _buses.get(bus)
+    _buses[bus] = instrument
+    if previous is not None and previous is not instrument and previous.connected:
+        previous.disconnect()  # An open uart now talks to the new instrument.
+        instrument.connect(previous.baudrate, previous.read_buf_len)
+    if pin:
+        _pins[pin] = instrument
+
+def detach(bus=None):
+    """Disconnects one or all simulated instruments."""
+    if bus is None:
+        _buses.clear()
+        _pins.clear()
+        return
+    instrument = _buses.pop(bus, None)
+    for pin in [pin for pin in _pins if _pins[pin] is instrument]:
+        del _pins[pin]
+
+def freq(*args):
+    return 84000000
+
+def usb_mode(*args, **kwargs):
+    pass
+
+def repl_uart(uart=None):
+    pass
+
+def stop():
+    pass
+
+def delay(ms):
+    _time.sleep(ms / 1000)
+
+def millis():
+    return utime.ticks_ms()
+
+class UART(object):
+    """pyb.UART compatible stub backed by a simulated instrument."""
+
+    def __init__(self, bus, baudrate=9600, **kwargs):
+        self.bus = bus
+        self.init(baudrate, **kwargs)
+
+    @property
+    def instrument(self):
+        return _buses.get(self.bus)
+
+    def init(self, baudrate, bits=8, parity=None, stop=1, timeout=0, flow=0, timeout_char=0, read_buf_len=64):
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.timeout_char = max(timeout_char, 2 + 20000 // baudrate)  # At least two chars long.
+        self.read_buf_len = read_buf_len
+        if self.instrument:
+            self.instrument.connect(baudrate, read_buf_len)
+
+    def deinit(self):
+        if self.instrument:
+            self.instrument.disconnect()
+
+    def any(self):
+        if self.instrument:
+            return self.instrument.available()
+        return 0
+
+    def _wait(self, timeout):
+        """Waits up to timeout ms for incoming bytes."""
+        start = _time.monotonic()
+        while not self.any():
+            if (_time.monotonic() - start) * 1000 >= timeout:
+                return False
+            _time.sleep(0.0005)
+        return True
+
+    def read(self, nbytes=None):
+        if not self.instrument or not self._wait(self.timeout):
+            return None
+        data = bytearray()
+        while nbytes is None or len(data) < nbytes:
+            chunk = self.instrument.take(None if nbytes is None else nbytes - len(data))
+            data.extend(chunk)
+            if nbytes is not None and len(data) >= nbytes:
+                break
+            if not self._wait(self.timeout_char):
+                break
+        return bytes(data)
+
+    def readchar(self):
+        if not self.instrument or not self._wait(self.timeout):
+            return -1
+        return self.instrument.take(1)[0]
+
+    def readinto(self, buf, nbytes=None):
+        if nbytes is None:
+            nbytes = len(buf)
+        data = self.read(nbytes)
+        if not data:
+            return None
+        buf[0:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        if not self.instrument or not self._wait(self.timeout):
+            return None
+        data = bytearray()
+        while not data.endswith(b"\n"):
+            data.extend(self.instrument.take(1))
+            if not data.endswith(b"\n") and not self._wait(self.timeout_char):
+                break
+        return bytes(data)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self.instrument:
+            self.instrument.receive(bytes(data))
+        return len(data)
+
+    def writechar(self, char):
+        return self.write(bytes([char]))
+
+class Pin(object):
+
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    PULL_NONE = 0
+
+    def __init__(self, name, mode=IN, pull=None):
+        self.name = name
+        self._value = 0
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def high(self):
+        self.value(1)
+
+    def low(self):
+        self.value(0)
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+        if self.name in _pins:
+            _pins[self.name].power(self._value)
+
+class LED(object):
+
+    def __init__(self, led):
+        self.led = led
+
+    def on(self):
+        pass
+
+    def off(self):
+        pass
+
+    def toggle(self):
+        pass
+
+class RTC(object):
+    """Rtc stub, drift (ppm) is the crystal frequency error, each calibration
+    unit trims it by 0.954 ppm as on the pyboard.
+    """
+
+    drift = 0
+    _calibration = 0
+
+    def datetime(self, datetimetuple=None):
+        if datetimetuple is None:
+            now = utime.rtc()
+            t = utime.localtime(int(now) - utime.EPOCH)
+            return (t[0], t[1], t[2], t[6] + 1, t[3], t[4], t[5], 255 - int(now % 1 * 256))
+        y, m, d, wd, hh, mm, ss = datetimetuple[0:7]
+        subseconds = (255 - datetimetuple[7]) / 256 if len(datetimetuple) > 7 else 0
+        utime.offset += utime.mktime((y, m, d, hh, mm, ss, 0, 0)) + utime.EPOCH + subseconds - utime.rtc()
+
+    def calibration(self, cal=None):
+        if cal is None:
+            return RTC._calibration
+        RTC._calibration = cal
+        utime.set_rate(RTC.drift + cal * 0.954)
+
+    @classmethod
+    def set_drift(cls, ppm):
+        """Sets the simulated crystal frequency error (ppm)."""
+        cls.drift = ppm
+        utime.set_rate(ppm + cls._calibration * 0.954)
+
+    def wakeup(self, timeout, callback=None):
+        pass
+
+class ADCAll(object):
+
+    def __init__(self, resolution, mask=0xffffffff):
+        self.resolution = resolution
+
+    def read_core_temp(self):
+        return 25.0
+
+    def read_core_vbat(self):
+        return 3.3
+
+    def read_core_vref(self):
+        return 1.21
+
+    def read_vref(self):
+        return 3.3
+
+    def read_channel(self, channel):
+        return 1 << (self.resolution - 1)
+
+class ExtInt(object):
+
+    IRQ_RISING = 0
+    IRQ_FALLING = 1
+    IRQ_RISING_FALLING = 2
+
+    def __init__(self, pin, mode, pull, callback):
+        self.callback = callback
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+class USB_VCP(object):
+
+    def isconnected(self):
+        return False
+
+    def any(self):
+        return 0
+
+    def read(self, nbytes=None):
+        return None
+
+    def write(self, data):
+        return len(data)
+
+def SDCard():
+    return None
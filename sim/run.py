@@ -0,0 +1,181 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Runs the firmware drivers on a host against the simulated instruments.
+
+Usage:
+    python sim/run.py GPS_1 last_fix
+    python sim/run.py METRECX_1 start_up --baudrate 9600 --noise 0.001
+
+The firmware configuration is copied to a scratch directory with all the
+devices enabled, data files are written to its media subdirectory.
+
+On CPython the u-modules are replaced by the shims in this directory; the
+YMODEM sender relies on MicroPython str/bytes leniency, so complete file
+transfers need the MicroPython unix port.
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+SIM = os.path.dirname(os.path.abspath(__file__))
+FIRMWARE = os.path.join(os.path.dirname(SIM), "firmware")
+HEAP = 100 * 1024  # Pyboard v1.1 heap size (bytes).
+
+DEVICES = {
+    "GPS":"dev_quectel_l80m39",
+    "METEO":"dev_young_32500",
+    "METRECX":"dev_aml_metrecx",
+    "ADCP":"dev_nortek_aquadopp",
+    "MODEM":"quasar_gsmq2403"
+    }
+
+def setup(workdir=None):
+    """Prepares a scratch firmware environment and makes it current.
+
+    Params:
+        workdir(str): default a new temporary directory
+    Returns:
+        workdir(str)
+    """
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix="buoy_")
+    config = os.path.join(workdir, "config")
+    os.makedirs(config, exist_ok=True)
+    src = os.path.join(FIRMWARE, "config")
+    for file in os.listdir(src):
+        name = file[1:] if file.startswith("_dev_") else file
+        shutil.copy(os.path.join(src, file), os.path.join(config, name))
+    shutil.copy(os.path.join(src, "_dev_nortek_aquadopp.pdc"), os.path.join(config, "adcp.pdc"))
+    os.makedirs(os.path.join(workdir, "media"), exist_ok=True)
+    os.chdir(workdir)
+    for path in (SIM, FIRMWARE):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    import gc
+    if not hasattr(gc, "mem_alloc"):  # CPython, heap figures come from tracemalloc.
+        import tracemalloc
+        tracemalloc.start()
+        gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0]
+        gc.mem_free = lambda: max(0, HEAP - tracemalloc.get_traced_memory()[0])
+    import constants
+    constants.MEDIA = [os.path.join(workdir, "media")]
+    return workdir
+
+def config(device):
+    """Returns the configuration of a device, e.g. GPS_1."""
+    key, instance = device.split("_")
+    with open(os.path.join("config", DEVICES[key] + ".json")) as file:
+        return json.load(file)[key][instance]
+
+def instrument(device, **kwargs):
+    """Creates the default simulated instrument for a device.
+
+    Params:
+        device(str): e.g. GPS_1
+        kwargs: instrument parameters
+    Returns:
+        INSTRUMENT
+    """
+    import instruments
+    key = device.split("_")[0]
+    if key == "GPS":
+        kwargs.setdefault("ttff", 3)
+        return instruments.QUECTELL80(**kwargs)
+    if key == "METEO":
+        return instruments.YOUNG32500(data_format=config(device)["Data_Format"], **kwargs)
+    if key == "METRECX":
+        return instruments.METRECX(**kwargs)
+    if key == "ADCP":
+        with open(os.path.join("config", "adcp.pdc"), "rb") as pdc:
+            kwargs.setdefault("usr_cfg", pdc.read())
+        return instruments.AQUADOPP(**kwargs)
+    if key == "MODEM":
+        return instruments.QUASAR(**kwargs)
+    raise ValueError("no simulated instrument for {}".format(device))
+
+def attach(device, sim):
+    """Connects a simulated instrument to the device uart and control pin."""
+    import pyb
+    import constants
+    cfg = config(device)
+    bus = cfg["Uart"]["Bus"]
+    if device in constants.DEVICES:
+        bus = constants.UARTS[constants.DEVICES[device]]
+    pyb.attach(sim, bus, cfg.get("Ctrl_Pin"))
+
+def run(device, tasks, sim=None, window=60, warmup=0):
+    """Powers up a device, runs tasks as the scheduler does and returns the
+    driver object.
+
+    Params:
+        device(str): e.g. GPS_1
+        tasks(list)
+        sim(INSTRUMENT): default instrument()
+        window(int): sec. before the device is set back to off
+        warmup(int): sec. between power on and tasks
+    Returns:
+        DEVICE
+    """
+    import tools.utils as utils
+    if sim is None:
+        sim = instrument(device)
+    attach(device, sim)
+    name = DEVICES[device.split("_")[0]] + "." + device
+    utils.create_device(name, tasks=["on"])
+    time.sleep(warmup)
+    utils.status_table[name] = 2
+    timer = threading.Timer(window, lambda: utils.status_table.__setitem__(name, 0))
+    timer.daemon = True
+    timer.start()
+    utils.execute(name, tasks)
+    timer.cancel()
+    module, obj = name.split(".")
+    return getattr(sys.modules[module], obj)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("device", help="e.g. GPS_1, METRECX_1, ADCP_1, METEO_1, MODEM_1")
+    parser.add_argument("tasks", nargs="+")
+    parser.add_argument("--baudrate", type=int, default=9600, help="0 delivers bytes at once")
+    parser.add_argument("--noise", type=float, default=0)
+    parser.add_argument("--drop", type=float, default=0)
+    parser.add_argument("--garbage", type=float, default=0)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    workdir = setup()
+    sim = instrument(args.device, baudrate=args.baudrate or None, noise=args.noise, seed=args.seed, faults={"drop":args.drop, "garbage":args.garbage})
+    start = time.monotonic()
+    run(args.device, args.tasks, sim, args.window)
+    print("{} {} done in {:.3f} s, {} frames, {} dropped, {} overruns".format(args.device, " ".join(args.tasks), time.monotonic() - start, sim.frames, sim.dropped, sim.overruns))
+    for root, dirs, files in os.walk(os.path.join(workdir, "media")):
+        for file in files:
+            with open(os.path.join(root, file)) as data:
+                print(data.read(), end="")
+    shutil.rmtree(workdir)
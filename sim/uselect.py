@@ -0,0 +1,86 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Host replacement of the MicroPython uselect module, working on the
+simulated uarts."""
+
+import time as _time
+
+POLLIN = 1
+POLLOUT = 4
+POLLERR = 8
+POLLHUP = 16
+
+def _ready(stream):
+    try:
+        return stream.any()
+    except AttributeError:
+        return 0
+
+def select(rlist, wlist, xlist, timeout=None):
+    start = _time.monotonic()
+    while True:
+        r = [stream for stream in rlist if stream is not None and _ready(stream)]
+        w = [stream for stream in wlist if stream is not None]
+        if r or w:
+            return r, w, []
+        if timeout is not None and _time.monotonic() - start >= timeout:
+            return [], [], []
+        _time.sleep(0.001)
+
+class _POLL(object):
+
+    def __init__(self):
+        self.streams = {}
+
+    def register(self, stream, eventmask=POLLIN | POLLOUT):
+        self.streams[stream] = eventmask
+
+    def unregister(self, stream):
+        self.streams.pop(stream, None)
+
+    def modify(self, stream, eventmask):
+        self.streams[stream] = eventmask
+
+    def poll(self, timeout=-1):
+        start = _time.monotonic()
+        while True:
+            events = []
+            for stream, mask in self.streams.items():
+                flags = 0
+                if mask & POLLIN and _ready(stream):
+                    flags |= POLLIN
+                if mask & POLLOUT:
+                    flags |= POLLOUT
+                if flags:
+                    events.append((stream, flags))
+            if events or timeout == 0:
+                return events
+            if timeout > 0 and (_time.monotonic() - start) * 1000 >= timeout:
+                return events
+            _time.sleep(0.001)
+
+    def ipoll(self, timeout=-1, flags=0):
+        return iter(self.poll(timeout))
+
+def poll():
+    return _POLL()
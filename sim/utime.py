@@ -0,0 +1,88 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 OGS
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Host replacement of the MicroPython utime module.
+
+Times are seconds since the embedded epoch 2000-01-01 00:00:00 like on the
+pyboard, ticks wrap around as on the STM32 port.
+"""
+
+import time as _time
+import calendar as _calendar
+
+EPOCH = 946684800  # 2000-01-01 00:00:00 unix epoch
+TICKS_PERIOD = 1 << 30
+
+offset = 0  # rtc setting vs. host clock (sec.)
+rate = 0  # rtc frequency error (ppm), crystal drift minus calibration trim
+_origin = _time.time()
+
+def rtc():
+    """Returns the rtc time (sec.) since the unix epoch, with subseconds."""
+    now = _time.time()
+    return now + offset + (now - _origin) * rate / 1000000
+
+def set_rate(ppm):
+    """Changes the rtc frequency error keeping the current time."""
+    global offset, rate, _origin
+    now = _time.time()
+    offset += (now - _origin) * rate / 1000000
+    _origin = now
+    rate = ppm
+
+def time():
+    return int(rtc()) - EPOCH
+
+def localtime(secs=None):
+    if secs is None:
+        secs = time()
+    t = _time.gmtime(int(secs) + EPOCH)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
+
+gmtime = localtime
+
+def mktime(t):
+    return _calendar.timegm(tuple(t[0:6]) + (0, 0, 0)) - EPOCH
+
+def sleep(secs):
+    _time.sleep(secs)
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
+
+def ticks_ms():
+    return int(_time.monotonic() * 1000) & (TICKS_PERIOD - 1)
+
+def ticks_us():
+    return int(_time.monotonic() * 1000000) & (TICKS_PERIOD - 1)
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & (TICKS_PERIOD - 1)
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) & (TICKS_PERIOD - 1)
+    if diff >= TICKS_PERIOD // 2:
+        diff -= TICKS_PERIOD
+    return diff